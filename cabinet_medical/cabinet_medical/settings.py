@@ -39,6 +39,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.identites.carte_identites_middleware',  # une lecture par objet et par requête
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -123,6 +124,7 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True  # ← Ajout pour les cookies/sessions
+CORS_EXPOSE_HEADERS = ['Link']  # ← Liens de pagination lisibles par le frontend
 
 
 # Configuration REST Framework
@@ -137,4 +139,68 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
-}
\ No newline at end of file
+    # Pagination par curseur de toutes les listes (sauf petits référentiels) : liens dans l'en-tête Link (voir core/pagination.py)
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.CurseurPagination',
+    'PAGE_SIZE': 100,
+}
+
+
+# ===== CACHE PARTAGÉ =====
+# Par défaut, cache mémoire du processus : suffisant pour un seul processus
+# serveur. Avec plusieurs processus, configurer un cache partagé pour qu'une
+# invalidation faite par un processus soit vue par les autres (avertissement
+# core.W002 sinon, voir core/checks.py), par exemple redis (pip install redis) :
+#     CACHES = {
+#         'default': {
+#             'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+#             'LOCATION': 'redis://127.0.0.1:6379/1',
+#         }
+#     }
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+# ===== CACHE DES DISPONIBILITÉS (core/disponibilites.py) =====
+# 'core.disponibilites.DjangoCacheBackend' : cache Django partagé (voir CACHES)
+# 'core.disponibilites.LocMemBackend' : mémoire du processus (un seul processus serveur)
+DISPONIBILITES_BACKEND = 'core.disponibilites.DjangoCacheBackend'
+DISPONIBILITES_CACHE_ALIAS = 'default'
+DISPONIBILITES_CACHE_TIMEOUT = 3600  # secondes ; borne la durée d'une entrée manquée par une invalidation
+
+
+# ===== FLUX D'ÉVÉNEMENTS TEMPS RÉEL (core/evenements.py) =====
+# Servi uniquement par l'application ASGI (ex : uvicorn cabinet_medical.asgi:application)
+EVENEMENTS_BROKER = 'core.evenements.LocalBroker'
+
+
+# ===== LECTURE RAPIDE DES LISTES (core/lecture_rapide.py) =====
+# Listes rdvs/, creneaux/, consultations/, factures/ construites sans serializer
+# (sortie identique) ; rendu par orjson s'il est installé (pip install orjson).
+# Désactivé par défaut : chemin normal des serializers
+LECTURE_RAPIDE = False
+
+
+# ===== CACHE DES RÉFÉRENTIELS (core/catalogues.py) =====
+# Réponses des listes de référence (vaccins/, maladies/, médecins/...) versionnées
+# par modèle ; cache partagé par tous les processus requis (voir CACHES, core.W002)
+CATALOGUES_CACHE_ALIAS = 'default'
+CATALOGUES_CACHE_DUREE = 3600  # secondes
+
+
+# ===== RECHERCHE DES PATIENTS (core/recherche.py) =====
+# Suggestions de la saisie semi-automatique gardées en mémoire par processus
+# (LRU, 0 pour désactiver), invalidées par la version 'patient' du cache des
+# référentiels, partagé entre processus (core.W002 sinon)
+SUGGESTIONS_CACHE_TAILLE = 4096  # saisies distinctes
+SUGGESTIONS_CACHE_DUREE = 60  # secondes ; borne la durée d'une suggestion périmée
+
+
+# ===== RECHERCHE GLOBALE (core/recherche_globale.py) =====
+# search/?q= interroge chaque entité en parallèle ; les entités qui n'ont pas
+# répondu dans le budget sont listées dans "incomplets"
+RECHERCHE_GLOBALE_BUDGET_MS = 150
+RECHERCHE_GLOBALE_THREADS = 8
+RECHERCHE_GLOBALE_INDEX_DUREE = 300  # secondes ; âge maximal de l'index des référentiels d'un processus
@@ -0,0 +1,26 @@
+"""
+Réglages des tests et des benchmarks de l'API (core/tests.py) :
+base SQLite en mémoire et caches locaux, aucun service externe requis.
+
+    python manage.py test core
+(manage.py sélectionne ces réglages pour la commande test)
+"""
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+DISPONIBILITES_BACKEND = 'core.disponibilites.LocMemBackend'
+SILENCED_SYSTEM_CHECKS = ['core.W002']  # un seul processus : caches en mémoire
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
@@ -79,7 +79,22 @@ class JourTravailAdmin(admin.ModelAdmin):
 admin.site.register(JourTravail,JourTravailAdmin)
 
 
+from .models import ModeleHoraire, Fermeture
+class ModeleHoraireAdmin(admin.ModelAdmin):
+    list_display = ('medecin', 'nom', 'jours_semaine', 'heure_debut', 'heure_fin', 'duree_creneau', 'actif')
+    list_filter = ('medecin', 'actif')
+admin.site.register(ModeleHoraire, ModeleHoraireAdmin)
+
+
+class FermetureAdmin(admin.ModelAdmin):
+    list_display = ('date', 'motif', 'medecin')
+    list_filter = ('medecin',)
+    date_hierarchy = 'date'
+admin.site.register(Fermeture, FermetureAdmin)
+
+
 from .models import RDV
+from .planning import creneaux_libres_a_venir
 
 
 @admin.register(RDV)
@@ -87,7 +102,8 @@ class RDVAdmin(admin.ModelAdmin):
 
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         if db_field.name == "creneau":
-            kwargs["queryset"] = Creneau.objects.filter(libre=True)
+            # Seuls les créneaux libres à venir (avec le médecin pour l'affichage)
+            kwargs["queryset"] = creneaux_libres_a_venir().select_related('medecin')
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
 
 admin.site.register(Employe)
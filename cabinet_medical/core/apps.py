@@ -1,8 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CoreConfig(AppConfig):
     name = 'core'
  
     def ready(self):
-        import core.signals
\ No newline at end of file
+        import core.signals
+        from core import checks  # enregistre le contrôle des caches partagés
+        from core import requetes  # enregistre le contrôle des plans de requêtes
+        from core import identites
+        if settings.DEBUG:
+            requetes.installer_surveillance()
+        identites.installer()  # carte d'identités par requête (après la surveillance)
@@ -0,0 +1,126 @@
+# core/catalogues.py
+"""
+Cache des réponses des référentiels (actes, analyses, radios, maladies,
+vaccins, allergies, organismes, médecins).
+
+Ces listes changent rarement mais sont rechargées à chaque écran. Les réponses
+list / retrieve des ViewSets qui utilisent CacheCatalogueMixin sont mises en
+cache sous une clé qui contient :
+  - la version de chaque modèle dont dépend la réponse (catalogue_modeles) ;
+  - les paramètres de la requête (?search=, filtres, ?fields=...) et l'id.
+Les signaux post_save / post_delete incrémentent la version du modèle (voir
+core/signals.py) : les anciennes entrées ne sont plus jamais lues et expirent.
+Une réponse en cache est servie sans requête SQL.
+
+Versions et réponses sont dans un cache Django partagé par tous les processus
+serveur (redis, memcached) : une invalidation faite par un processus est vue
+par les autres. Un cache en mémoire du processus (LocMemCache) déclenche
+l'avertissement core.W002 (core/checks.py) ; les autres processus serviraient
+l'ancien contenu jusqu'à l'expiration de l'entrée (CATALOGUES_CACHE_DUREE).
+    CATALOGUES_CACHE_ALIAS = 'default'
+    CATALOGUES_CACHE_DUREE = 3600
+Les versions expirent après deux fois cette durée : une version expirée
+repart d'une valeur jamais utilisée, les entrées de l'ancienne ne sont plus lues.
+Les écritures qui contournent les signaux (queryset.update(), bulk_create)
+doivent appeler invalider('vaccin', ...).
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+
+PREFIXE = 'catalogue:'
+
+
+def _cache():
+    return caches[getattr(settings, 'CATALOGUES_CACHE_ALIAS', 'default')]
+
+
+def _cle_version(modele):
+    return f"{PREFIXE}version:{modele}"
+
+
+def _duree_version():
+    # Plus longue que les entrées : une version ne disparaît pas avant ses réponses
+    return 2 * getattr(settings, 'CATALOGUES_CACHE_DUREE', 3600)
+
+
+def _version_initiale():
+    # Après une éviction, la version repart d'une valeur jamais utilisée
+    return int(time.time() * 1000)
+
+
+# ===== VERSIONS =====
+
+def versions(modeles):
+    """Versions courantes des modèles (un aller-retour au cache)"""
+    cache = _cache()
+    cles = [_cle_version(m) for m in modeles]
+    trouves = cache.get_many(cles)
+    for cle in cles:
+        if cle not in trouves:
+            cache.add(cle, _version_initiale(), _duree_version())
+            trouves[cle] = cache.get(cle)
+    return [trouves[cle] for cle in cles]
+
+
+def _incrementer(modele):
+    cache = _cache()
+    try:
+        cache.incr(_cle_version(modele))
+    except ValueError:  # version absente (éviction, cache vide)
+        cache.set(_cle_version(modele), _version_initiale(), _duree_version())
+
+
+def invalider(*modeles):
+    """
+    Nouvelle version des modèles, tout de suite (lectures dans la même
+    transaction) et après le commit (une lecture concurrente a pu remettre en
+    cache l'ancien contenu sous la nouvelle version).
+    """
+    for modele in modeles:
+        _incrementer(modele)
+    transaction.on_commit(lambda: [_incrementer(modele) for modele in modeles])
+
+
+# ===== MIXIN POUR LES VIEWSETS =====
+
+class CacheCatalogueMixin:
+    """
+    catalogue_modeles : modèles dont dépend le contenu des réponses
+    (par défaut, le modèle du queryset)
+    """
+    catalogue_modeles = ()
+
+    def reponse_catalogue(self, request, construire, **kwargs):
+        modeles = self.catalogue_modeles or (self.queryset.model._meta.model_name,)
+        parametres = sorted((cle, valeurs) for cle, valeurs in request.query_params.lists())
+        empreinte = hashlib.md5(repr((parametres, sorted(kwargs.items()))).encode()).hexdigest()
+        cle = (
+            f"{PREFIXE}{type(self).__name__}:{self.action}:"
+            f"{'.'.join(str(v) for v in versions(modeles))}:{empreinte}"
+        )
+
+        cache = _cache()
+        donnees = cache.get(cle)
+        if donnees is not None:
+            return Response(donnees)
+
+        response = construire()
+        if response.status_code == 200:
+            cache.set(cle, response.data, getattr(settings, 'CATALOGUES_CACHE_DUREE', 3600))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.reponse_catalogue(request, lambda: super(CacheCatalogueMixin, self).list(
+            request, *args, **kwargs
+        ))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.reponse_catalogue(request, lambda: super(CacheCatalogueMixin, self).retrieve(
+            request, *args, **kwargs
+        ), **kwargs)
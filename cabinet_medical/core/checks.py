@@ -0,0 +1,58 @@
+# core/checks.py
+"""
+Contrôles de configuration des caches partagés.
+
+Plusieurs états sont gardés en cache et invalidés par les écritures :
+disponibilités (core/disponibilites.py), versions du journal des modifications
+(core/modifications.py, cache 'default'), versions et réponses des
+référentiels (core/catalogues.py, CATALOGUES_CACHE_ALIAS), dont la version
+'patient' qui périme les suggestions de patients gardées par chaque processus
+(core/recherche.py, SUGGESTIONS_CACHE_TAILLE). Avec plusieurs processus serveur
+(gunicorn -w N, uvicorn --workers N), une invalidation faite dans un processus
+doit être vue par les autres : le cache doit être partagé (redis, memcached).
+Un cache en mémoire du processus déclenche l'avertissement core.W002.
+Un seul processus (runserver, tests) : SILENCED_SYSTEM_CHECKS = ['core.W002'].
+"""
+from django.conf import settings
+from django.core import checks
+
+
+CACHES_PAR_PROCESSUS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+
+def cache_par_processus(alias):
+    """Vrai si l'alias désigne un cache propre à chaque processus"""
+    return settings.CACHES.get(alias, {}).get('BACKEND') in CACHES_PAR_PROCESSUS
+
+
+def _usages():
+    """(usage, alias de cache ou None si le stockage est en mémoire du processus)"""
+    backend = getattr(settings, 'DISPONIBILITES_BACKEND', 'core.disponibilites.DjangoCacheBackend')
+    yield (
+        'DISPONIBILITES_BACKEND',
+        None if backend.endswith('.LocMemBackend') else getattr(settings, 'DISPONIBILITES_CACHE_ALIAS', 'default'),
+    )
+    yield 'Versions du journal des modifications', 'default'
+    yield 'CATALOGUES_CACHE_ALIAS', getattr(settings, 'CATALOGUES_CACHE_ALIAS', 'default')
+    if getattr(settings, 'SUGGESTIONS_CACHE_TAILLE', 4096):
+        yield (
+            'Version des suggestions de patients (SUGGESTIONS_CACHE_TAILLE)',
+            getattr(settings, 'CATALOGUES_CACHE_ALIAS', 'default'),
+        )
+
+
+@checks.register(checks.Tags.caches)
+def verifier_caches_partages(app_configs=None, **kwargs):
+    avertissements = []
+    for usage, alias in _usages():
+        if alias is None or cache_par_processus(alias):
+            avertissements.append(checks.Warning(
+                f"{usage} : état gardé dans la mémoire de chaque processus"
+                + (f" (cache '{alias}')" if alias else ""),
+                hint="Avec plusieurs processus serveur, les invalidations ne sont pas vues par les "
+                     "autres : configurer un cache partagé (CACHES, redis ou memcached)",
+                id='core.W002',
+            ))
+    return avertissements
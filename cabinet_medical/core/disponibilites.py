@@ -0,0 +1,337 @@
+# core/disponibilites.py
+"""
+Cache des disponibilités : un bitmap par (médecin, date).
+
+Chaque entrée contient les créneaux de la journée triés par heure de début
+(ids, minutes de début et de fin) et un entier dont le bit i vaut 1 si le
+i-ème créneau est libre. Les vérifications de disponibilité et les compteurs
+du calendrier mensuel sont servis depuis ce cache, sans requête SQL.
+
+Cohérence : toute écriture sur un créneau (signaux Creneau / RDV, services de
+core/planning.py) invalide, au commit, l'entrée du jour concerné, qui est
+reconstruite en une requête à la lecture suivante. Chaque jour a un jeton de
+génération renouvelé par l'invalidation ; une entrée est stockée avec le jeton
+lu avant la requête SQL et n'est servie que si ce jeton est toujours le
+courant : une lecture concurrente d'une écriture ne remet pas en cache un état
+périmé. Les entrées expirent après DISPONIBILITES_CACHE_TIMEOUT secondes.
+
+Backend configurable via settings.DISPONIBILITES_BACKEND :
+    'core.disponibilites.DjangoCacheBackend' (défaut, framework de cache Django,
+                                              alias settings.DISPONIBILITES_CACHE_ALIAS)
+    'core.disponibilites.LocMemBackend'      (mémoire du processus, bornée :
+                                              un seul processus serveur)
+Avec plusieurs processus, l'alias doit désigner un cache partagé (redis,
+memcached) : avertissement core.W002 sinon (core/checks.py).
+Commande de reconstruction à froid : python manage.py reconstruire_disponibilites
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+DisponibiliteJour = namedtuple('DisponibiliteJour', ['ids', 'debuts', 'fins', 'libres'])
+
+JOUR_VIDE = DisponibiliteJour((), (), (), 0)
+
+
+def _minutes(heure):
+    return heure.hour * 60 + heure.minute
+
+
+def _heure_str(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}:00"
+
+
+# ===== BACKENDS =====
+
+def _duree():
+    return getattr(settings, 'DISPONIBILITES_CACHE_TIMEOUT', 3600)
+
+
+class LocMemBackend:
+    """
+    Stockage dans la mémoire du processus (un seul processus serveur) :
+    au plus `taille_max` entrées (les plus anciennes sont retirées), chacune
+    expirant après sa durée
+    """
+
+    def __init__(self, taille_max=None):
+        self.taille_max = taille_max or getattr(settings, 'DISPONIBILITES_LOCMEM_TAILLE', 20000)
+        self._donnees = OrderedDict()  # cle -> (expiration, valeur)
+        self._verrou = threading.Lock()
+
+    def get_many(self, cles):
+        maintenant = time.monotonic()
+        with self._verrou:
+            trouves = {}
+            for cle in cles:
+                entree = self._donnees.get(cle)
+                if entree is None:
+                    continue
+                if entree[0] <= maintenant:
+                    del self._donnees[cle]
+                else:
+                    trouves[cle] = entree[1]
+            return trouves
+
+    def set_many(self, valeurs, duree=None):
+        expiration = time.monotonic() + (duree or _duree())
+        with self._verrou:
+            for cle, valeur in valeurs.items():
+                self._donnees[cle] = (expiration, valeur)
+                self._donnees.move_to_end(cle)
+            while len(self._donnees) > self.taille_max:
+                self._donnees.popitem(last=False)
+
+    def delete_many(self, cles):
+        with self._verrou:
+            for cle in cles:
+                self._donnees.pop(cle, None)
+
+    def clear(self):
+        with self._verrou:
+            self._donnees.clear()
+
+
+class DjangoCacheBackend:
+    """Stockage dans un cache Django (partagé entre processus : memcached, redis...)"""
+
+    PREFIXE = 'dispo:'
+
+    def __init__(self):
+        from django.core.cache import caches
+        self._cache = caches[getattr(settings, 'DISPONIBILITES_CACHE_ALIAS', 'default')]
+
+    def get_many(self, cles):
+        trouves = self._cache.get_many([self.PREFIXE + cle for cle in cles])
+        return {cle[len(self.PREFIXE):]: valeur for cle, valeur in trouves.items()}
+
+    def set_many(self, valeurs, duree=None):
+        self._cache.set_many({self.PREFIXE + cle: v for cle, v in valeurs.items()}, duree or _duree())
+
+    def delete_many(self, cles):
+        self._cache.delete_many([self.PREFIXE + cle for cle in cles])
+
+    def clear(self):
+        # Le cache peut être partagé : on ne vide pas tout, les entrées expirent seules
+        pass
+
+
+_backend = None
+_backend_verrou = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_verrou:
+            if _backend is None:
+                chemin = getattr(settings, 'DISPONIBILITES_BACKEND', 'core.disponibilites.DjangoCacheBackend')
+                _backend = import_string(chemin)()
+    return _backend
+
+
+def _cle(medecin_id, date):
+    return f"{medecin_id}:{date}"
+
+
+# ===== GÉNÉRATIONS =====
+# Entrée stockée : (jeton de génération lu avant la construction, valeur)
+
+def _generation(cle):
+    return f"gen:{cle}"
+
+
+def _lire(cles):
+    """({cle: valeur} des entrées valides, {cle: jeton courant}) en un aller-retour"""
+    lus = get_backend().get_many(list(cles) + [_generation(cle) for cle in cles])
+    jetons = {cle: lus.get(_generation(cle)) for cle in cles}
+    valides = {}
+    for cle in cles:
+        entree = lus.get(cle)
+        if entree is not None and entree[0] == jetons[cle]:
+            valides[cle] = entree[1]
+    return valides, jetons
+
+
+def _ecrire(valeurs, jetons):
+    """Stocke des valeurs construites après la lecture des jetons"""
+    if valeurs:
+        get_backend().set_many({cle: (jetons.get(cle), valeur) for cle, valeur in valeurs.items()})
+
+
+def _invalider(cles):
+    """
+    Au commit : nouveau jeton pour chaque clé (les entrées construites avec
+    l'ancien ne seront plus servies) et suppression des entrées. Le jeton vit
+    deux fois plus longtemps que les entrées.
+    """
+    def apres_commit():
+        jeton = uuid.uuid4().hex
+        get_backend().set_many({_generation(cle): jeton for cle in cles}, duree=2 * _duree())
+        get_backend().delete_many(cles)
+    transaction.on_commit(apres_commit)
+
+
+# ===== CONSTRUCTION / INVALIDATION =====
+
+def _construire(medecin_ids, date_debut, date_fin):
+    """Construit les bitmaps de plusieurs médecins sur une période en une requête"""
+    from .models import Creneau
+
+    entrees = {}
+    lignes = Creneau.objects.filter(
+        medecin_id__in=medecin_ids,
+        date__range=(date_debut, date_fin)
+    ).order_by('medecin_id', 'date', 'heure_debut').values_list(
+        'medecin_id', 'date', 'id', 'heure_debut', 'heure_fin', 'libre'
+    )
+    for medecin_id, date, creneau_id, debut, fin, libre in lignes:
+        entrees.setdefault(_cle(medecin_id, date), []).append((creneau_id, debut, fin, libre))
+
+    resultat = {}
+    for medecin_id in medecin_ids:
+        jour = date_debut
+        while jour <= date_fin:
+            cle = _cle(medecin_id, jour)
+            creneaux = entrees.get(cle, [])
+            libres = 0
+            for i, (_, _, _, libre) in enumerate(creneaux):
+                if libre:
+                    libres |= 1 << i
+            resultat[cle] = DisponibiliteJour(
+                tuple(c[0] for c in creneaux),
+                tuple(_minutes(c[1]) for c in creneaux),
+                tuple(_minutes(c[2]) for c in creneaux),
+                libres
+            )
+            jour += timedelta(days=1)
+    return resultat
+
+
+def invalider(medecin_id, date):
+    invalider_jours([(medecin_id, date)])
+
+
+def invalider_jours(paires):
+    """
+    Invalide un ensemble de (medecin_id, date). L'invalidation a lieu au commit
+    de la transaction en cours pour qu'une lecture concurrente ne remette pas
+    en cache un état non encore validé.
+    """
+    cles = list({_cle(medecin_id, date) for medecin_id, date in paires})
+    if cles:
+        _invalider(cles)
+
+
+def invalider_medecin(medecin_id):
+    """Invalide le nom mis en cache d'un médecin"""
+    _invalider([f"medecin:{medecin_id}"])
+
+
+def invalider_creneau(creneau_id):
+    """Invalide le jour d'un créneau dont on ne connaît que l'identifiant"""
+    from .models import Creneau
+
+    ligne = Creneau.objects.filter(pk=creneau_id).values_list('medecin_id', 'date').first()
+    if ligne:
+        invalider(*ligne)
+
+
+def reconstruire(medecin_ids, date_debut, date_fin):
+    """Reconstruit (et stocke) les bitmaps d'une période, retourne le nombre d'entrées"""
+    medecin_ids = list(medecin_ids)
+    dates = [date_debut + timedelta(days=i) for i in range((date_fin - date_debut).days + 1)]
+    _, jetons = _lire([_cle(m, d) for m in medecin_ids for d in dates])
+    entrees = _construire(medecin_ids, date_debut, date_fin)
+    _ecrire(entrees, jetons)
+    return len(entrees)
+
+
+def vider():
+    get_backend().clear()
+
+
+# ===== LECTURE =====
+
+def jours(medecin_id, date_debut, date_fin):
+    """Retourne {date: DisponibiliteJour} ; les jours absents du cache sont construits en une requête"""
+    dates = [date_debut + timedelta(days=i) for i in range((date_fin - date_debut).days + 1)]
+    cles = {_cle(medecin_id, d): d for d in dates}
+    trouves, jetons = _lire(list(cles))
+
+    manquants = [cles[c] for c in cles if c not in trouves]
+    if manquants:
+        construits = _construire([medecin_id], min(manquants), max(manquants))
+        nouveaux = {c: v for c, v in construits.items() if c not in trouves}
+        _ecrire(nouveaux, jetons)
+        trouves.update(nouveaux)
+
+    return {d: trouves.get(c, JOUR_VIDE) for c, d in cles.items()}
+
+
+def jour(medecin_id, date):
+    return jours(medecin_id, date, date)[date]
+
+
+def nombre_libres(entree):
+    return bin(entree.libres).count('1')
+
+
+def creneaux_libres_ids(medecin_id, date):
+    entree = jour(medecin_id, date)
+    return [cid for i, cid in enumerate(entree.ids) if entree.libres >> i & 1]
+
+
+def est_libre(creneau):
+    entree = jour(creneau.medecin_id, creneau.date)
+    try:
+        return bool(entree.libres >> entree.ids.index(creneau.pk) & 1)
+    except ValueError:
+        return False
+
+
+def libres_par_jour(medecin_id, date_debut, date_fin):
+    """Nombre de créneaux libres par jour (vue calendrier mensuelle)"""
+    return {d: nombre_libres(e) for d, e in jours(medecin_id, date_debut, date_fin).items()}
+
+
+def nom_medecin(medecin_id):
+    """(nom_med, prenom_med) d'un médecin, mis en cache"""
+    cle = f"medecin:{medecin_id}"
+    trouve, jetons = _lire([cle])
+    if cle in trouve:
+        return trouve[cle]
+    from .models import Medecin
+
+    nom = Medecin.objects.filter(pk=medecin_id).values_list('nom_med', 'prenom_med').first()
+    if nom is not None:
+        _ecrire({cle: nom}, jetons)
+    return nom
+
+
+def creneaux_libres_jour(medecin_id, date):
+    """
+    Créneaux libres d'une journée, dans le même format que CreneauSerializer,
+    triés par heure de début. Retourne None si le médecin n'existe pas.
+    """
+    nom = nom_medecin(medecin_id)
+    if nom is None:
+        return None
+    entree = jour(medecin_id, date)
+    return [{
+        'id': cid,
+        'medecin_nom': nom[0],
+        'medecin_prenom': nom[1],
+        'date': str(date),
+        'heure_debut': _heure_str(entree.debuts[i]),
+        'heure_fin': _heure_str(entree.fins[i]),
+        'libre': True,
+        'medecin': medecin_id,
+    } for i, cid in enumerate(entree.ids) if entree.libres >> i & 1]
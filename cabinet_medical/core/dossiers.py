@@ -0,0 +1,64 @@
+# core/dossiers.py
+"""
+Dossier patient complet en une réponse : patient, dossier médical, maladies,
+vaccins, allergies, RDV à venir et organismes d'assurance.
+
+Servi par patients/{id}/bundle/ et patients/bundle/?cin=... Le nombre de
+requêtes SQL est fixe (patient + dossier en jointure, puis un préchargement
+par liste), quel que soit le contenu du dossier.
+"""
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .models import (
+    Patient, RDV, MaladieDossier, VaccinDossier, AllergieDossier, PatientOrganisme
+)
+from .serializers import (
+    PatientSerializer, DossierMedicalSerializer, MaladieDossierSerializer,
+    VaccinDossierSerializer, AllergieDossierSerializer, RDVSerializer,
+    PatientOrganismeSerializer
+)
+
+
+def patients_avec_dossier(aujourdhui=None):
+    """Queryset des patients avec tout le contenu du dossier préchargé"""
+    aujourdhui = aujourdhui or timezone.localdate()
+    return Patient.objects.select_related('employe', 'dossiermedical').prefetch_related(
+        Prefetch('dossiermedical__maladiedossier_set',
+                 queryset=MaladieDossier.objects.select_related('maladie').order_by('pk')),
+        Prefetch('dossiermedical__vaccindossier_set',
+                 queryset=VaccinDossier.objects.select_related('vaccin').order_by('pk')),
+        Prefetch('dossiermedical__allergiedossier_set',
+                 queryset=AllergieDossier.objects.select_related('allergie').order_by('pk')),
+        Prefetch('rdv_set', to_attr='rdvs_a_venir', queryset=RDV.objects.filter(
+            creneau__date__gte=aujourdhui
+        ).exclude(statut='ANNULE').select_related(
+            'patient', 'medecin', 'creneau__medecin'
+        ).order_by('creneau__date', 'creneau__heure_debut')),
+        Prefetch('patientorganisme_set',
+                 queryset=PatientOrganisme.objects.select_related('organisme').order_by('pk')),
+    )
+
+
+def serialiser_dossier(patient):
+    """
+    Contenu du dossier d'un patient chargé par patients_avec_dossier().
+    Les serializers sont créés sans requête : ?fields= / ?expand= ne s'appliquent
+    pas aux listes imbriquées (creneau_details est inclus).
+    """
+    dossier = getattr(patient, 'dossiermedical', None)
+    return {
+        'patient': PatientSerializer(patient).data,
+        'dossier': DossierMedicalSerializer(dossier).data if dossier else None,
+        'maladies': MaladieDossierSerializer(
+            dossier.maladiedossier_set.all() if dossier else [], many=True
+        ).data,
+        'vaccins': VaccinDossierSerializer(
+            dossier.vaccindossier_set.all() if dossier else [], many=True
+        ).data,
+        'allergies': AllergieDossierSerializer(
+            dossier.allergiedossier_set.all() if dossier else [], many=True
+        ).data,
+        'rdvs_a_venir': RDVSerializer(patient.rdvs_a_venir, many=True).data,
+        'organismes': PatientOrganismeSerializer(patient.patientorganisme_set.all(), many=True).data,
+    }
@@ -0,0 +1,107 @@
+# core/espace_medecin.py
+"""
+Espace de consultation du médecin, chargé en une réponse à l'ouverture d'un RDV
+(rdvs/{id}/espace-consultation/) :
+  - le RDV, le patient, son dossier médical et ses allergies ;
+  - la consultation du RDV (la plus récente), ses actes, ordonnances,
+    prescriptions d'analyses et de radios ;
+  - l'historique : les consultations précédentes du patient (tous RDV et
+    médecins confondus), des plus récentes aux plus anciennes, bornées à
+    HISTORIQUE_MAX ;
+  - la chaîne de suivi : consultation initiale et consultations de contrôle
+    reliées par consultation_initiale, dans l'ordre chronologique.
+Le RDV et la consultation sont lus avec leurs relations préchargées ; la chaîne
+de suivi coûte une requête d'identifiants par niveau (en pratique un ou deux).
+"""
+from django.db.models import Prefetch
+
+from .models import (
+    RDV, Consultation, ConsultationActe, AllergieDossier, Ordonnance, OrdonnanceAnalyse,
+    OrdonnanceRadio
+)
+from .serializers import (
+    RDVSerializer, PatientSerializer, DossierMedicalSerializer, AllergieDossierSerializer,
+    ConsultationSerializer, OrdonnanceSerializer, OrdonnanceAnalyseSerializer,
+    OrdonnanceRadioSerializer
+)
+
+
+PROFONDEUR_SUIVI_MAX = 20  # protège d'un cycle consultation_initiale
+HISTORIQUE_MAX = 50  # consultations précédentes renvoyées
+
+
+def _consultations():
+    return Consultation.objects.select_related('rdv__patient', 'medecin').prefetch_related(
+        Prefetch('consultationacte_set',
+                 queryset=ConsultationActe.objects.select_related('acte').order_by('pk')),
+    )
+
+
+def _chaine_suivi(consultation):
+    """Identifiants de la chaîne de suivi : remonte à la consultation initiale puis descend"""
+    racine, vus = consultation.pk, {consultation.pk}
+    initiale = consultation.consultation_initiale_id
+    while initiale and initiale not in vus and len(vus) < PROFONDEUR_SUIVI_MAX:
+        vus.add(initiale)
+        racine = initiale
+        initiale = Consultation.objects.filter(pk=initiale).values_list(
+            'consultation_initiale_id', flat=True
+        ).first()
+
+    chaine, niveau = {racine}, [racine]
+    while niveau and len(chaine) < PROFONDEUR_SUIVI_MAX:
+        niveau = [
+            pk for pk in Consultation.objects.filter(consultation_initiale_id__in=niveau).values_list('pk', flat=True)
+            if pk not in chaine
+        ]
+        chaine.update(niveau)
+    return chaine
+
+
+def espace_consultation(rdv_id):
+    """Contenu de l'espace de consultation d'un RDV, ou None si le RDV n'existe pas"""
+    rdv = RDV.objects.select_related(
+        'patient__employe', 'patient__dossiermedical', 'medecin', 'creneau__medecin'
+    ).filter(pk=rdv_id).first()
+    if rdv is None:
+        return None
+
+    patient = rdv.patient
+    dossier = getattr(patient, 'dossiermedical', None)
+    allergies = AllergieDossier.objects.filter(
+        dossier__patient_id=patient.pk
+    ).select_related('allergie').order_by('pk') if dossier else []
+
+    consultation = _consultations().prefetch_related(
+        Prefetch('ordonnance_set', queryset=Ordonnance.objects.order_by('pk')),
+        Prefetch('ordonnanceanalyse_set', queryset=OrdonnanceAnalyse.objects.select_related('analyse').order_by('pk')),
+        Prefetch('ordonnanceradio_set', queryset=OrdonnanceRadio.objects.select_related('radio').order_by('pk')),
+    ).filter(rdv_id=rdv.pk).order_by('-pk').first()
+
+    historique = _consultations().filter(rdv__patient_id=patient.pk).exclude(
+        rdv_id=rdv.pk
+    ).order_by('-date_cons', '-pk')[:HISTORIQUE_MAX]
+
+    suivi = []
+    chaine = _chaine_suivi(consultation) if consultation else set()
+    if len(chaine) > 1:
+        suivi = _consultations().filter(pk__in=chaine).order_by('date_cons', 'pk')
+
+    return {
+        'rdv': RDVSerializer(rdv).data,
+        'patient': PatientSerializer(patient).data,
+        'dossier': DossierMedicalSerializer(dossier).data if dossier else None,
+        'allergies': AllergieDossierSerializer(allergies, many=True).data,
+        'consultation': ConsultationSerializer(consultation).data if consultation else None,
+        'ordonnances': OrdonnanceSerializer(
+            consultation.ordonnance_set.all() if consultation else [], many=True
+        ).data,
+        'ordonnances_analyses': OrdonnanceAnalyseSerializer(
+            consultation.ordonnanceanalyse_set.all() if consultation else [], many=True
+        ).data,
+        'ordonnances_radios': OrdonnanceRadioSerializer(
+            consultation.ordonnanceradio_set.all() if consultation else [], many=True
+        ).data,
+        'historique': ConsultationSerializer(historique, many=True).data,
+        'suivi': ConsultationSerializer(suivi, many=True).data,
+    }
@@ -0,0 +1,134 @@
+# core/evenements.py
+"""
+Diffusion en temps réel des changements (salle d'attente, réservations).
+
+Les écritures journalisées par core/modifications.py sont publiées, après le
+commit, sur un broker pub/sub. Le flux Server-Sent Events GET /api/evenements/
+(servi par l'application ASGI, cabinet_medical/asgi.py) les transmet aux écrans
+abonnés : le serveur ne travaille que lorsqu'il y a des changements.
+
+Broker configurable via settings.EVENEMENTS_BROKER (défaut :
+'core.evenements.LocalBroker', en mémoire, limité à un seul processus ASGI).
+Un broker doit fournir abonner(modeles) -> Abonnement, desabonner(abonnement)
+et publier(evenement).
+"""
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.module_loading import import_string
+
+
+TAILLE_FILE = 100
+KEEPALIVE = 15  # secondes
+
+
+class Abonnement:
+    """File d'événements d'un écran abonné (consommée dans sa boucle asyncio)"""
+
+    def __init__(self, modeles=None):
+        self.modeles = set(modeles) if modeles else None
+        self.boucle = asyncio.get_running_loop()
+        self.file = asyncio.Queue(maxsize=TAILLE_FILE)
+
+    def accepte(self, evenement):
+        return self.modeles is None or evenement['modele'] in self.modeles
+
+    def deposer(self, evenement):
+        """Appelé dans la boucle de l'abonné ; en cas de retard, demande une resynchronisation"""
+        try:
+            self.file.put_nowait(evenement)
+        except asyncio.QueueFull:
+            while not self.file.empty():
+                self.file.get_nowait()
+            self.file.put_nowait({'modele': '*', 'resync': True})
+
+
+class LocalBroker:
+    """Pub/sub en mémoire du processus"""
+
+    def __init__(self):
+        self._abonnements = set()
+        self._verrou = threading.Lock()
+
+    def abonner(self, modeles=None):
+        abonnement = Abonnement(modeles)
+        with self._verrou:
+            self._abonnements.add(abonnement)
+        return abonnement
+
+    def desabonner(self, abonnement):
+        with self._verrou:
+            self._abonnements.discard(abonnement)
+
+    def publier(self, evenement):
+        with self._verrou:
+            abonnements = list(self._abonnements)
+        for abonnement in abonnements:
+            if abonnement.accepte(evenement):
+                try:
+                    abonnement.boucle.call_soon_threadsafe(abonnement.deposer, evenement)
+                except RuntimeError:  # boucle fermée : l'écran s'est déconnecté
+                    self.desabonner(abonnement)
+
+
+_broker = None
+_broker_verrou = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_verrou:
+            if _broker is None:
+                _broker = import_string(getattr(settings, 'EVENEMENTS_BROKER', 'core.evenements.LocalBroker'))()
+    return _broker
+
+
+def publier(evenement):
+    get_broker().publier(evenement)
+
+
+# ===== FLUX SERVER-SENT EVENTS =====
+
+def _sse(evenement):
+    return f"event: {evenement['modele']}\ndata: {json.dumps(evenement, default=str)}\n\n"
+
+
+async def _flux(abonnement):
+    broker = get_broker()
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                evenement = await asyncio.wait_for(abonnement.file.get(), timeout=KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield _sse(evenement)
+    finally:
+        broker.desabonner(abonnement)
+
+
+async def flux_evenements(request):
+    """
+    GET /api/evenements/?modeles=rdv,creneau
+    Flux text/event-stream ; chaque événement :
+    {"modele": "rdv", "ids": [12], "supprime": false, "details": {"statut": "CONFIRME", ...}}
+    Un événement {"resync": true} demande au client de recharger ses listes.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'error': "Le flux d'événements nécessite le serveur ASGI (cabinet_medical.asgi:application)"},
+            status=501
+        )
+
+    modeles = [m for m in request.GET.get('modeles', '').split(',') if m]
+    abonnement = get_broker().abonner(modeles)
+    response = StreamingHttpResponse(_flux(abonnement), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
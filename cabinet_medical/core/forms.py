@@ -1,5 +1,6 @@
 from django import forms
 from .models import RDV, Creneau
+from .planning import creneaux_libres_a_venir
 
 
 class RDVForm(forms.ModelForm):
@@ -16,14 +17,12 @@ class RDVForm(forms.ModelForm):
         if 'medecin' in self.data:
             try:
                 medecin_id = int(self.data.get('medecin'))
-                self.fields['creneau'].queryset = Creneau.objects.filter(
-                    medecin_id=medecin_id,
-                    libre=True
-                )
+                self.fields['creneau'].queryset = creneaux_libres_a_venir(
+                    Creneau.objects.filter(medecin_id=medecin_id)
+                ).select_related('medecin')
             except (ValueError, TypeError):
                 pass
         elif self.instance.pk:
-            self.fields['creneau'].queryset = Creneau.objects.filter(
-                medecin=self.instance.medecin,
-                libre=True
-            )
+            self.fields['creneau'].queryset = creneaux_libres_a_venir(
+                Creneau.objects.filter(medecin_id=self.instance.medecin_id)
+            ).select_related('medecin')
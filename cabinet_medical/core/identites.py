@@ -0,0 +1,94 @@
+# core/identites.py
+"""
+Carte d'identités par requête : un objet chargé par une clé étrangère n'est lu
+qu'une fois pendant la requête.
+
+Les __str__ des modèles (ConsultationActe, Ordonnance, OrdonnanceRadio,
+VaccinDossier...), les listes de l'admin et les validations (RDV.clean)
+déréférencent souvent les mêmes Medecin / Patient / Consultation. Sans
+select_related, chaque accès `objet.medecin` relit le médecin en base ; avec la
+carte, le premier accès le charge et les suivants (sur d'autres lignes)
+réutilisent la même instance.
+
+Activée pour chaque requête HTTP par carte_identites_middleware, ou localement :
+
+    with carte_identites():
+        for acte in ConsultationActe.objects.all():
+            str(acte)
+
+Les entrées sont retirées quand l'objet est enregistré ou supprimé (signaux,
+voir core/signals.py). Les écritures sans signal (queryset.update()) ne sont
+pas vues : relire explicitement l'objet après un update() dans la même requête.
+"""
+import contextvars
+from inspect import iscoroutinefunction
+
+from django.db.models.fields.related_descriptors import ForwardManyToOneDescriptor
+from django.utils.decorators import sync_and_async_middleware
+
+
+_carte = contextvars.ContextVar('carte_identites', default=None)
+
+
+class carte_identites:
+    """Active une carte d'identités (dict (modèle, base, pk) -> instance) pour le bloc"""
+
+    def __enter__(self):
+        self.objets = {}
+        self._jeton = _carte.set(self.objets)
+        return self.objets
+
+    def __exit__(self, *exc):
+        _carte.reset(self._jeton)
+        return False
+
+
+def _cle(modele, base, pk):
+    return modele._meta.concrete_model, base, pk
+
+
+def oublier(instance):
+    """Retire un objet de la carte courante (après enregistrement ou suppression)"""
+    objets = _carte.get()
+    if objets:
+        objets.pop(_cle(type(instance), instance._state.db, instance.pk), None)
+
+
+# ===== CHARGEMENT DES CLÉS ÉTRANGÈRES =====
+
+_get_object_precedent = None
+
+
+def _get_object_carte(self, instance):
+    objets = _carte.get()
+    if objets is None or not self.field.target_field.primary_key:
+        return _get_object_precedent(self, instance)
+
+    cle = _cle(self.field.related_model, instance._state.db, getattr(instance, self.field.attname))
+    objet = objets.get(cle)
+    if objet is None:
+        objet = objets[cle] = _get_object_precedent(self, instance)
+    return objet
+
+
+def installer():
+    """Appelé par CoreConfig.ready(), après l'éventuelle surveillance des chargements (DEBUG)"""
+    global _get_object_precedent
+    if ForwardManyToOneDescriptor.get_object is not _get_object_carte:
+        _get_object_precedent = ForwardManyToOneDescriptor.get_object
+        ForwardManyToOneDescriptor.get_object = _get_object_carte
+
+
+# ===== MIDDLEWARE =====
+
+@sync_and_async_middleware
+def carte_identites_middleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            with carte_identites():
+                return await get_response(request)
+    else:
+        def middleware(request):
+            with carte_identites():
+                return get_response(request)
+    return middleware
@@ -0,0 +1,327 @@
+# core/lecture_rapide.py
+"""
+Lecture rapide des grandes listes (rdvs/, creneaux/, consultations/, factures/).
+
+Le chemin normal instancie chaque objet du modèle puis le serializer le rend
+champ par champ. Pour une liste GET en JSON, LectureRapideMixin compile une
+fois le serializer (après ?fields= / ?expand=) en correspondances
+champ -> colonne, lit les lignes avec values() et construit directement les
+dictionnaires de la réponse, rendus par orjson s'il est installé.
+
+La sortie est identique octet pour octet à celle du serializer. Tout ce que la
+compilation ne sait pas reproduire exactement fait revenir au chemin normal :
+SerializerMethodField sans équivalent dans Meta.colonnes_methodes, source='*',
+chemins pointés à travers une relation nullable, relations multiples imbriquées,
+flottants qu'orjson n'écrit pas comme json (notation exponentielle).
+
+    class FactureSerializer(...):
+        montant_calcule = serializers.SerializerMethodField()
+
+        class Meta:
+            colonnes_methodes = {'montant_calcule': 'montant_total'}
+
+Désactivé par défaut : activation par LECTURE_RAPIDE = True dans settings.py,
+une fois la sortie vérifiée sur les données réelles (LectureRapideTests).
+"""
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .requetes import _relation
+
+try:
+    import orjson
+except ImportError:  # dépendance optionnelle : json de la bibliothèque standard
+    orjson = None
+
+
+# Champs dont to_representation renvoie la valeur lue en base telle quelle
+CHAMPS_IDENTITE = (
+    serializers.IntegerField, serializers.CharField, serializers.BooleanField,
+    serializers.ChoiceField, serializers.PrimaryKeyRelatedField,
+)
+
+# json écrit 1e+16 / 1e-05 là où orjson écrit 1e16 / 0.00001
+FLOTTANT_MIN, FLOTTANT_MAX = 1e-4, 1e16
+
+
+class FormatNonGaranti(Exception):
+    """Valeur que le rendu rapide n'écrirait pas comme le chemin normal"""
+
+
+class LignesRapides(list):
+    """Données construites par le chemin rapide (rendues par orjson)"""
+
+
+# ===== RENDU JSON =====
+
+class JSONRapideRenderer(JSONRenderer):
+    """
+    JSONRenderer qui passe par orjson pour les LignesRapides (types simples
+    uniquement) ; toute autre réponse est rendue par JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or not isinstance(data, LignesRapides)
+                or self.get_indent(accepted_media_type, renderer_context or {})):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Comme JSONRenderer : U+2028 / U+2029 échappés pour l'inclusion dans du JavaScript
+        return orjson.dumps(data).replace(
+            '\u2028'.encode(), b'\\u2028'
+        ).replace(
+            '\u2029'.encode(), b'\\u2029'
+        )
+
+
+# ===== COMPILATION DES SERIALIZERS =====
+
+def _copie(champ):
+    """Champ neuf équivalent, détaché du serializer (et donc de la requête)"""
+    return champ.__class__(*champ._args, **champ._kwargs)
+
+
+def _flottant(cle, convertir=True):
+    def lire(ligne):
+        valeur = ligne[cle]
+        if valeur is None:
+            return None
+        if convertir:
+            valeur = float(valeur)
+        if valeur and not FLOTTANT_MIN <= abs(valeur) < FLOTTANT_MAX:
+            raise FormatNonGaranti(cle)
+        return valeur
+    return lire
+
+
+def _converti(cle, convertir):
+    def lire(ligne):
+        valeur = ligne[cle]
+        return None if valeur is None else convertir(valeur)
+    return lire
+
+
+def _imbrique(cle, lecteur):
+    def lire(ligne):
+        return None if ligne[cle] is None else lecteur.construire(ligne)
+    return lire
+
+
+def _liste(nom):
+    def lire(ligne, listes):
+        return listes[nom].get(ligne['pk'], [])
+    return lire
+
+
+def _chemin(modele, attributs, prefixe):
+    """
+    Chemin ORM d'une suite d'attributs à travers des clés étrangères non nulles.
+    Retourne (modèle d'arrivée, chemin) ou None.
+    """
+    chemin = prefixe
+    for attribut in attributs:
+        relation = _relation(modele, attribut)
+        if relation is None or not relation.concrete or not (relation.many_to_one or relation.one_to_one):
+            return None
+        if relation.null:
+            return None  # le serializer omettrait le champ (SkipField)
+        chemin = f"{chemin}__{attribut}" if chemin else attribut
+        modele = relation.related_model
+    return modele, chemin
+
+
+def _colonne(modele, attributs, prefixe):
+    """(champ du modèle, chemin ORM) de la colonne désignée par `attributs`, ou None"""
+    trouve = _chemin(modele, attributs[:-1], prefixe)
+    if trouve is None:
+        return None
+    modele, chemin = trouve
+    try:
+        champ_modele = modele._meta.get_field(attributs[-1])
+    except FieldDoesNotExist:
+        return None
+    if not champ_modele.concrete:
+        return None
+    return champ_modele, f"{chemin}__{attributs[-1]}" if chemin else attributs[-1]
+
+
+class Lecteur:
+    """Correspondances compilées champ du serializer -> colonnes de values()"""
+
+    def __init__(self):
+        self.entrees = []     # (nom, lire(ligne)) dans l'ordre du serializer
+        self.colonnes = []    # chemins à passer à values()
+        self.listes = {}      # nom -> (modèle enfant, clé étrangère, lecteur enfant)
+
+    def colonne(self, chemin):
+        if chemin not in self.colonnes:
+            self.colonnes.append(chemin)
+        return chemin
+
+    def construire(self, ligne, listes=None):
+        objet = {}
+        for nom, lire in self.entrees:
+            objet[nom] = lire(ligne, listes) if nom in self.listes else lire(ligne)
+        return objet
+
+    def lire(self, lignes):
+        """Dictionnaires de la réponse pour des lignes de values()"""
+        listes = {nom: self._lire_liste(lignes, *liste) for nom, liste in self.listes.items()}
+        return LignesRapides(self.construire(ligne, listes) for ligne in lignes)
+
+    @staticmethod
+    def _lire_liste(lignes, modele, cle_etrangere, lecteur):
+        """Lignes enfants groupées par parent (une requête, ordre du préchargement)"""
+        groupes = {}
+        parents = [ligne['pk'] for ligne in lignes]
+        if not parents:
+            return groupes
+        enfants = modele._default_manager.filter(**{f'{cle_etrangere}__in': parents}).order_by(
+            *(modele._meta.ordering or ['pk'])
+        ).values(cle_etrangere, *lecteur.colonnes)
+        for enfant in enfants:
+            groupes.setdefault(enfant[cle_etrangere], []).append(lecteur.construire(enfant))
+        return groupes
+
+
+def compiler(serializer, modele, prefixe='', lecteur=None, listes_permises=True):
+    """
+    Compile un ModelSerializer en Lecteur. Les serializers imbriqués partagent
+    les colonnes du parent (jointures de values()). Retourne None si un champ
+    ne peut pas être reproduit exactement.
+    """
+    lecteur = lecteur or Lecteur()
+    colonnes_methodes = getattr(getattr(serializer, 'Meta', None), 'colonnes_methodes', {})
+
+    for nom, champ in serializer.fields.items():
+        if champ.write_only:
+            continue
+        if champ.source == '*' and not isinstance(champ, serializers.SerializerMethodField):
+            return None
+
+        if isinstance(champ, serializers.SerializerMethodField):
+            if nom not in colonnes_methodes:
+                return None
+            trouve = _colonne(modele, colonnes_methodes[nom].split('__'), prefixe)
+            if trouve is None:
+                return None
+            champ_modele, chemin = trouve
+            cle = lecteur.colonne(chemin)
+            lire = _flottant(cle, convertir=False) if champ_modele.get_internal_type() == 'FloatField' else itemgetter(cle)
+
+        elif isinstance(champ, serializers.ListSerializer):
+            enfant = champ.child
+            if not listes_permises or prefixe or len(champ.source_attrs) != 1:
+                return None
+            relation = _relation(modele, champ.source_attrs[0])
+            if (relation is None or not relation.one_to_many or relation.concrete
+                    or not isinstance(enfant, serializers.ModelSerializer)
+                    or relation.field.target_field != modele._meta.pk):
+                return None
+            lecteur_enfant = compiler(enfant, relation.related_model, listes_permises=False)
+            if lecteur_enfant is None:
+                return None
+            lecteur.listes[nom] = (relation.related_model, relation.field.attname, lecteur_enfant)
+            lire = _liste(nom)
+
+        elif isinstance(champ, serializers.BaseSerializer):
+            if not isinstance(champ, serializers.ModelSerializer):
+                return None
+            trouve = _chemin(modele, champ.source_attrs[:-1], prefixe)
+            relation = trouve and _relation(trouve[0], champ.source_attrs[-1])
+            if (relation is None or not relation.concrete
+                    or not (relation.many_to_one or relation.one_to_one)):
+                return None
+            chemin = f"{trouve[1]}__{relation.name}" if trouve[1] else relation.name
+            cle = lecteur.colonne(chemin)
+            sous_lecteur = Lecteur()
+            sous_lecteur.colonnes = lecteur.colonnes  # mêmes lignes, mêmes colonnes
+            if compiler(champ, relation.related_model, chemin, sous_lecteur, listes_permises=False) is None:
+                return None
+            lire = _imbrique(cle, sous_lecteur)
+
+        elif isinstance(champ, serializers.PrimaryKeyRelatedField):
+            if champ.pk_field is not None:
+                return None
+            trouve = _colonne(modele, champ.source_attrs, prefixe)
+            if trouve is None or not trouve[0].is_relation:
+                return None
+            lire = itemgetter(lecteur.colonne(trouve[1]))
+
+        elif isinstance(champ, (serializers.RelatedField, serializers.ManyRelatedField)):
+            return None
+
+        else:
+            trouve = _colonne(modele, champ.source_attrs, prefixe)
+            if trouve is None or trouve[0].is_relation:
+                return None
+            cle = lecteur.colonne(trouve[1])
+            if type(champ) is serializers.FloatField:
+                lire = _flottant(cle)
+            elif type(champ) in CHAMPS_IDENTITE:
+                lire = itemgetter(cle)
+            else:
+                lire = _converti(cle, _copie(champ).to_representation)
+
+        lecteur.entrees.append((nom, lire))
+    return lecteur
+
+
+_lecteurs = {}
+
+
+def lecteur_pour(serializer, modele):
+    """Lecteur compilé (mis en cache par classe de serializer et champs rendus)"""
+    cle = (type(serializer), modele, tuple(serializer.fields))
+    if cle not in _lecteurs:
+        _lecteurs[cle] = compiler(serializer, modele)
+    return _lecteurs[cle]
+
+
+# ===== MIXIN =====
+
+class LectureRapideMixin:
+    """
+    Chemin rapide de l'action list. À placer après PlanRequetesMixin et
+    SuiviModificationsMixin (ETag, ?since=) qui appellent ce list().
+    """
+    renderer_classes = [JSONRapideRenderer] + [
+        classe for classe in api_settings.DEFAULT_RENDERER_CLASSES
+        if not issubclass(classe, JSONRenderer)
+    ]
+
+    def lecteur_rapide(self, request):
+        """Lecteur de la requête courante, ou None pour le chemin normal"""
+        if not getattr(settings, 'LECTURE_RAPIDE', False):
+            return None
+        renderer = getattr(request, 'accepted_renderer', None)
+        if not isinstance(renderer, JSONRapideRenderer):
+            return None
+        if renderer.get_indent(request.accepted_media_type, {}):
+            return None
+        serializer = self.get_serializer()
+        if not isinstance(serializer, serializers.ModelSerializer):
+            return None
+        return lecteur_pour(serializer, self.queryset.model)
+
+    def list(self, request, *args, **kwargs):
+        lecteur = self.lecteur_rapide(request)
+        if lecteur is None:
+            return super().list(request, *args, **kwargs)
+
+        modele = self.queryset.model
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None).values(
+            'pk', *lecteur.colonnes, *self._colonnes_tri(modele)
+        )
+        page = self.paginate_queryset(queryset)
+        try:
+            data = lecteur.lire(page if page is not None else list(queryset))
+        except FormatNonGaranti:
+            return super().list(request, *args, **kwargs)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
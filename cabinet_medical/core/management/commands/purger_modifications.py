@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import modifications
+from core.models import Modification
+
+
+class Command(BaseCommand):
+    help = "Purge le journal des modifications (les clients plus anciens rechargeront leur liste complète)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jours', type=int, default=2, help="Nombre de jours d'historique conservés")
+
+    def handle(self, *args, **options):
+        avant = timezone.now() - timedelta(days=options['jours'])
+        total = 0
+        for modele in Modification.objects.values_list('modele', flat=True).distinct().order_by():
+            total += modifications.purger(modele, avant)
+        self.stdout.write(self.style.SUCCESS(f"{total} entrée(s) supprimée(s) du journal"))
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import disponibilites
+from core.models import Medecin
+
+
+class Command(BaseCommand):
+    help = "Reconstruit le cache des disponibilités (bitmaps par médecin et par jour)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jours', type=int, default=60, help="Nombre de jours à partir d'aujourd'hui")
+        parser.add_argument('--medecin', type=int, action='append', help="Limiter à un médecin (répétable)")
+
+    def handle(self, *args, **options):
+        debut = timezone.localdate()
+        fin = debut + timedelta(days=max(options['jours'], 1) - 1)
+        medecin_ids = options['medecin'] or list(Medecin.objects.values_list('id_med', flat=True))
+
+        disponibilites.vider()
+        entrees = disponibilites.reconstruire(medecin_ids, debut, fin)
+        self.stdout.write(self.style.SUCCESS(
+            f"{entrees} journée(s) mises en cache pour {len(medecin_ids)} médecin(s) du {debut} au {fin}"
+        ))
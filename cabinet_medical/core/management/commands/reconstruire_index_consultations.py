@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core import recherche_texte
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index plein texte des consultations (diagnostics et ordonnances)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Nombre de consultations par lot")
+
+    def handle(self, *args, **options):
+        consultations, lignes = recherche_texte.reconstruire(batch_size=max(options['batch_size'], 1))
+        self.stdout.write(self.style.SUCCESS(f"{consultations} consultation(s) indexée(s), {lignes} occurrence(s)"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core import recherche
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche des patients (jetons des noms, prénoms, CIN et téléphones)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Nombre de patients par lot")
+
+    def handle(self, *args, **options):
+        patients, jetons = recherche.reconstruire(batch_size=max(options['batch_size'], 1))
+        self.stdout.write(self.style.SUCCESS(f"{patients} patient(s) indexé(s), {jetons} jeton(s)"))
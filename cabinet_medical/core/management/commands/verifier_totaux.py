@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from core import totaux
+
+
+class Command(BaseCommand):
+    help = "Vérifie (et répare avec --reparer) les totaux stockés des consultations et des factures"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reparer', action='store_true', help="Recalculer les totaux incorrects")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Taille des lots de réparation")
+
+    def handle(self, *args, **options):
+        consultations, factures = totaux.verifier(reparer=options['reparer'], batch_size=options['batch_size'])
+        if not consultations and not factures:
+            self.stdout.write(self.style.SUCCESS("Tous les totaux sont corrects"))
+            return
+
+        message = f"{consultations} consultation(s) et {factures} facture(s) avec des totaux incorrects"
+        if options['reparer']:
+            self.stdout.write(self.style.SUCCESS(f"{message} : réparés"))
+        else:
+            self.stdout.write(self.style.WARNING(f"{message} (relancer avec --reparer)"))
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:16
+
+from django.db import migrations, models
+
+
+def supprimer_creneaux_doublons(apps, schema_editor):
+    """
+    Les anciens générateurs pouvaient créer jusqu'à trois fois le même créneau.
+    On conserve un seul créneau par (medecin, date, heure_debut) : de préférence
+    celui référencé par un RDV, sinon le plus ancien. Les RDV pointant sur un
+    doublon sont rattachés au créneau conservé.
+    """
+    Creneau = apps.get_model('core', 'Creneau')
+    RDV = apps.get_model('core', 'RDV')
+
+    reserves = set(RDV.objects.exclude(creneau__isnull=True).values_list('creneau_id', flat=True))
+    conserves = {}
+    doublons = {}
+
+    for creneau_id, medecin_id, date, heure_debut in Creneau.objects.order_by('id').values_list(
+        'id', 'medecin_id', 'date', 'heure_debut'
+    ):
+        cle = (medecin_id, date, heure_debut)
+        if cle not in conserves:
+            conserves[cle] = creneau_id
+        elif creneau_id in reserves and conserves[cle] not in reserves:
+            doublons[conserves[cle]] = creneau_id
+            conserves[cle] = creneau_id
+        else:
+            doublons[creneau_id] = conserves[cle]
+
+    for doublon_id, garde_id in doublons.items():
+        if doublon_id in reserves:
+            RDV.objects.filter(creneau_id=doublon_id).update(creneau_id=garde_id)
+            Creneau.objects.filter(id=garde_id).update(libre=False)
+
+    if doublons:
+        Creneau.objects.filter(id__in=list(doublons)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_alter_patient_cin'),
+    ]
+
+    operations = [
+        migrations.RunPython(supprimer_creneaux_doublons, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='creneau',
+            constraint=models.UniqueConstraint(fields=('medecin', 'date', 'heure_debut'), name='unique_creneau_medecin_date_heure'),
+        ),
+    ]
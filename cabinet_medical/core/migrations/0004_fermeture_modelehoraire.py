@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_creneau_unique_creneau_medecin_date_heure'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Fermeture',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('motif', models.CharField(blank=True, max_length=100)),
+                ('medecin', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.medecin')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ModeleHoraire',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(blank=True, max_length=100)),
+                ('jours_semaine', models.CharField(default='0,1,2,3,4', max_length=20)),
+                ('heure_debut', models.TimeField()),
+                ('heure_fin', models.TimeField()),
+                ('duree_creneau', models.PositiveIntegerField(default=30)),
+                ('actif', models.BooleanField(default=True)),
+                ('medecin', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.medecin')),
+            ],
+        ),
+    ]
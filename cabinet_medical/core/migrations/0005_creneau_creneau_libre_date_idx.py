@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_fermeture_modelehoraire'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='creneau',
+            index=models.Index(fields=['libre', 'date', 'heure_debut', 'medecin'], name='creneau_libre_date_idx'),
+        ),
+    ]
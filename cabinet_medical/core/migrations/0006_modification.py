@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_creneau_creneau_libre_date_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Modification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modele', models.CharField(max_length=50)),
+                ('objet_id', models.BigIntegerField(blank=True, null=True)),
+                ('supprime', models.BooleanField(default=False)),
+                ('date', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['modele', 'id'], name='modification_modele_idx')],
+            },
+        ),
+    ]
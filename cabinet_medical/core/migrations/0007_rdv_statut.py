@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_modification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rdv',
+            name='statut',
+            field=models.CharField(choices=[('RESERVE', 'Réservé'), ('CONFIRME', 'Confirmé'), ('EN_ATTENTE', 'En attente'), ('EN_CONSULTATION', 'En consultation'), ('TERMINE', 'Terminé'), ('ANNULE', 'Annulé')], default='RESERVE', max_length=20),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:05
+
+from django.db import migrations, models
+from django.db.models import Count, F, FloatField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def initialiser_totaux(apps, schema_editor):
+    """Calcule les totaux des consultations et factures existantes depuis leurs actes"""
+    Consultation = apps.get_model('core', 'Consultation')
+    ConsultationActe = apps.get_model('core', 'ConsultationActe')
+    Facture = apps.get_model('core', 'Facture')
+
+    actes = ConsultationActe.objects.filter(consultation_id=OuterRef('pk')).order_by().values('consultation_id')
+    total = Coalesce(Subquery(
+        actes.annotate(t=Sum(F('prix_applique') * F('quantite'), output_field=FloatField())).values('t'),
+        output_field=FloatField()
+    ), Value(0.0))
+    nombre = Coalesce(Subquery(actes.annotate(n=Count('id')).values('n'), output_field=IntegerField()), Value(0))
+    Consultation.objects.update(total_actes=total, nb_actes=nombre, montant_total=F('prix_cons') + total)
+
+    consultation = Consultation.objects.filter(pk=OuterRef('consultation_id'))
+    Facture.objects.update(**{
+        champ: Subquery(consultation.values(champ)[:1])
+        for champ in ('total_actes', 'nb_actes', 'montant_total')
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_rdv_statut'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='consultation',
+            name='montant_total',
+            field=models.FloatField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='consultation',
+            name='nb_actes',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='consultation',
+            name='total_actes',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='facture',
+            name='montant_total',
+            field=models.FloatField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='facture',
+            name='nb_actes',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='facture',
+            name='total_actes',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(initialiser_totaux, migrations.RunPython.noop),
+    ]
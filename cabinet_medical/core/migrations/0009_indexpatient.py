@@ -0,0 +1,112 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:20
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# ===== DÉCOUPAGE FIGÉ =====
+# Copie de core/recherche.py à cette migration : les migrations n'importent pas
+# le code de l'application, qui peut évoluer (une évolution du découpage passe
+# par sa propre migration de réindexation)
+
+CHAMPS = ('nom_patient', 'prenom_patient', 'cin', 'telephone')
+LONGUEUR_MIN = 2     # préfixe le plus court indexé (et mot le plus court cherché)
+LONGUEUR_MAX = 40    # IndexPatient.jeton
+_SEPARATEURS = re.compile(r'[^0-9a-z]+')
+
+
+def normaliser(texte):
+    """Minuscules, sans accents"""
+    texte = unicodedata.normalize('NFKD', texte or '')
+    return ''.join(c for c in texte if not unicodedata.combining(c)).lower()
+
+
+def mots(texte):
+    return [mot for mot in _SEPARATEURS.split(normaliser(texte)) if mot]
+
+
+def normaliser_telephone(telephone):
+    """Chiffres du numéro au format national : +212 6 12.. / 00212 6 12.. -> 0612.."""
+    chiffres = re.sub(r'\D', '', telephone or '')
+    if chiffres.startswith('00212'):
+        return '0' + chiffres[5:]
+    if chiffres.startswith('212') and len(chiffres) == 12:
+        return '0' + chiffres[3:]
+    return chiffres
+
+
+def _mots_champ(champ, valeur):
+    if champ == 'telephone':
+        return [normaliser_telephone(valeur)]
+    if champ == 'cin':
+        return [''.join(mots(valeur))]
+    return mots(valeur)
+
+
+def jetons(champ, valeur):
+    """{jeton: complet} d'un champ : chaque mot entier et ses préfixes"""
+    resultat = {}
+    for mot in _mots_champ(champ, valeur):
+        mot = mot[:LONGUEUR_MAX]
+        for longueur in range(LONGUEUR_MIN, len(mot)):
+            resultat.setdefault(mot[:longueur], False)
+        if mot:
+            resultat[mot] = True
+    return resultat
+
+
+def lignes_index(patient):
+    """(champ, jeton, complet) à indexer pour un patient"""
+    return [
+        (champ, jeton, complet)
+        for champ in CHAMPS
+        for jeton, complet in jetons(champ, getattr(patient, champ)).items()
+    ]
+
+
+def indexer_patients(apps, schema_editor):
+    """Indexe les patients existants, par lots de 1000"""
+    Patient = apps.get_model('core', 'Patient')
+    IndexPatient = apps.get_model('core', 'IndexPatient')
+    dernier = None
+    while True:
+        lot = Patient.objects.order_by('pk').only('pk', *CHAMPS)
+        if dernier is not None:
+            lot = lot.filter(pk__gt=dernier)
+        lot = list(lot[:1000])
+        if not lot:
+            return
+        IndexPatient.objects.filter(patient_id__in=[p.pk for p in lot]).delete()
+        IndexPatient.objects.bulk_create([
+            IndexPatient(patient_id=patient.pk, champ=champ, jeton=jeton, complet=complet)
+            for patient in lot
+            for champ, jeton, complet in lignes_index(patient)
+        ], batch_size=1000)
+        dernier = lot[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_totaux_consultation_facture'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexPatient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('champ', models.CharField(max_length=20)),
+                ('jeton', models.CharField(max_length=40)),
+                ('complet', models.BooleanField(default=False)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jetons_recherche', to='core.patient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['jeton', 'patient'], name='indexpatient_jeton_idx')],
+            },
+        ),
+        migrations.RunPython(indexer_patients, migrations.RunPython.noop),
+    ]
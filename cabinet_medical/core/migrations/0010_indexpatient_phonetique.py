@@ -0,0 +1,192 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:05
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+# ===== DÉCOUPAGE FIGÉ =====
+# Copie de core/recherche.py à cette migration : les migrations n'importent pas
+# le code de l'application, qui peut évoluer (une évolution du découpage passe
+# par sa propre migration de réindexation)
+
+CHAMPS = ('nom_patient', 'prenom_patient', 'cin', 'telephone')
+CHAMPS_NOMS = ('nom_patient', 'prenom_patient')
+LONGUEUR_MIN = 2     # préfixe le plus court indexé (et mot le plus court cherché)
+LONGUEUR_MAX = 40    # IndexPatient.jeton
+PARTICULES = frozenset(('el', 'al', 'ben', 'bin', 'ibn', 'ait', 'ou', 'ould', 'de', 'du', 'des', 'la', 'le', 'd', 'l'))
+PARTICULES_COLLEES = ('el', 'al', 'ben')
+RESTE_DECOLLE_MIN = 5  # elamrani -> amrani, mais alaoui reste alaoui
+VOYELLES = frozenset('aeiouy')
+
+# Transcriptions équivalentes, appliquées dans l'ordre ; les codes en majuscules
+# ne sont plus touchés par les règles suivantes
+_EQUIVALENCES = [(re.compile(motif), code) for motif, code in (
+    (r'sch|ch|sh', 'X'),        # ش : Chraibi, Shraibi
+    (r'kh', 'K'),               # خ : Khalil, Kalil
+    (r'gh|rh', 'G'),            # غ : Ghali, Rhali
+    (r'dj|j', 'J'),             # ج : Khadidja, Khadija
+    (r'gu(?=[eiy])', 'G'),      # Guessous
+    (r'g(?=[eiy])', 'J'),       # Gilali, Jilali
+    (r'c(?=[eiy])', 'S'),
+    (r'ck|c|q|k', 'K'),         # ق : Qadiri, Kadiri
+    (r'dh', 'D'),
+    (r'th', 'T'),
+    (r'ph|f|v', 'F'),
+    (r'p|b', 'B'),
+    (r'ou|oo|w', 'u'),          # Ouazzani, Wazzani
+    (r'h', ''),                 # Mohamed, Moamed
+    (r'x', 'KS'),
+)]
+_SEPARATEURS = re.compile(r'[\W_]+')
+
+
+def normaliser(texte):
+    """Minuscules, sans accents"""
+    texte = unicodedata.normalize('NFKD', texte or '')
+    return ''.join(c for c in texte if not unicodedata.combining(c)).lower()
+
+
+def mots(texte):
+    return [mot for mot in _SEPARATEURS.split(normaliser(texte)) if mot]
+
+
+def normaliser_telephone(telephone):
+    """Chiffres du numéro au format national : +212 6 12.. / 00212 6 12.. -> 0612.."""
+    chiffres = re.sub(r'\D', '', telephone or '')
+    if chiffres.startswith('00212'):
+        return '0' + chiffres[5:]
+    if chiffres.startswith('212') and len(chiffres) == 12:
+        return '0' + chiffres[3:]
+    return chiffres
+
+
+def sans_particules(mots_nom):
+    """Mots d'un nom sans les particules séparées, sauf si le nom n'est fait que de particules"""
+    return [mot for mot in mots_nom if mot not in PARTICULES] or mots_nom
+
+
+def decoller(mot):
+    """Retire une particule collée en tête : elamrani -> amrani, benjelloun -> jelloun"""
+    for particule in PARTICULES_COLLEES:
+        if mot.startswith(particule) and len(mot) - len(particule) >= RESTE_DECOLLE_MIN:
+            return mot[len(particule):]
+    return mot
+
+
+def cle_phonetique(mot):
+    """
+    Clé phonétique d'un mot normalisé : transcriptions équivalentes unifiées,
+    voyelles ignorées sauf en tête (notée A), lettres répétées fusionnées.
+    mohamed, mouhammad -> MD ; youssef, yousef -> ASF ; chraibi, shraibi -> XRB
+    """
+    code = mot
+    for motif, remplacement in _EQUIVALENCES:
+        code = motif.sub(remplacement, code)
+    cle = []
+    for position, lettre in enumerate(code):
+        if lettre in VOYELLES:
+            if position:
+                continue
+            lettre = 'A'
+        lettre = lettre.upper()
+        if not cle or cle[-1] != lettre:
+            cle.append(lettre)
+    return ''.join(cle)[:LONGUEUR_MAX]
+
+
+def cles_phonetiques(valeur):
+    """Clés phonétiques d'un nom : chaque mot, avec et sans particule collée, et le nom compacté"""
+    tous = mots(valeur)
+    cles = set()
+    for mot in sans_particules(tous):
+        cles.add(cle_phonetique(mot))
+        cles.add(cle_phonetique(decoller(mot)))
+    if len(tous) > 1:
+        cles.add(cle_phonetique(''.join(tous)))
+    cles.discard('')
+    return cles
+
+
+def _mots_champ(champ, valeur):
+    if champ == 'telephone':
+        return [normaliser_telephone(valeur)]
+    if champ == 'cin':
+        return [''.join(mots(valeur))]
+    mots_nom = mots(valeur)
+    if len(mots_nom) > 1:  # "El Amrani" est aussi cherchable en "elamrani"
+        mots_nom.append(''.join(mots_nom))
+    return mots_nom
+
+
+def jetons(champ, valeur):
+    """{jeton: complet} d'un champ : chaque mot entier et ses préfixes"""
+    resultat = {}
+    for mot in _mots_champ(champ, valeur):
+        mot = mot[:LONGUEUR_MAX]
+        for longueur in range(LONGUEUR_MIN, len(mot)):
+            resultat.setdefault(mot[:longueur], False)
+        if mot:
+            resultat[mot] = True
+    return resultat
+
+
+def lignes_index(patient):
+    """(champ, jeton, complet, phonetique) à indexer pour un patient"""
+    lignes = [
+        (champ, jeton, complet, False)
+        for champ in CHAMPS
+        for jeton, complet in jetons(champ, getattr(patient, champ)).items()
+    ]
+    lignes += [
+        (champ, cle, True, True)
+        for champ in CHAMPS_NOMS
+        for cle in sorted(cles_phonetiques(getattr(patient, champ)))
+    ]
+    return lignes
+
+
+def reindexer_patients(apps, schema_editor):
+    """Réindexe les patients existants (jetons et clés phonétiques), par lots de 1000"""
+    Patient = apps.get_model('core', 'Patient')
+    IndexPatient = apps.get_model('core', 'IndexPatient')
+    dernier = None
+    while True:
+        lot = Patient.objects.order_by('pk').only('pk', *CHAMPS)
+        if dernier is not None:
+            lot = lot.filter(pk__gt=dernier)
+        lot = list(lot[:1000])
+        if not lot:
+            return
+        IndexPatient.objects.filter(patient_id__in=[p.pk for p in lot]).delete()
+        IndexPatient.objects.bulk_create([
+            IndexPatient(patient_id=patient.pk, champ=champ, jeton=jeton, complet=complet, phonetique=phonetique)
+            for patient in lot
+            for champ, jeton, complet, phonetique in lignes_index(patient)
+        ], batch_size=1000)
+        dernier = lot[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_indexpatient'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='indexpatient',
+            name='indexpatient_jeton_idx',
+        ),
+        migrations.AddField(
+            model_name='indexpatient',
+            name='phonetique',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='indexpatient',
+            index=models.Index(fields=['phonetique', 'jeton', 'patient'], name='indexpatient_cle_idx'),
+        ),
+        migrations.RunPython(reindexer_patients, migrations.RunPython.noop),
+    ]
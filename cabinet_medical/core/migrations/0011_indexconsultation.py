@@ -0,0 +1,106 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:10
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# ===== DÉCOUPAGE FIGÉ =====
+# Copie de core/recherche.py et core/recherche_texte.py à cette migration : les
+# migrations n'importent pas le code de l'application, qui peut évoluer (une
+# évolution du découpage passe par sa propre migration de réindexation)
+
+LONGUEUR_MAX = 40    # IndexConsultation.terme
+MOTS_VIDES = frozenset((
+    'a', 'au', 'aux', 'avec', 'ce', 'ces', 'd', 'dans', 'de', 'des', 'du', 'en', 'et', 'l',
+    'la', 'le', 'les', 'ou', 'par', 'pour', 'sa', 'sans', 'ses', 'son', 'sur', 'un', 'une',
+))
+_SEPARATEURS = re.compile(r'[\W_]+')
+
+
+def normaliser(texte):
+    """Minuscules, sans accents"""
+    texte = unicodedata.normalize('NFKD', texte or '')
+    return ''.join(c for c in texte if not unicodedata.combining(c)).lower()
+
+
+def mots(texte):
+    return [mot for mot in _SEPARATEURS.split(normaliser(texte)) if mot]
+
+
+def termes(texte):
+    """(position, terme) des mots du texte ; les mots vides occupent leur position sans être indexés"""
+    return [
+        (position, mot[:LONGUEUR_MAX])
+        for position, mot in enumerate(mots(texte))
+        if mot not in MOTS_VIDES
+    ]
+
+
+def lignes_consultation(consultation, ordonnances):
+    """(source, position, terme) d'une consultation et de ses ordonnances"""
+    lignes, decalage = [], 0
+    textes = [('diagnostic', consultation.diagnostic)] + [('medicaments', o.medicaments) for o in ordonnances]
+    for source, texte in textes:
+        mots_texte = termes(texte)
+        lignes += [(source, decalage + position, terme) for position, terme in mots_texte]
+        decalage += len(mots(texte)) + 1
+    return lignes
+
+
+def indexer_consultations(apps, schema_editor):
+    """Indexe les diagnostics et ordonnances existants, par lots de 500"""
+    Consultation = apps.get_model('core', 'Consultation')
+    Ordonnance = apps.get_model('core', 'Ordonnance')
+    IndexConsultation = apps.get_model('core', 'IndexConsultation')
+
+    dernier = 0
+    while True:
+        lot = list(Consultation.objects.filter(pk__gt=dernier).order_by('pk').only(
+            'pk', 'diagnostic', 'medecin_id', 'date_cons'
+        )[:500])
+        if not lot:
+            return
+        ordonnances = {}
+        for ordonnance in Ordonnance.objects.filter(consultation_id__in=[c.pk for c in lot]).order_by('pk'):
+            ordonnances.setdefault(ordonnance.consultation_id, []).append(ordonnance)
+        IndexConsultation.objects.bulk_create([
+            IndexConsultation(
+                consultation_id=c.pk, medecin_id=c.medecin_id, date_cons=c.date_cons,
+                source=source, terme=terme, position=position
+            )
+            for c in lot
+            for source, position, terme in lignes_consultation(c, ordonnances.get(c.pk, []))
+        ], batch_size=1000)
+        dernier = lot[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_indexpatient_phonetique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexConsultation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_cons', models.DateField()),
+                ('source', models.CharField(max_length=20)),
+                ('terme', models.CharField(max_length=40)),
+                ('position', models.PositiveIntegerField()),
+                ('consultation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='termes_recherche', to='core.consultation')),
+                ('medecin', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.medecin')),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['terme', 'medecin', 'date_cons'], name='indexcons_terme_idx'),
+                    models.Index(fields=['consultation', 'position'], name='indexcons_position_idx'),
+                ],
+            },
+        ),
+        migrations.RunPython(indexer_consultations, migrations.RunPython.noop),
+    ]
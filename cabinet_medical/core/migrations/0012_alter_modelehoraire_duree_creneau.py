@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:05
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_indexconsultation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='modelehoraire',
+            name='duree_creneau',
+            field=models.PositiveIntegerField(default=30, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:40
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def versions_existantes(apps, schema_editor):
+    """Les versions déjà servies (identifiants du journal) restent valables pour ?since="""
+    Modification = apps.get_model('core', 'Modification')
+    CompteurModifications = apps.get_model('core', 'CompteurModifications')
+    Modification.objects.update(version=F('id'))
+    derniere = Modification.objects.aggregate(derniere=Max('id'))['derniere'] or 0
+    CompteurModifications.objects.update_or_create(pk=1, defaults={'valeur': derniere})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_alter_modelehoraire_duree_creneau'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompteurModifications',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valeur', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='modification',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(versions_existantes, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='modification',
+            name='modification_modele_idx',
+        ),
+        migrations.AddIndex(
+            model_name='modification',
+            index=models.Index(fields=['modele', 'version'], name='modification_version_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_compteurmodifications_modification_version'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='indexpatient',
+            name='indexpatient_cle_idx',
+        ),
+        migrations.AddIndex(
+            model_name='indexpatient',
+            index=models.Index(fields=['jeton', 'complet', 'patient'], name='indexpatient_jeton_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:10
+
+from datetime import datetime
+
+import django.core.validators
+from django.db import migrations, models
+
+
+def deduire_durees(apps, schema_editor):
+    """Durée des jours existants : celle du premier créneau de leur plage (30 par défaut)"""
+    JourTravail = apps.get_model('core', 'JourTravail')
+    Creneau = apps.get_model('core', 'Creneau')
+    for jour in JourTravail.objects.iterator():
+        premier = Creneau.objects.filter(
+            medecin_id=jour.medecin_id, date=jour.date,
+            heure_debut__gte=jour.heure_debut, heure_debut__lt=jour.heure_fin
+        ).order_by('heure_debut').values_list('heure_debut', 'heure_fin').first()
+        if premier is None:
+            continue
+        minutes = int((datetime.combine(jour.date, premier[1]) - datetime.combine(jour.date, premier[0])).total_seconds() // 60)
+        if minutes > 0 and minutes != jour.duree_creneau:
+            JourTravail.objects.filter(pk=jour.pk).update(duree_creneau=minutes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_indexpatient_jeton_complet'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jourtravail',
+            name='duree_creneau',
+            field=models.PositiveIntegerField(default=30, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.RunPython(deduire_durees, migrations.RunPython.noop),
+    ]
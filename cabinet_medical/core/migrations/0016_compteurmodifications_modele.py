@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:10
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def compteurs_par_modele(apps, schema_editor):
+    """
+    Un compteur par modèle, repris de la plus grande version déjà attribuée
+    au modèle : les versions servies restent valables pour ?since=
+    """
+    Modification = apps.get_model('core', 'Modification')
+    CompteurModifications = apps.get_model('core', 'CompteurModifications')
+    CompteurModifications.objects.bulk_create([
+        CompteurModifications(modele=ligne['modele'], valeur=ligne['derniere'])
+        for ligne in Modification.objects.values('modele').annotate(derniere=Max('version')).order_by()
+    ])
+
+
+def vider_compteurs(apps, schema_editor):
+    apps.get_model('core', 'CompteurModifications').objects.all().delete()
+
+
+def compteur_global(apps, schema_editor):
+    """Retour arrière : un seul compteur (pk = 1) repris de la plus grande version"""
+    Modification = apps.get_model('core', 'Modification')
+    CompteurModifications = apps.get_model('core', 'CompteurModifications')
+    derniere = Modification.objects.aggregate(derniere=Max('version'))['derniere'] or 0
+    CompteurModifications.objects.create(pk=1, valeur=derniere)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_jourtravail_duree_creneau'),
+    ]
+
+    operations = [
+        migrations.RunPython(vider_compteurs, compteur_global),
+        migrations.AddField(
+            model_name='compteurmodifications',
+            name='modele',
+            field=models.CharField(default='', max_length=50, unique=True),
+            preserve_default=False,
+        ),
+        migrations.RunPython(compteurs_par_modele, vider_compteurs),
+    ]
@@ -1,4 +1,7 @@
-from django.db import models
+from django.core.validators import MinValueValidator
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from datetime import date
 # Ajoutez ceci AU DÉBUT de votre models.py (après les imports)
 
@@ -110,6 +113,18 @@ class Creneau(models.Model):
     heure_fin = models.TimeField()
     libre = models.BooleanField(default=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['medecin', 'date', 'heure_debut'],
+                name='unique_creneau_medecin_date_heure'
+            ),
+        ]
+        indexes = [
+            # Recherche des prochains créneaux libres (tous médecins / spécialité)
+            models.Index(fields=['libre', 'date', 'heure_debut', 'medecin'], name='creneau_libre_date_idx'),
+        ]
+
     def __str__(self):
         status = "Libre" if self.libre else "Pris"
         return f"{self.medecin.nom_med} {self.medecin.prenom_med} - {self.date} {self.heure_debut}-{self.heure_fin} ({status})"
@@ -117,9 +132,19 @@ class Creneau(models.Model):
 
 from django.core.exceptions import ValidationError
 class RDV(models.Model):
+    STATUT_CHOICES = [
+        ('RESERVE', 'Réservé'),
+        ('CONFIRME', 'Confirmé'),
+        ('EN_ATTENTE', 'En attente'),
+        ('EN_CONSULTATION', 'En consultation'),
+        ('TERMINE', 'Terminé'),
+        ('ANNULE', 'Annulé'),
+    ]
+
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
     medecin = models.ForeignKey(Medecin, on_delete=models.CASCADE)
     creneau = models.ForeignKey(Creneau, on_delete=models.CASCADE,null=True, blank=True)
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='RESERVE')
 
     def __str__(self):
         return (
@@ -131,6 +156,12 @@ class RDV(models.Model):
         if self.creneau.medecin != self.medecin:
             raise ValidationError("Ce créneau n'appartient pas à ce médecin.")
 
+    def save(self, *args, **kwargs):
+        # Le créneau est pris par le signal post_save (marquer_creneau_pris) :
+        # un créneau déjà réservé annule l'enregistrement du RDV
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class Consultation(models.Model):
     id_cons = models.AutoField(primary_key=True)
@@ -141,9 +172,32 @@ class Consultation(models.Model):
     medecin = models.ForeignKey(Medecin, on_delete=models.CASCADE)
     consultation_initiale = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True)
 
+    # Totaux dénormalisés, tenus à jour par core/totaux.py (signaux ConsultationActe)
+    # Vérification / réparation : python manage.py verifier_totaux [--reparer]
+    total_actes = models.FloatField(default=0)
+    nb_actes = models.IntegerField(default=0)
+    montant_total = models.FloatField(default=0, db_index=True)
+
     def __str__(self):
         return f"Consultation {self.id_cons} - {self.rdv.patient}"
 
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.montant_total = self.prix_cons + self.total_actes
+            return super().save(*args, **kwargs)
+
+        # Une instance chargée avant l'ajout d'actes ne doit pas écraser les totaux
+        if kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in CHAMPS_TOTAUX
+            ]
+        super().save(*args, **kwargs)
+
+        from .totaux import recalculer_montants
+        recalculer_montants([self.pk])
+        self.refresh_from_db(fields=CHAMPS_TOTAUX)
+
 
 class ActeMedical(models.Model):
     id_acte = models.AutoField(primary_key=True)
@@ -171,6 +225,40 @@ class ConsultationActe(models.Model):
             self.prix_applique = self.acte.prix_acte
         super().save(*args, **kwargs)
 
+    @classmethod
+    def totaux_consultation(cls, consultation_ref):
+        """
+        Sous-requêtes (total, nombre) des actes de la consultation désignée par
+        `consultation_ref` (ex : OuterRef('pk')), recalculées depuis les actes
+        """
+        actes = cls.objects.filter(consultation_id=consultation_ref).order_by().values('consultation_id')
+        total = actes.annotate(
+            total=Sum(F('prix_applique') * F('quantite'), output_field=models.FloatField())
+        ).values('total')
+        nombre = actes.annotate(n=Count('id')).values('n')
+        return (
+            Coalesce(Subquery(total, output_field=models.FloatField()), Value(0.0)),
+            Coalesce(Subquery(nombre, output_field=models.IntegerField()), Value(0)),
+        )
+
+
+CHAMPS_TOTAUX = ('total_actes', 'nb_actes', 'montant_total')
+
+
+class FactureQuerySet(models.QuerySet):
+    def avec_totaux_calcules(self):
+        """
+        Annote chaque facture avec ses totaux recalculés en SQL depuis les actes
+        (total_actes_calcule, nb_actes_calcule, montant_total_calcule), pour
+        contrôler les totaux stockés
+        """
+        total, nombre = ConsultationActe.totaux_consultation(OuterRef('consultation_id'))
+        return self.annotate(
+            total_actes_calcule=total,
+            nb_actes_calcule=nombre,
+            montant_total_calcule=F('consultation__prix_cons') + F('total_actes_calcule'),
+        )
+
 
 class Facture(models.Model):
     id_facture = models.AutoField(primary_key=True)
@@ -180,11 +268,24 @@ class Facture(models.Model):
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, null=True, blank=True)
     montant = models.FloatField()
 
+    # Copie des totaux de la consultation, tenue à jour par core/totaux.py
+    total_actes = models.FloatField(default=0)
+    nb_actes = models.IntegerField(default=0)
+    montant_total = models.FloatField(default=0, db_index=True)
+
+    objects = FactureQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        # Les totaux sont toujours recopiés depuis la consultation (source de vérité en base)
+        totaux = Consultation.objects.filter(pk=self.consultation_id).values(*CHAMPS_TOTAUX).first()
+        if totaux:
+            for champ, valeur in totaux.items():
+                setattr(self, champ, valeur)
+        super().save(*args, **kwargs)
+
     def calculer_montant(self):
-        total = self.consultation.prix_cons
-        for consultation_acte in self.consultation.consultationacte_set.all():
-                total += consultation_acte.prix_applique * consultation_acte.quantite
-        return total
+        """Montant total (consultation + actes), stocké dans montant_total"""
+        return self.montant_total
 
 
     def __str__(self):
@@ -315,36 +416,178 @@ class OrdonnanceRadio(models.Model):
         return f"{self.radio} → {patient.nom_patient} {patient.prenom_patient} ({self.date_ord})"
 
 class JourTravail(models.Model):
+    """
+    Plage de travail d'un médecin pour une date ; un médecin peut en avoir
+    plusieurs le même jour (matin et après-midi). Les créneaux de la plage ont
+    la durée duree_creneau (celle du modèle horaire qui l'a publiée)
+    """
     medecin = models.ForeignKey(Medecin, on_delete=models.CASCADE)
     date = models.DateField()
     heure_debut = models.TimeField()
     heure_fin = models.TimeField()
+    duree_creneau = models.PositiveIntegerField(default=30, validators=[MinValueValidator(1)])  # minutes
 
     def __str__(self):
         return f"{self.medecin} – {self.date} ({self.heure_debut}-{self.heure_fin})"
-    
-from datetime import datetime, timedelta
-from django.db.models.signals import post_save
-from django.dispatch import receiver
 
 
+class ModeleHoraire(models.Model):
+    """
+    Horaire hebdomadaire récurrent d'un médecin
+    (ex : du lundi au vendredi, 09:00–13:00, créneaux de 30 minutes)
+    """
+    JOURS_CHOICES = [
+        (0, 'Lundi'), (1, 'Mardi'), (2, 'Mercredi'), (3, 'Jeudi'),
+        (4, 'Vendredi'), (5, 'Samedi'), (6, 'Dimanche'),
+    ]
+
+    medecin = models.ForeignKey(Medecin, on_delete=models.CASCADE)
+    nom = models.CharField(max_length=100, blank=True)
+    # Jours de la semaine séparés par des virgules (0 = lundi ... 6 = dimanche)
+    jours_semaine = models.CharField(max_length=20, default='0,1,2,3,4')
+    heure_debut = models.TimeField()
+    heure_fin = models.TimeField()
+    duree_creneau = models.PositiveIntegerField(default=30, validators=[MinValueValidator(1)])  # minutes
+    actif = models.BooleanField(default=True)
+
+    def jours(self):
+        return {int(j) for j in self.jours_semaine.split(',') if j.strip() != ''}
+
+    def chevauchement(self):
+        """
+        Autre modèle actif du médecin qui partage un jour et une heure avec
+        celui-ci, ou None. Plusieurs plages par jour sont permises (matin et
+        après-midi) tant qu'elles ne se chevauchent pas.
+        """
+        if not self.actif or not self.medecin_id:
+            return None
+        autres = ModeleHoraire.objects.filter(
+            medecin_id=self.medecin_id, actif=True,
+            heure_debut__lt=self.heure_fin, heure_fin__gt=self.heure_debut
+        ).exclude(pk=self.pk)
+        jours = self.jours()
+        return next((autre for autre in autres if autre.jours() & jours), None)
 
+    def clean(self):
+        erreurs = {}
+        try:
+            jours = self.jours()
+        except ValueError:
+            jours = None
+        if not jours or any(j < 0 or j > 6 for j in jours):
+            erreurs['jours_semaine'] = "Jours entre 0 (lundi) et 6 (dimanche), séparés par des virgules"
+        if self.heure_debut and self.heure_fin and self.heure_fin <= self.heure_debut:
+            erreurs['heure_fin'] = "L'heure de fin doit être après l'heure de début"
+        if erreurs:
+            raise ValidationError(erreurs)
+        autre = self.chevauchement()
+        if autre:
+            raise ValidationError(f"Chevauche le modèle horaire « {autre} »")
+
+    def __str__(self):
+        return f"{self.medecin} – {self.nom or self.jours_semaine} ({self.heure_debut}-{self.heure_fin})"
+
+
+class Fermeture(models.Model):
+    """Jour de fermeture (férié, congé) : global si aucun médecin n'est renseigné"""
+    date = models.DateField()
+    motif = models.CharField(max_length=100, blank=True)
+    medecin = models.ForeignKey(Medecin, on_delete=models.CASCADE, null=True, blank=True)
+
+    def __str__(self):
+        cible = self.medecin or 'Cabinet'
+        return f"{cible} fermé le {self.date} ({self.motif})"
+
+class Modification(models.Model):
+    """
+    Journal des écritures sur les modèles suivis (RDV, Creneau, Consultation...).
+    `version` est attribuée par le CompteurModifications du modèle dans la
+    transaction qui écrit : les versions d'un modèle deviennent visibles dans
+    l'ordre des commits (voir core/modifications.py). Une ligne sans objet_id
+    marque une purge du journal.
+    """
+    modele = models.CharField(max_length=50)
+    objet_id = models.BigIntegerField(null=True, blank=True)
+    supprime = models.BooleanField(default=False)
+    date = models.DateTimeField(auto_now_add=True)
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['modele', 'version'], name='modification_version_idx'),
+        ]
+
+    def __str__(self):
+        action = "supprimé" if self.supprime else "modifié"
+        return f"{self.modele} #{self.objet_id} {action} (v{self.version})"
+
+
+class CompteurModifications(models.Model):
+    """
+    Dernière version attribuée au journal d'un modèle (une ligne par modèle
+    suivi). Sa mise à jour verrouille la ligne jusqu'au commit : deux écritures
+    concurrentes sur un même modèle reçoivent leurs versions dans l'ordre où
+    elles sont validées, les écritures sur les autres modèles ne l'attendent pas.
+    """
+    modele = models.CharField(max_length=50, unique=True)
+    valeur = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.modele} v{self.valeur}"
+
+class IndexPatient(models.Model):
+    """
+    Index de recherche des patients : un jeton normalisé (minuscules, sans
+    accents) par mot et par préfixe de mot des champs recherchés.
+    `complet` distingue le mot entier de ses préfixes ; `phonetique` marque
+    les clés phonétiques des noms et prénoms (recherche approchée). Maintenu
+    par les signaux de Patient (voir core/recherche.py).
+    """
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='jetons_recherche')
+    champ = models.CharField(max_length=20)
+    jeton = models.CharField(max_length=40)
+    complet = models.BooleanField(default=False)
+    phonetique = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # Égalité sur le jeton en tête (NOT phonetique n'utilise pas d'index),
+            # mots entiers d'abord : lecture bornée des candidats de core/recherche.py
+            models.Index(fields=['jeton', 'complet', 'patient'], name='indexpatient_jeton_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.jeton} ({self.champ}) → patient #{self.patient_id}"
+
+class IndexConsultation(models.Model):
+    """
+    Index plein texte des consultations : une ligne par occurrence d'un mot du
+    diagnostic ou des ordonnances, avec sa position (recherche d'expressions).
+    Médecin et date sont recopiés de la consultation pour filtrer sur l'index.
+    Maintenu par les signaux de Consultation et Ordonnance (voir core/recherche_texte.py).
+    """
+    consultation = models.ForeignKey(Consultation, on_delete=models.CASCADE, related_name='termes_recherche')
+    medecin = models.ForeignKey(Medecin, on_delete=models.CASCADE, related_name='+')
+    date_cons = models.DateField()
+    source = models.CharField(max_length=20)
+    terme = models.CharField(max_length=40)
+    position = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['terme', 'medecin', 'date_cons'], name='indexcons_terme_idx'),
+            models.Index(fields=['consultation', 'position'], name='indexcons_position_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.terme} ({self.source}, {self.position}) → consultation #{self.consultation_id}"
+
+from datetime import datetime, timedelta
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 
-from datetime import datetime, timedelta, time
 
-def generer_creneaux(medecin, date, debut, fin, duree=30):
-    heure = debut
-    duree = timedelta(minutes=duree)
 
-    while heure < fin:
-        Creneau.objects.create(
-            medecin=medecin,
-            date=date,
-            heure_debut=heure,
-            heure_fin=(datetime.combine(date, heure) + duree).time(),
-            libre=True
-        )
-        heure = (datetime.combine(date, heure) + duree).time()
 
 
 from django.db.models.signals import post_save, post_delete, pre_save
@@ -352,30 +595,52 @@ from django.dispatch import receiver
 
 # ===== SIGNALS POUR GÉRER AUTOMATIQUEMENT LES CRÉNEAUX =====
 
+from . import disponibilites, modifications
+
+# Les mises à jour de créneaux se font par UPDATE conditionnel (sans recharger
+# le créneau). Les réservations faites par core/planning.py (reserver_creneau,
+# deplacer_rdv) gèrent déjà le créneau et positionnent `_creneau_gere` pour
+# éviter ces requêtes supplémentaires.
+
 @receiver(pre_save, sender=RDV)
 def liberer_ancien_creneau(sender, instance, **kwargs):
     """
     Avant de modifier un RDV, libère l'ancien créneau si on change de créneau
     """
-    if instance.pk:  # Si le RDV existe déjà (modification)
-        try:
-            ancien_rdv = RDV.objects.get(pk=instance.pk)
-            # Si on change de créneau, libérer l'ancien
-            if ancien_rdv.creneau and ancien_rdv.creneau != instance.creneau:
-                ancien_rdv.creneau.libre = True
-                ancien_rdv.creneau.save()
-        except RDV.DoesNotExist:
-            pass
+    if instance.pk and not getattr(instance, '_creneau_gere', False):  # Si le RDV existe déjà (modification)
+        ancien = RDV.objects.filter(pk=instance.pk).values_list(
+            'creneau_id', 'creneau__medecin_id', 'creneau__date'
+        ).first()
+        instance._ancien_creneau_id = ancien[0] if ancien else None
+        # Si on change de créneau, libérer l'ancien
+        if ancien and ancien[0] and ancien[0] != instance.creneau_id:
+            Creneau.objects.filter(pk=ancien[0]).update(libre=True)
+            disponibilites.invalider(ancien[1], ancien[2])
+            modifications.enregistrer('creneau', [ancien[0]])
 
 
 @receiver(post_save, sender=RDV)
 def marquer_creneau_pris(sender, instance, created, **kwargs):
     """
-    Après la création ou modification d'un RDV, marque le créneau comme pris
+    Après la création ou modification d'un RDV, marque le créneau comme pris.
+    Un créneau déjà pris par un autre RDV lève CreneauIndisponible (le save
+    du RDV est annulé, voir RDV.save). Invalidation, journal et événement
+    seulement si le créneau vient d'être pris.
     """
-    if instance.creneau:
-        instance.creneau.libre = False
-        instance.creneau.save()
+    if instance.creneau_id and not getattr(instance, '_creneau_gere', False):
+        pris = Creneau.objects.filter(pk=instance.creneau_id, libre=True).update(libre=False)
+        nouveau = created or getattr(instance, '_ancien_creneau_id', None) != instance.creneau_id
+        if not pris:
+            if nouveau:
+                from .planning import CreneauIndisponible
+                raise CreneauIndisponible("Ce créneau n'est plus disponible")
+            return  # créneau déjà pris par ce RDV (changement de statut) : rien n'a changé
+        if RDV.creneau.is_cached(instance) and instance.creneau is not None:
+            instance.creneau.libre = False
+            disponibilites.invalider(instance.creneau.medecin_id, instance.creneau.date)
+        else:
+            disponibilites.invalider_creneau(instance.creneau_id)
+        modifications.enregistrer('creneau', [instance.creneau_id], details={'libre': False})
 
 
 @receiver(post_delete, sender=RDV)
@@ -383,28 +648,14 @@ def liberer_creneau(sender, instance, **kwargs):
     """
     Quand un RDV est supprimé, libère le créneau
     """
-    if instance.creneau:
-        instance.creneau.libre = True
-        instance.creneau.save()
-
-
-@receiver(post_save, sender=JourTravail)
-def generer_creneaux_automatiquement(sender, instance, created, **kwargs):
-    if created:
-        generer_creneaux(
-            medecin=instance.medecin,
-            date=instance.date,
-            debut=instance.heure_debut,
-            fin=instance.heure_fin,
-            duree=30
-        )
+    if instance.creneau_id:
+        Creneau.objects.filter(pk=instance.creneau_id).update(libre=True)
+        disponibilites.invalider_creneau(instance.creneau_id)
+        modifications.enregistrer('creneau', [instance.creneau_id])
+
 
-@receiver(post_delete, sender=JourTravail)
-def supprimer_creneaux_automatiquement(sender, instance, **kwargs):
-    Creneau.objects.filter(
-        medecin=instance.medecin,
-        date=instance.date
-    ).delete()
+# La génération / suppression des créneaux d'un JourTravail est gérée
+# dans core/signals.py via core/planning.py
 
 
 
@@ -0,0 +1,233 @@
+# core/modifications.py
+"""
+Suivi des modifications pour les écrans qui interrogent l'API à intervalle
+régulier (réception, salle d'attente).
+
+Chaque écriture sur un modèle suivi ajoute une ligne au journal Modification
+avec un numéro de version pris sur le compteur de ce modèle
+(CompteurModifications) dans la transaction d'écriture : la ligne du compteur
+reste verrouillée jusqu'au commit, une version n'est donc visible qu'une fois
+toutes les versions inférieures du modèle validées (un client ?since= ne
+manque aucun changement). Les versions sont propres à chaque modèle : les
+écritures sur des modèles différents ne s'attendent pas. Les ViewSets qui
+utilisent SuiviModificationsMixin :
+  - envoient ETag / Last-Modified et répondent 304 à If-None-Match /
+    If-Modified-Since quand rien n'a changé ;
+  - acceptent ?since=<version> sur la liste et ne renvoient que les lignes
+    modifiées depuis cette version, plus les identifiants supprimés (ou sortis
+    des filtres de la liste).
+La version courante du modèle de la liste est renvoyée dans l'en-tête X-Version.
+
+La dernière version de chaque modèle est gardée dans le cache partagé (voir
+CACHES), avec un jeton de génération renouvelé au commit de chaque écriture :
+une lecture faite avant le commit ne remet pas en cache une version périmée.
+Purge du journal : python manage.py purger_modifications
+"""
+import hashlib
+import uuid
+from datetime import datetime, time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+
+CACHE_PREFIXE = 'modifications:version:'
+CACHE_DUREE = 300  # secondes
+DELTA_MAX = 1000  # au-delà, le client doit recharger la liste complète
+
+
+# ===== JOURNAL =====
+
+def _attribuer(modele, nombre):
+    """
+    Réserve `nombre` versions de `modele` ; à appeler dans la transaction
+    d'écriture (verrouille le compteur du modèle seulement). Retourne la dernière
+    """
+    from .models import CompteurModifications
+
+    compteur = CompteurModifications.objects.filter(modele=modele)
+    if not compteur.update(valeur=F('valeur') + nombre):
+        CompteurModifications.objects.get_or_create(modele=modele)
+        compteur.update(valeur=F('valeur') + nombre)
+    return compteur.values_list('valeur', flat=True).get()
+
+
+def _renouveler(modele):
+    """Au commit : les versions de `modele` lues avant ne sont plus servies par le cache"""
+    def apres_commit():
+        cache.set(CACHE_PREFIXE + 'gen:' + modele, uuid.uuid4().hex, 2 * CACHE_DUREE)
+        cache.delete(CACHE_PREFIXE + modele)
+    transaction.on_commit(apres_commit)
+
+
+def enregistrer(modele, objet_ids, supprime=False, details=None):
+    """
+    Ajoute une entrée au journal pour chaque objet (un seul INSERT groupé),
+    dans la transaction en cours. Après le commit, le changement est publié
+    sur le flux d'événements (core/evenements.py) avec les éventuels `details`.
+    """
+    from .models import Modification
+    from . import evenements
+
+    objet_ids = [objet_id for objet_id in objet_ids if objet_id is not None]
+    if not objet_ids:
+        return
+    with transaction.atomic():
+        premiere = _attribuer(modele, len(objet_ids)) - len(objet_ids) + 1
+        Modification.objects.bulk_create([
+            Modification(modele=modele, objet_id=objet_id, supprime=supprime, version=premiere + i)
+            for i, objet_id in enumerate(objet_ids)
+        ], batch_size=500)
+
+    evenement = {'modele': modele, 'ids': objet_ids, 'supprime': supprime}
+    if details:
+        evenement['details'] = details
+
+    _renouveler(modele)
+    transaction.on_commit(lambda: evenements.publier(evenement))
+
+
+def versions(modeles):
+    """
+    Retourne ({modèle: version}, date de la dernière modification) pour un
+    ensemble de modèles. Servi depuis le cache.
+    """
+    from .models import Modification
+
+    cles = [CACHE_PREFIXE + m for m in modeles]
+    trouves = cache.get_many(cles + [CACHE_PREFIXE + 'gen:' + m for m in modeles])
+    courantes, date = {}, None
+    for modele in modeles:
+        jeton = trouves.get(CACHE_PREFIXE + 'gen:' + modele)
+        entree = trouves.get(CACHE_PREFIXE + modele)
+        if entree is not None and entree[0] == jeton:
+            valeur = entree[1]
+        else:
+            valeur = Modification.objects.filter(modele=modele).order_by('-version').values_list(
+                'version', 'date'
+            ).first() or (0, None)
+            cache.set(CACHE_PREFIXE + modele, (jeton, valeur), CACHE_DUREE)
+        courantes[modele] = valeur[0]
+        if valeur[1] and (date is None or valeur[1] > date):
+            date = valeur[1]
+    return courantes, date
+
+
+def changements(modele, depuis, limite=DELTA_MAX):
+    """
+    Objets modifiés / supprimés depuis une version.
+    Retourne (modifies, supprimes) ou None si le client doit tout recharger
+    (journal purgé après `depuis` ou trop de changements).
+    """
+    from .models import Modification
+
+    lignes = list(Modification.objects.filter(
+        modele=modele, version__gt=depuis
+    ).order_by('version').values_list('objet_id', 'supprime')[:limite + 1])
+
+    if len(lignes) > limite:
+        return None
+    etats = {}
+    for objet_id, supprime in lignes:
+        if objet_id is None:  # marqueur de purge
+            return None
+        etats[objet_id] = supprime
+    modifies = [i for i, supprime in etats.items() if not supprime]
+    supprimes = [i for i, supprime in etats.items() if supprime]
+    return modifies, supprimes
+
+
+def purger(modele, avant):
+    """Supprime les entrées antérieures à une date et pose un marqueur de purge"""
+    from .models import Modification
+
+    with transaction.atomic():
+        supprimees = Modification.objects.filter(modele=modele, date__lt=avant).delete()[0]
+        if supprimees:
+            Modification.objects.create(modele=modele, objet_id=None, version=_attribuer(modele, 1))
+            _renouveler(modele)
+    return supprimees
+
+
+# ===== MIXIN POUR LES VIEWSETS =====
+
+class SuiviModificationsMixin:
+    """
+    suivi_modele  : modèle principal de la liste (pour ?since=)
+    suivi_modeles : modèles dont dépend le contenu des réponses (pour l'ETag)
+    """
+    suivi_modele = None
+    suivi_modeles = ()
+
+    def reponse_suivie(self, request, construire):
+        """
+        Réponse conditionnelle : 304 si le client a déjà la version courante,
+        sinon construit la réponse et ajoute ETag / Last-Modified / X-Version
+        """
+        modeles = tuple(dict.fromkeys((self.suivi_modele, *self.suivi_modeles)))
+        courantes, date = versions(modeles)
+        courante = courantes[self.suivi_modele]
+        aujourdhui = timezone.localdate()
+        # Certaines réponses dépendent du jour (RDV du jour) : le jour fait partie de la version
+        debut_jour = timezone.make_aware(datetime.combine(aujourdhui, time.min))
+        derniere_modif = max(date, debut_jour) if date else debut_jour
+
+        empreinte = hashlib.md5(
+            f"{'.'.join(str(courantes[m]) for m in modeles)}|{aujourdhui}|{request.get_full_path()}".encode()
+        ).hexdigest()[:16]
+        etag = f'W/"{empreinte}"'
+        entetes = {
+            'ETag': etag,
+            'Last-Modified': http_date(derniere_modif.timestamp()),
+            'Cache-Control': 'no-cache',
+            'X-Version': str(courante),
+        }
+
+        if_none_match = request.headers.get('If-None-Match')
+        if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since') or '')
+        if if_none_match:
+            non_modifie = etag in [e.strip() for e in if_none_match.split(',')] or if_none_match.strip() == '*'
+        else:
+            non_modifie = if_modified_since is not None and int(derniere_modif.timestamp()) <= if_modified_since
+        if non_modifie:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=entetes)
+
+        response = construire(courante)
+        for cle, valeur in entetes.items():
+            response[cle] = valeur
+        return response
+
+    def list(self, request, *args, **kwargs):
+        depuis = request.query_params.get('since')
+        if depuis is None:
+            return self.reponse_suivie(request, lambda courante: super(SuiviModificationsMixin, self).list(
+                request, *args, **kwargs
+            ))
+
+        try:
+            depuis = int(depuis)
+        except ValueError:
+            return Response({'error': 'since doit être un numéro de version'}, status=400)
+        return self.reponse_suivie(request, lambda courante: self._delta(depuis, courante))
+
+    def _delta(self, depuis, courante):
+        resultat = changements(self.suivi_modele, depuis)
+        if resultat is None:
+            return Response({'version': courante, 'complet': True, 'modifies': [], 'supprimes': []})
+
+        modifies, supprimes = resultat
+        lignes = list(self.filter_queryset(self.get_queryset()).filter(pk__in=modifies)) if modifies else []
+        # Modifiées mais hors des filtres de la liste : le client doit les retirer
+        visibles = {ligne.pk for ligne in lignes}
+        sorties = [objet_id for objet_id in modifies if objet_id not in visibles]
+        return Response({
+            'version': courante,
+            'complet': False,
+            'modifies': self.get_serializer(lignes, many=True).data,
+            'supprimes': supprimes + sorties,
+        })
@@ -0,0 +1,67 @@
+# core/pagination.py
+"""
+Pagination par curseur (keyset) des listes de l'API.
+
+Toutes les listes sont paginées (première page sans paramètre). Le corps de
+la réponse reste une liste JSON ; les liens vers les pages suivante /
+précédente sont envoyés dans l'en-tête HTTP `Link` (rel="next" / rel="prev"),
+suivis par le frontend (frontend/src/services/api.js).
+
+Chaque ViewSet peut définir :
+    page_size = 50              taille de page par défaut
+    cursor_ordering = '-pk'     ordre stable et indexé utilisé par le curseur
+    pagination_class = None     liste jamais paginée (petits référentiels)
+Le client demande ?page_size=N (borné par max_page_size), puis suit les liens.
+L'ordre se termine toujours par la clé primaire : le curseur reste exact
+quand le champ de ?ordering= a des valeurs en double.
+"""
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class CurseurPagination(CursorPagination):
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = '-pk'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = getattr(view, 'page_size', self.page_size)
+        self.ordering = getattr(view, 'cursor_ordering', self.ordering)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Ordre demandé via ?ordering= (OrderingFilter) s'il est valide,
+        sinon l'ordre stable du curseur (les ViewSets n'ont pas d'ordre par défaut)
+        """
+        ordering = None
+        for backend in getattr(view, 'filter_backends', []):
+            if hasattr(backend, 'get_ordering'):
+                ordering = backend().get_ordering(request, queryset, view)
+                if ordering:
+                    break
+        if not ordering:
+            ordering = self.ordering
+        ordering = (ordering,) if isinstance(ordering, str) else tuple(ordering)
+
+        # Départage des doublons par la clé primaire, dans le sens du premier champ
+        cles = {'pk', queryset.model._meta.pk.name}
+        if not any(champ.lstrip('-') in cles for champ in ordering):
+            ordering += ('-pk' if ordering[0].startswith('-') else 'pk',)
+        return ordering
+
+    def get_paginated_response(self, data):
+        liens = []
+        suivant = self.get_next_link()
+        precedent = self.get_previous_link()
+        if suivant:
+            liens.append(f'<{suivant}>; rel="next"')
+        if precedent:
+            liens.append(f'<{precedent}>; rel="prev"')
+
+        headers = {'Link': ', '.join(liens)} if liens else None
+        return Response(data, headers=headers)
+
+    def get_paginated_response_schema(self, schema):
+        return schema
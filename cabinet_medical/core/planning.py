@@ -0,0 +1,317 @@
+# core/planning.py
+"""
+Matérialisation des créneaux de consultation.
+
+Tous les chemins qui créent des créneaux (signal JourTravail, JourTravailViewSet)
+passent par ce module : les créneaux sont calculés en mémoire puis écrits en un
+seul INSERT groupé. Les doublons sont ignorés grâce à la contrainte unique
+(medecin, date, heure_debut) du modèle Creneau.
+
+Les modèles horaires (ModeleHoraire) sont matérialisés sur une période
+entière en une transaction : JourTravail et créneaux par INSERT groupés.
+"""
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import disponibilites, modifications
+from .models import Creneau, JourTravail, Fermeture, RDV
+
+
+DUREE_CRENEAU = 30  # minutes
+FENETRE_MAX = 90  # jours, fenêtre maximale d'une recherche de disponibilités
+
+
+def calculer_creneaux(medecin, date, debut, fin, duree=DUREE_CRENEAU):
+    """
+    Calcule (sans aucune requête) les créneaux d'une plage horaire.
+    Un créneau qui dépasserait l'heure de fin n'est pas créé.
+    `medecin` peut être une instance Medecin ou son identifiant.
+    """
+    if not duree or duree <= 0:
+        raise ValueError(f"Durée de créneau invalide : {duree!r} minutes")
+    medecin_id = getattr(medecin, 'pk', medecin)
+    creneaux = []
+    pas = timedelta(minutes=duree)
+    courant = datetime.combine(date, debut)
+    limite = datetime.combine(date, fin)
+
+    while courant + pas <= limite:
+        suivant = courant + pas
+        creneaux.append(Creneau(
+            medecin_id=medecin_id,
+            date=date,
+            heure_debut=courant.time(),
+            heure_fin=suivant.time(),
+            libre=True
+        ))
+        courant = suivant
+
+    return creneaux
+
+
+def enregistrer_creneaux(creneaux, batch_size=500):
+    """Insère une liste de créneaux en masse, les créneaux existants sont ignorés"""
+    if creneaux:
+        Creneau.objects.bulk_create(creneaux, batch_size=batch_size, ignore_conflicts=True)
+        # bulk_create n'envoie pas post_save : invalider le cache des disponibilités
+        # et journaliser les créneaux insérés (pas les autres créneaux des jours)
+        jours = {(c.medecin_id, c.date) for c in creneaux}
+        disponibilites.invalider_jours(jours)
+        cles = {(c.medecin_id, c.date, c.heure_debut) for c in creneaux}
+        modifications.enregistrer('creneau', [
+            creneau_id for creneau_id, *cle in Creneau.objects.filter(
+                medecin_id__in={m for m, _ in jours},
+                date__range=(min(d for _, d in jours), max(d for _, d in jours))
+            ).values_list('id', 'medecin_id', 'date', 'heure_debut')
+            if tuple(cle) in cles
+        ])
+    return len(creneaux)
+
+
+def generer_creneaux(medecin, date, debut, fin, duree=DUREE_CRENEAU):
+    """Génère les créneaux d'une plage horaire en une seule requête d'insertion"""
+    return enregistrer_creneaux(calculer_creneaux(medecin, date, debut, fin, duree))
+
+
+def creneaux_plage(jour_travail):
+    """Créneaux qui commencent dans la plage d'un JourTravail (pas ceux des autres plages du jour)"""
+    return Creneau.objects.filter(
+        medecin_id=jour_travail.medecin_id,
+        date=jour_travail.date,
+        heure_debut__gte=jour_travail.heure_debut,
+        heure_debut__lt=jour_travail.heure_fin,
+    )
+
+
+def generer_creneaux_jour(jour_travail):
+    """
+    Génère les créneaux d'un JourTravail à sa durée de créneau et retourne le
+    nombre de créneaux calculés. Les créneaux qui chevaucheraient un créneau
+    existant du jour (réservé sur une ancienne grille) ne sont pas créés.
+    """
+    creneaux = calculer_creneaux(
+        jour_travail.medecin_id, jour_travail.date, jour_travail.heure_debut,
+        jour_travail.heure_fin, jour_travail.duree_creneau
+    )
+    existants = list(Creneau.objects.filter(
+        medecin_id=jour_travail.medecin_id, date=jour_travail.date
+    ).values_list('heure_debut', 'heure_fin'))
+    creneaux = [
+        c for c in creneaux
+        if not any(debut < c.heure_fin and c.heure_debut < fin for debut, fin in existants)
+    ]
+    return enregistrer_creneaux(creneaux)
+
+
+def supprimer_creneaux_libres(jour_travail):
+    """Supprime les créneaux encore libres de la plage d'un JourTravail (les réservés sont conservés)"""
+    return creneaux_plage(jour_travail).filter(libre=True).delete()[0]
+
+
+# ===== MATÉRIALISATION DES MODÈLES HORAIRES SUR UNE PÉRIODE =====
+
+def _jours_fermes(date_debut, date_fin, exclusions=()):
+    """
+    Retourne (dates fermées pour tout le cabinet, {medecin_id: dates fermées})
+    en une seule requête sur Fermeture
+    """
+    fermes_cabinet = set(exclusions)
+    fermes_medecin = {}
+    for medecin_id, jour in Fermeture.objects.filter(
+        date__range=(date_debut, date_fin)
+    ).values_list('medecin_id', 'date'):
+        if medecin_id is None:
+            fermes_cabinet.add(jour)
+        else:
+            fermes_medecin.setdefault(medecin_id, set()).add(jour)
+    return fermes_cabinet, fermes_medecin
+
+
+def materialiser_modeles(modeles, date_debut, date_fin, exclusions=(), batch_size=500):
+    """
+    Matérialise des modèles horaires entre deux dates (incluses) :
+    crée les JourTravail manquants et tous leurs créneaux dans une seule
+    transaction, avec des INSERT groupés.
+
+    Un médecin peut avoir plusieurs plages le même jour (matin et après-midi) :
+    une plage qui chevauche un JourTravail déjà planifié n'est pas recréée
+    (publier deux fois la même période ne crée rien). Les dates d'exclusion et
+    les Fermeture (globales ou par médecin) sont ignorées.
+    Retourne {'jours_crees': n, 'creneaux_crees': n}.
+    """
+    modeles = [m for m in modeles if m.actif]
+    if not modeles or date_fin < date_debut:
+        return {'jours_crees': 0, 'creneaux_crees': 0}
+
+    medecin_ids = {m.medecin_id for m in modeles}
+    fermes_cabinet, fermes_medecin = _jours_fermes(date_debut, date_fin, exclusions)
+    deja_planifies = {}  # (medecin_id, date) -> [(heure_debut, heure_fin)]
+    for medecin_id, jour, debut, fin in JourTravail.objects.filter(
+        medecin_id__in=medecin_ids,
+        date__range=(date_debut, date_fin)
+    ).values_list('medecin_id', 'date', 'heure_debut', 'heure_fin'):
+        deja_planifies.setdefault((medecin_id, jour), []).append((debut, fin))
+
+    jours = []
+    creneaux = []
+    jour = date_debut
+    while jour <= date_fin:
+        if jour not in fermes_cabinet:
+            for modele in modeles:
+                plages = deja_planifies.setdefault((modele.medecin_id, jour), [])
+                if (jour.weekday() not in modele.jours()
+                        or jour in fermes_medecin.get(modele.medecin_id, ())
+                        or any(debut < modele.heure_fin and modele.heure_debut < fin for debut, fin in plages)):
+                    continue
+                plages.append((modele.heure_debut, modele.heure_fin))
+                jours.append(JourTravail(
+                    medecin_id=modele.medecin_id,
+                    date=jour,
+                    heure_debut=modele.heure_debut,
+                    heure_fin=modele.heure_fin,
+                    duree_creneau=modele.duree_creneau
+                ))
+                creneaux.extend(calculer_creneaux(
+                    modele.medecin_id, jour, modele.heure_debut, modele.heure_fin, modele.duree_creneau
+                ))
+        jour += timedelta(days=1)
+
+    # bulk_create n'envoie pas post_save : les créneaux sont insérés ici directement
+    with transaction.atomic():
+        JourTravail.objects.bulk_create(jours, batch_size=batch_size)
+        enregistrer_creneaux(creneaux, batch_size=batch_size)
+
+    return {'jours_crees': len(jours), 'creneaux_crees': len(creneaux)}
+
+
+# ===== RECHERCHE DE DISPONIBILITÉS =====
+
+def creneaux_libres_a_venir(queryset=None, maintenant=None):
+    """Filtre les créneaux libres qui ne sont pas encore passés"""
+    maintenant = maintenant or timezone.localtime()
+    queryset = Creneau.objects.all() if queryset is None else queryset
+    return queryset.filter(libre=True).filter(
+        Q(date__gt=maintenant.date()) |
+        Q(date=maintenant.date(), heure_debut__gte=maintenant.time())
+    )
+
+
+def prochains_creneaux_libres(date_debut=None, date_fin=None, medecins=None, specialite=None,
+                              limite=10, maintenant=None):
+    """
+    Retourne les `limite` premiers créneaux libres par ordre chronologique,
+    dans une fenêtre de dates bornée (index creneau_libre_date_idx).
+    """
+    maintenant = maintenant or timezone.localtime()
+    date_debut = max(date_debut or maintenant.date(), maintenant.date())
+    date_fin = min(date_fin or date_debut + timedelta(days=30), date_debut + timedelta(days=FENETRE_MAX))
+
+    queryset = creneaux_libres_a_venir(maintenant=maintenant).filter(
+        date__range=(date_debut, date_fin)
+    )
+    if medecins:
+        queryset = queryset.filter(medecin_id__in=medecins)
+    if specialite:
+        queryset = queryset.filter(medecin__specialite_med__iexact=specialite)
+
+    return queryset.select_related('medecin').order_by('date', 'heure_debut', 'medecin_id')[:limite]
+
+
+def calendrier(date_debut, date_fin, medecins=None, specialite=None):
+    """
+    Calendrier compact (vues semaine / mois) construit en une seule requête :
+    pour chaque médecin, son nom (une seule fois) et par jour les ids des
+    créneaux, leurs minutes de début et une chaîne de bits ('1' = libre).
+    """
+    queryset = Creneau.objects.filter(date__range=(date_debut, date_fin))
+    if medecins:
+        queryset = queryset.filter(medecin_id__in=medecins)
+    if specialite:
+        queryset = queryset.filter(medecin__specialite_med__iexact=specialite)
+
+    resultat = {}
+    for medecin_id, nom, prenom, date, creneau_id, debut, libre in queryset.order_by(
+        'medecin_id', 'date', 'heure_debut'
+    ).values_list(
+        'medecin_id', 'medecin__nom_med', 'medecin__prenom_med',
+        'date', 'id', 'heure_debut', 'libre'
+    ):
+        medecin = resultat.get(medecin_id)
+        if medecin is None:
+            medecin = resultat[medecin_id] = {'nom': nom, 'prenom': prenom, 'jours': {}}
+        jour = medecin['jours'].setdefault(str(date), {'ids': [], 'debuts': [], 'libres': []})
+        jour['ids'].append(creneau_id)
+        jour['debuts'].append(debut.hour * 60 + debut.minute)
+        jour['libres'].append('1' if libre else '0')
+
+    for medecin in resultat.values():
+        for jour in medecin['jours'].values():
+            jour['libres'] = ''.join(jour['libres'])
+
+    return {'debut': str(date_debut), 'fin': str(date_fin), 'medecins': resultat}
+
+
+# ===== RÉSERVATION ATOMIQUE =====
+
+class CreneauIndisponible(Exception):
+    """Le créneau demandé vient d'être réservé par quelqu'un d'autre"""
+
+
+class CreneauIntrouvable(Exception):
+    """Le créneau demandé n'existe pas"""
+
+
+def _prendre_creneau(creneau_id):
+    """
+    Réserve un créneau par un UPDATE conditionnel (WHERE libre = true et
+    créneau pas encore passé) : une seule requête gagne en cas de
+    réservations simultanées. Retourne le medecin_id du créneau.
+    """
+    if not creneaux_libres_a_venir(Creneau.objects.filter(pk=creneau_id)).update(libre=False):
+        creneau = Creneau.objects.filter(pk=creneau_id).values('libre').first()
+        if creneau is None:
+            raise CreneauIntrouvable("Créneau introuvable")
+        if creneau['libre']:
+            raise CreneauIndisponible("Ce créneau est déjà passé")
+        raise CreneauIndisponible("Ce créneau n'est plus disponible")
+    medecin_id, date = Creneau.objects.filter(pk=creneau_id).values_list('medecin_id', 'date').get()
+    disponibilites.invalider(medecin_id, date)
+    modifications.enregistrer('creneau', [creneau_id], details={'libre': False})
+    return medecin_id
+
+
+def reserver_creneau(patient_id, creneau_id):
+    """Crée un RDV sur un créneau libre, dans une transaction"""
+    with transaction.atomic():
+        medecin_id = _prendre_creneau(creneau_id)
+        rdv = RDV(patient_id=patient_id, medecin_id=medecin_id, creneau_id=creneau_id)
+        rdv._creneau_gere = True
+        rdv.save(force_insert=True)
+    return rdv
+
+
+def deplacer_rdv(rdv, creneau_id):
+    """
+    Déplace un RDV vers un autre créneau libre (éventuellement d'un autre médecin) :
+    le nouveau créneau est réservé, l'ancien libéré, dans une même transaction.
+    Le RDV est verrouillé (SELECT ... FOR UPDATE) et son créneau relu : deux
+    déplacements simultanés ne libèrent pas le même ancien créneau.
+    """
+    with transaction.atomic():
+        ancien_creneau_id = RDV.objects.select_for_update().values_list('creneau_id', flat=True).get(pk=rdv.pk)
+        rdv.creneau_id = ancien_creneau_id
+        if ancien_creneau_id == creneau_id:
+            return rdv
+
+        rdv.medecin_id = _prendre_creneau(creneau_id)
+        rdv.creneau_id = creneau_id
+        rdv._creneau_gere = True
+        rdv.save(update_fields=['medecin', 'creneau'])
+        if ancien_creneau_id:
+            Creneau.objects.filter(pk=ancien_creneau_id).update(libre=True)
+            disponibilites.invalider_creneau(ancien_creneau_id)
+            modifications.enregistrer('creneau', [ancien_creneau_id])
+    return rdv
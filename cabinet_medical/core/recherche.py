@@ -0,0 +1,443 @@
+# core/recherche.py
+"""
+Recherche indexée des patients (accueil, ?search= de patients/).
+
+Les champs recherchés (nom, prénom, CIN, téléphone) sont découpés en jetons
+normalisés stockés dans IndexPatient : chaque mot entier et chacun de ses
+préfixes d'au moins LONGUEUR_MIN caractères. Une recherche devient une suite
+d'égalités sur l'index (jeton, patient) au lieu de LIKE '%x%' sur la table :
+  - un CIN ou un numéro de téléphone complet est cherché tel quel (mot entier,
+    sans agrégation) ;
+  - sinon chaque mot saisi doit commencer un mot d'un des champs ; les patients
+    sont classés par pertinence (2 par mot entier trouvé, 1 par préfixe), puis
+    par nom et prénom.
+
+Un mot courant ("mohamed") est porté par des dizaines de milliers de patients :
+les candidats sont d'abord lus dans l'index pour le mot saisi le plus sélectif
+(porté par le moins de patients, d'après un comptage borné de l'index pour
+chaque mot), parmi les patients qui ont aussi les autres mots, mots entiers
+d'abord, au plus CANDIDATS_RECHERCHE_MAX ; seuls ces candidats sont classés.
+Au-delà, une saisie plus précise est nécessaire pour atteindre les autres
+patients.
+
+Normalisation : minuscules sans accents, mots séparés par tout caractère non
+alphanumérique ("El-Fassi" -> el, fassi, et le nom compacté elfassi). Le CIN
+est compacté ("BK 12345" -> bk12345), le téléphone réduit à ses chiffres au
+format national (+212 6... -> 06...).
+
+Recherche approchée (rechercher_approche) : les noms et prénoms ont aussi des
+clés phonétiques (phonetique=True) qui rapprochent les transcriptions
+françaises de l'arabe (ou/w, ch/sh, kh/k, gh/rh, dj/j, q/k, voyelles ignorées)
+et ignorent les particules (el, al, ben, aït..., séparées ou collées) :
+"Elamrani", "El Amrani" et "Al Amrani" ont la même clé, comme "Mohamed" et
+"Mouhammad". Les candidats qui ont la clé de chaque mot saisi (au plus
+CANDIDATS_MAX) sont seuls classés par similarité des noms normalisés.
+
+Saisie semi-automatique (suggestions) : les 10 premiers patients (id, nom,
+prénom, CIN, date de naissance) pour chaque frappe, gardés dans un cache LRU du
+processus. Les entrées portent la version 'patient' de core/catalogues.py,
+incrémentée à chaque écriture de patient. Cette version n'est vue par tous les
+processus serveur que si le cache des référentiels est partagé (avertissement
+core.W002 sinon, voir core/checks.py). Les entrées expirent en outre après
+SUGGESTIONS_CACHE_DUREE secondes : c'est la durée maximale d'une suggestion
+périmée si la version est perdue (éviction) ou propre à un processus.
+
+L'index est réécrit à l'enregistrement d'un patient (core/signals.py) et
+supprimé avec lui (CASCADE). Les écritures sans signal (bulk_create, update())
+doivent appeler indexer(), ou reconstruire tout l'index :
+
+    python manage.py reconstruire_index_patients
+"""
+import re
+import time
+import unicodedata
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, Exists, IntegerField, OuterRef, Q, Sum, Value, When
+from rest_framework import filters
+
+from . import catalogues
+from .models import IndexPatient, Patient
+
+
+CHAMPS = ('nom_patient', 'prenom_patient', 'cin', 'telephone')
+CHAMPS_NOMS = ('nom_patient', 'prenom_patient')
+
+LONGUEUR_MIN = 2     # préfixe le plus court indexé (et mot le plus court cherché)
+LONGUEUR_MAX = 40    # IndexPatient.jeton
+CHIFFRES_TELEPHONE_MIN = 8
+CANDIDATS_MAX = 200  # patients classés par la recherche approchée
+CANDIDATS_RECHERCHE_MAX = 1000  # patients classés par la recherche par préfixes
+SUGGESTIONS_MAX = 10
+CHAMPS_SUGGESTION = ('id_patient', 'nom_patient', 'prenom_patient', 'cin', 'date_naissance')
+
+PARTICULES = frozenset(('el', 'al', 'ben', 'bin', 'ibn', 'ait', 'ou', 'ould', 'de', 'du', 'des', 'la', 'le', 'd', 'l'))
+PARTICULES_COLLEES = ('el', 'al', 'ben')
+RESTE_DECOLLE_MIN = 5  # elamrani -> amrani, mais alaoui reste alaoui
+VOYELLES = frozenset('aeiouy')
+
+# Transcriptions équivalentes, appliquées dans l'ordre ; les codes en majuscules
+# ne sont plus touchés par les règles suivantes
+_EQUIVALENCES = [(re.compile(motif), code) for motif, code in (
+    (r'sch|ch|sh', 'X'),        # ش : Chraibi, Shraibi
+    (r'kh', 'K'),               # خ : Khalil, Kalil
+    (r'gh|rh', 'G'),            # غ : Ghali, Rhali
+    (r'dj|j', 'J'),             # ج : Khadidja, Khadija
+    (r'gu(?=[eiy])', 'G'),      # Guessous
+    (r'g(?=[eiy])', 'J'),       # Gilali, Jilali
+    (r'c(?=[eiy])', 'S'),
+    (r'ck|c|q|k', 'K'),         # ق : Qadiri, Kadiri
+    (r'dh', 'D'),
+    (r'th', 'T'),
+    (r'ph|f|v', 'F'),
+    (r'p|b', 'B'),
+    (r'ou|oo|w', 'u'),          # Ouazzani, Wazzani
+    (r'h', ''),                 # Mohamed, Moamed
+    (r'x', 'KS'),
+)]
+
+_SEPARATEURS = re.compile(r'[\W_]+')
+_CIN = re.compile(r'^[a-z]{1,2}\d{3,}$')
+_TELEPHONE = re.compile(r'^\+?[\d\s.()/-]+$')
+
+
+# ===== NORMALISATION =====
+
+def normaliser(texte):
+    """Minuscules, sans accents"""
+    texte = unicodedata.normalize('NFKD', texte or '')
+    return ''.join(c for c in texte if not unicodedata.combining(c)).lower()
+
+
+def mots(texte):
+    return [mot for mot in _SEPARATEURS.split(normaliser(texte)) if mot]
+
+
+def normaliser_telephone(telephone):
+    """Chiffres du numéro au format national : +212 6 12.. / 00212 6 12.. -> 0612.."""
+    chiffres = re.sub(r'\D', '', telephone or '')
+    if chiffres.startswith('00212'):
+        return '0' + chiffres[5:]
+    if chiffres.startswith('212') and len(chiffres) == 12:
+        return '0' + chiffres[3:]
+    return chiffres
+
+
+def sans_particules(mots_nom):
+    """Mots d'un nom sans les particules séparées, sauf si le nom n'est fait que de particules"""
+    return [mot for mot in mots_nom if mot not in PARTICULES] or mots_nom
+
+
+def decoller(mot):
+    """Retire une particule collée en tête : elamrani -> amrani, benjelloun -> jelloun"""
+    for particule in PARTICULES_COLLEES:
+        if mot.startswith(particule) and len(mot) - len(particule) >= RESTE_DECOLLE_MIN:
+            return mot[len(particule):]
+    return mot
+
+
+def cle_phonetique(mot):
+    """
+    Clé phonétique d'un mot normalisé : transcriptions équivalentes unifiées,
+    voyelles ignorées sauf en tête (notée A), lettres répétées fusionnées.
+    mohamed, mouhammad -> MD ; youssef, yousef -> ASF ; chraibi, shraibi -> XRB
+    """
+    code = mot
+    for motif, remplacement in _EQUIVALENCES:
+        code = motif.sub(remplacement, code)
+    cle = []
+    for position, lettre in enumerate(code):
+        if lettre in VOYELLES:
+            if position:
+                continue
+            lettre = 'A'
+        lettre = lettre.upper()
+        if not cle or cle[-1] != lettre:
+            cle.append(lettre)
+    return ''.join(cle)[:LONGUEUR_MAX]
+
+
+def cles_phonetiques(valeur):
+    """Clés phonétiques d'un nom : chaque mot, avec et sans particule collée, et le nom compacté"""
+    tous = mots(valeur)
+    cles = set()
+    for mot in sans_particules(tous):
+        cles.add(cle_phonetique(mot))
+        cles.add(cle_phonetique(decoller(mot)))
+    if len(tous) > 1:
+        cles.add(cle_phonetique(''.join(tous)))
+    cles.discard('')
+    return cles
+
+
+def _mots_champ(champ, valeur):
+    if champ == 'telephone':
+        return [normaliser_telephone(valeur)]
+    if champ == 'cin':
+        return [''.join(mots(valeur))]
+    mots_nom = mots(valeur)
+    if len(mots_nom) > 1:  # "El Amrani" est aussi cherchable en "elamrani"
+        mots_nom.append(''.join(mots_nom))
+    return mots_nom
+
+
+def jetons(champ, valeur):
+    """{jeton: complet} d'un champ : chaque mot entier et ses préfixes"""
+    resultat = {}
+    for mot in _mots_champ(champ, valeur):
+        mot = mot[:LONGUEUR_MAX]
+        for longueur in range(LONGUEUR_MIN, len(mot)):
+            resultat.setdefault(mot[:longueur], False)
+        if mot:
+            resultat[mot] = True
+    return resultat
+
+
+def lignes_index(patient):
+    """(champ, jeton, complet, phonetique) à indexer pour un patient"""
+    lignes = [
+        (champ, jeton, complet, False)
+        for champ in CHAMPS
+        for jeton, complet in jetons(champ, getattr(patient, champ)).items()
+    ]
+    lignes += [
+        (champ, cle, True, True)
+        for champ in CHAMPS_NOMS
+        for cle in sorted(cles_phonetiques(getattr(patient, champ)))
+    ]
+    return lignes
+
+
+# ===== MAINTENANCE DE L'INDEX =====
+
+def indexer(patients, batch_size=1000, modele_index=IndexPatient):
+    """Réécrit l'index des patients donnés ; retourne le nombre de jetons écrits"""
+    patients = list(patients)
+    if not patients:
+        return 0
+    lignes = [
+        modele_index(patient_id=patient.pk, champ=champ, jeton=jeton, complet=complet, phonetique=phonetique)
+        for patient in patients
+        for champ, jeton, complet, phonetique in lignes_index(patient)
+    ]
+    with transaction.atomic():
+        modele_index.objects.filter(patient_id__in=[p.pk for p in patients]).delete()
+        modele_index.objects.bulk_create(lignes, batch_size=batch_size)
+    return len(lignes)
+
+
+def reconstruire(batch_size=1000, modele_patient=Patient, modele_index=IndexPatient):
+    """
+    Réindexe tous les patients par lots de batch_size (une transaction par
+    lot : la recherche reste servie pendant la reconstruction).
+    Retourne (patients, jetons).
+    """
+    patients = total = 0
+    dernier = None
+    while True:
+        lot = modele_patient.objects.order_by('pk').only('pk', *CHAMPS)
+        if dernier is not None:
+            lot = lot.filter(pk__gt=dernier)
+        lot = list(lot[:batch_size])
+        if not lot:
+            return patients, total
+        total += indexer(lot, batch_size, modele_index)
+        patients += len(lot)
+        dernier = lot[-1].pk
+
+
+# ===== RECHERCHE =====
+
+def saisie_exacte(q):
+    """(champ, jeton) si la saisie est un CIN ou un numéro de téléphone complet, sinon None"""
+    compact = ''.join(mots(q))
+    if _CIN.match(compact):
+        return 'cin', compact[:LONGUEUR_MAX]
+    if _TELEPHONE.match(q.strip()):
+        chiffres = normaliser_telephone(q)
+        if len(chiffres) >= CHIFFRES_TELEPHONE_MIN:
+            return 'telephone', chiffres[:LONGUEUR_MAX]
+    return None
+
+
+def jetons_requete(q):
+    """Mots cherchables de la saisie, au format de l'index"""
+    if _TELEPHONE.match(q.strip()):  # chiffres et séparateurs : un seul numéro
+        chiffres = normaliser_telephone(q)
+        return [chiffres[:LONGUEUR_MAX]] if len(chiffres) >= LONGUEUR_MIN else []
+    return sorted({mot[:LONGUEUR_MAX] for mot in mots(q) if len(mot) >= LONGUEUR_MIN})
+
+
+def ids_correspondants(q, champs=CHAMPS):
+    """
+    Sous-requête des ids des patients dont les champs contiennent un mot
+    commençant par chacun des mots de q (à utiliser avec pk__in)
+    """
+    return _ids_jetons(jetons_requete(q), champs)
+
+
+def _ids_jetons(termes, champs, phonetique=False):
+    return IndexPatient.objects.filter(
+        phonetique=phonetique, jeton__in=termes, champ__in=champs
+    ).values('patient_id').annotate(
+        trouves=Count('jeton', distinct=True)
+    ).filter(trouves=len(termes)).values('patient_id')
+
+
+def _lignes_jeton(terme, champs):
+    return IndexPatient.objects.filter(phonetique=False, jeton=terme, champ__in=champs)
+
+
+def terme_selectif(termes, champs=CHAMPS):
+    """
+    Mot de la saisie porté par le moins de lignes de l'index : un comptage par
+    mot, borné à CANDIDATS_RECHERCHE_MAX + 1 lignes (le plus long à égalité)
+    """
+    termes = list(dict.fromkeys(termes))
+    if len(termes) == 1:
+        return termes[0]
+    return min(termes, key=lambda terme: (
+        _lignes_jeton(terme, champs)[:CANDIDATS_RECHERCHE_MAX + 1].count(), -len(terme)
+    ))
+
+
+def requete_candidats(termes, champs=CHAMPS):
+    """
+    Ids des patients qui ont le mot le plus sélectif de la saisie et chacun des
+    autres mots, mots entiers d'abord : lecture bornée de l'index
+    (jeton, complet, patient), sans tri
+    """
+    selectif = terme_selectif(termes, champs)
+    requete = _lignes_jeton(selectif, champs)
+    for terme in set(termes) - {selectif}:
+        requete = requete.filter(Exists(_lignes_jeton(terme, champs).filter(patient_id=OuterRef('patient_id'))))
+    return requete.order_by('-complet', '-patient_id').values_list(
+        'patient_id', flat=True
+    )[:CANDIDATS_RECHERCHE_MAX]
+
+
+def rechercher(q, limite=20, champs=CHAMPS, queryset=None):
+    """
+    Patients correspondant à q, les plus pertinents d'abord : une requête pour
+    un CIN ou un téléphone complet, sinon une par mot distinct au-delà du
+    premier (comptages), puis deux (candidats, puis classement)
+    """
+    queryset = Patient.objects.all() if queryset is None else queryset
+
+    exacte = saisie_exacte(q)
+    if exacte and exacte[0] in champs:
+        trouves = list(queryset.filter(
+            jetons_recherche__phonetique=False, jetons_recherche__jeton=exacte[1],
+            jetons_recherche__champ=exacte[0], jetons_recherche__complet=True
+        ).order_by('nom_patient', 'prenom_patient', 'pk')[:limite])
+        if trouves:
+            return trouves
+
+    termes = jetons_requete(q)
+    candidats = list(dict.fromkeys(requete_candidats(termes, champs))) if termes else []
+    if not candidats:
+        return []
+    return list(queryset.filter(
+        pk__in=candidats, jetons_recherche__phonetique=False, jetons_recherche__jeton__in=termes,
+        jetons_recherche__champ__in=champs
+    ).annotate(
+        mots_trouves=Count('jetons_recherche__jeton', distinct=True),
+        pertinence=Sum(Case(
+            When(jetons_recherche__complet=True, then=Value(2)), default=Value(1),
+            output_field=IntegerField()
+        )),
+    ).filter(mots_trouves=len(termes)).order_by(
+        '-pertinence', 'nom_patient', 'prenom_patient', 'pk'
+    )[:limite])
+
+
+def _texte_compare(texte):
+    return ''.join(decoller(mot) for mot in sans_particules(mots(texte)))
+
+
+def similarite(saisie, patient):
+    """Similarité (0 à 1) de la saisie avec le nom et le prénom du patient, dans les deux ordres"""
+    reference = _texte_compare(saisie)
+    nom, prenom = _texte_compare(patient.nom_patient), _texte_compare(patient.prenom_patient)
+    return max(
+        SequenceMatcher(None, reference, texte).ratio()
+        for texte in (nom + prenom, prenom + nom, nom, prenom)
+    )
+
+
+def rechercher_approche(q, limite=20, queryset=None):
+    """
+    Patients dont le nom ou le prénom se prononce comme la saisie : candidats
+    qui ont la clé phonétique de chaque mot saisi (ou de la saisie compactée),
+    classés par similarité orthographique
+    """
+    queryset = Patient.objects.all() if queryset is None else queryset
+    tous = mots(q)
+    cles = sorted({cle_phonetique(decoller(mot)) for mot in sans_particules(tous)} - {''})
+    if not cles:
+        return []
+
+    condition = Q(pk__in=_ids_jetons(cles, CHAMPS_NOMS, phonetique=True))
+    if len(tous) > 1:
+        condition |= Q(pk__in=_ids_jetons([cle_phonetique(''.join(tous))], CHAMPS_NOMS, phonetique=True))
+    candidats = list(queryset.filter(condition).order_by('pk')[:CANDIDATS_MAX])
+    candidats.sort(key=lambda patient: (
+        -similarite(q, patient), patient.nom_patient, patient.prenom_patient, patient.pk
+    ))
+    return candidats[:limite]
+
+
+# ===== SAISIE SEMI-AUTOMATIQUE =====
+
+def cle_suggestion(q):
+    """Saisie normalisée : "Fassi  El", "fassi-el" partagent la même entrée du cache"""
+    return ' '.join(mots(q))
+
+
+@lru_cache(maxsize=getattr(settings, 'SUGGESTIONS_CACHE_TAILLE', 4096))
+def _suggestions(cle, version, tranche):
+    lignes = rechercher(cle, SUGGESTIONS_MAX, queryset=Patient.objects.values(*CHAMPS_SUGGESTION))
+    return tuple(
+        tuple((champ, str(ligne[champ]) if champ == 'date_naissance' else ligne[champ])
+              for champ in CHAMPS_SUGGESTION)
+        for ligne in lignes
+    )
+
+
+def suggestions(q):
+    """
+    Patients proposés pendant la frappe : au plus SUGGESTIONS_MAX, classés
+    comme rechercher(). Aucune requête SQL pour une saisie déjà vue depuis la
+    dernière écriture de patient, ni pour une saisie trop courte.
+    """
+    cle = cle_suggestion(q)
+    if not jetons_requete(cle):
+        return []
+    version = catalogues.versions(['patient'])[0]
+    tranche = int(time.monotonic() // getattr(settings, 'SUGGESTIONS_CACHE_DUREE', 60))  # expiration
+    return [dict(ligne) for ligne in _suggestions(cle, version, tranche)]
+
+
+def vider_suggestions():
+    _suggestions.cache_clear()
+
+
+class RecherchePatientFilter(filters.SearchFilter):
+    """
+    ?search= servi par l'index des patients : chaque mot saisi doit commencer
+    un mot d'un des search_fields. Repli sur SearchFilter si la vue cherche
+    dans un champ non indexé (ou avec un préfixe ^ = @ $), ou si aucun mot
+    saisi n'atteint LONGUEUR_MIN caractères.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        champs = self.get_search_fields(view, request)
+        termes = self.get_search_terms(request)
+        if not champs or not termes:
+            return queryset
+        if not set(champs) <= set(CHAMPS) or not jetons_requete(' '.join(termes)):
+            return super().filter_queryset(request, queryset, view)
+        return queryset.filter(pk__in=ids_correspondants(' '.join(termes), champs))
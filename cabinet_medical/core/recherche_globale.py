@@ -0,0 +1,210 @@
+# core/recherche_globale.py
+"""
+Recherche globale (search/?q=) : patients, médecins, actes, analyses, radios,
+maladies et vaccins en une requête.
+
+Chaque entité est une Source construite sur son ViewSet : les search_fields du
+ViewSet restent la seule définition des champs cherchés.
+  - SourcePatients interroge l'index des patients (core/recherche.py) ;
+  - SourceCatalogue garde en mémoire un index des préfixes du référentiel
+    (mêmes jetons que l'index des patients), reconstruit quand la version du
+    catalogue change (core/catalogues.py, incrémentée par les signaux), et au
+    plus tard après RECHERCHE_GLOBALE_INDEX_DUREE secondes : l'index est propre
+    à chaque processus, la durée borne son retard si la version est perdue
+    (éviction) ou si le cache des référentiels n'est pas partagé (core.W002).
+
+Les sources sont interrogées en parallèle par un pool de threads partagé.
+Celles qui n'ont pas répondu dans le budget de temps sont listées dans
+`incomplets` et la réponse part sans elles. Score commun à toutes les
+sources, entre 0 et 1 : 1 quand chaque mot saisi est un mot entier du
+résultat, 1/2 quand ce ne sont que des débuts de mots.
+
+Dans une transaction (ATOMIC_REQUESTS, tests), les sources sont interrogées
+l'une après l'autre dans le thread de la requête : la connexion d'un autre
+thread ne verrait pas les écritures non validées. Le budget n'est alors
+vérifié qu'avant de démarrer chaque source : une source lente n'est pas
+interrompue et la réponse peut dépasser le budget de sa propre durée.
+
+    RECHERCHE_GLOBALE_BUDGET_MS = 150
+    RECHERCHE_GLOBALE_THREADS = 8
+    RECHERCHE_GLOBALE_INDEX_DUREE = 300
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from . import catalogues, recherche
+
+
+logger = logging.getLogger(__name__)
+
+RESULTATS_PAR_GROUPE = 5
+MEILLEURS = 10
+
+horloge = time.monotonic  # remplacée dans les tests
+
+_executeur = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'RECHERCHE_GLOBALE_THREADS', 8), thread_name_prefix='recherche-globale'
+)
+
+
+def _resultat(groupe, pk, valeurs, score):
+    return {
+        'type': groupe,
+        'id': pk,
+        'libelle': ' '.join(str(v) for v in valeurs.values() if v not in (None, '')),
+        'champs': valeurs,
+        'score': round(min(score, 1.0), 3),
+    }
+
+
+# ===== SOURCES =====
+
+class Source:
+    """Entité cherchée : nom du groupe dans la réponse et ViewSet de référence"""
+
+    def __init__(self, groupe, viewset):
+        self.groupe = groupe
+        self.viewset = viewset
+
+    @property
+    def champs(self):
+        return tuple(self.viewset.search_fields)
+
+    @property
+    def modele(self):
+        return self.viewset.queryset.model
+
+    def chercher(self, q, limite):
+        """Résultats (voir _resultat), les meilleurs d'abord"""
+        raise NotImplementedError
+
+
+class SourcePatients(Source):
+    """Patients, par l'index de recherche (candidats bornés puis classement, voir rechercher)"""
+
+    def chercher(self, q, limite):
+        termes = recherche.jetons_requete(q)
+        pk = self.modele._meta.pk.name
+        lignes = recherche.rechercher(
+            q, limite, champs=self.champs,
+            queryset=self.modele.objects.values(pk, *self.champs)
+        )
+        return [
+            _resultat(
+                self.groupe, ligne[pk], {champ: ligne[champ] for champ in self.champs},
+                ligne['pertinence'] / (2 * len(termes)) if 'pertinence' in ligne else 1.0
+            )
+            for ligne in lignes
+        ]
+
+
+class SourceCatalogue(Source):
+    """
+    Référentiel de quelques centaines de lignes : index des préfixes en mémoire
+    {jeton: {pk: complet}}, reconstruit quand la version du catalogue change
+    ou quand il a plus de RECHERCHE_GLOBALE_INDEX_DUREE secondes
+    """
+
+    def __init__(self, groupe, viewset):
+        super().__init__(groupe, viewset)
+        self._index = (None, None, {}, {})  # (version, construit à, jetons, valeurs par pk)
+        self._verrou = threading.Lock()
+
+    def _a_jour(self, version):
+        version_index, construit, _, _ = self._index
+        duree = getattr(settings, 'RECHERCHE_GLOBALE_INDEX_DUREE', 300)
+        return version_index == version and horloge() - construit < duree
+
+    def index(self):
+        version = catalogues.versions([self.modele._meta.model_name])[0]
+        if self._a_jour(version):
+            return self._index
+        with self._verrou:
+            if not self._a_jour(version):
+                jetons, valeurs = {}, {}
+                pk = self.modele._meta.pk.name
+                for ligne in self.modele.objects.values(pk, *self.champs):
+                    valeurs[ligne[pk]] = {champ: ligne[champ] for champ in self.champs}
+                    for champ in self.champs:
+                        for jeton, complet in recherche.jetons(champ, str(ligne[champ] or '')).items():
+                            entrees = jetons.setdefault(jeton, {})
+                            entrees[ligne[pk]] = entrees.get(ligne[pk], False) or complet
+                self._index = (version, horloge(), jetons, valeurs)
+        return self._index
+
+    def chercher(self, q, limite):
+        termes = recherche.jetons_requete(q)
+        if not termes:
+            return []
+        _, _, jetons, valeurs = self.index()
+        scores = None
+        for terme in termes:
+            trouves = jetons.get(terme, {})
+            if scores is None:
+                scores = {pk: 2 if complet else 1 for pk, complet in trouves.items()}
+            else:
+                scores = {pk: score + (2 if trouves[pk] else 1) for pk, score in scores.items() if pk in trouves}
+        classes = sorted(scores.items(), key=lambda item: (-item[1], str(valeurs[item[0]]), item[0]))
+        return [
+            _resultat(self.groupe, pk, valeurs[pk], score / (2 * len(termes)))
+            for pk, score in classes[:limite]
+        ]
+
+
+# ===== RECHERCHE FÉDÉRÉE =====
+
+def _chercher_dans_le_pool(source, q, limite):
+    try:
+        return source.chercher(q, limite)
+    finally:
+        close_old_connections()  # connexion du thread du pool (CONN_MAX_AGE)
+
+
+def rechercher(q, sources, limite=RESULTATS_PAR_GROUPE, budget_ms=None):
+    """
+    Meilleurs résultats de chaque source et classement commun, dans le budget
+    de temps : {'groupes': {groupe: [...]}, 'meilleurs': [...], 'incomplets': [...]}
+    """
+    budget = (budget_ms or getattr(settings, 'RECHERCHE_GLOBALE_BUDGET_MS', 150)) / 1000
+    debut = horloge()
+    groupes = {source.groupe: [] for source in sources}
+    incomplets = []
+
+    def recevoir(source, obtenir):
+        try:
+            groupes[source.groupe] = obtenir()
+        except Exception:
+            logger.exception("Recherche globale : échec de la source %s", source.groupe)
+            incomplets.append(source.groupe)
+
+    if connection.in_atomic_block:
+        for source in sources:
+            if horloge() - debut > budget:  # vérifié avant chaque source seulement
+                incomplets.append(source.groupe)
+                continue
+            recevoir(source, lambda: source.chercher(q, limite))
+    else:
+        futures = {_executeur.submit(_chercher_dans_le_pool, source, q, limite): source for source in sources}
+        faites, en_retard = wait(futures, timeout=budget)
+        for future in faites:
+            recevoir(futures[future], future.result)
+        for future in en_retard:
+            future.cancel()  # pas encore démarrée : libère le pool
+            incomplets.append(futures[future].groupe)
+
+    ordre = {source.groupe: rang for rang, source in enumerate(sources)}
+    meilleurs = sorted(
+        (resultat for resultats in groupes.values() for resultat in resultats),
+        key=lambda r: (-r['score'], ordre[r['type']], r['libelle'])
+    )[:MEILLEURS]
+    return {
+        'groupes': groupes,
+        'meilleurs': meilleurs,
+        'incomplets': sorted(incomplets, key=ordre.get),
+        'duree_ms': round((horloge() - debut) * 1000, 1),
+    }
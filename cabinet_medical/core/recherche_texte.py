@@ -0,0 +1,262 @@
+# core/recherche_texte.py
+"""
+Recherche plein texte dans les diagnostics et les ordonnances.
+
+Index inversé IndexConsultation : une ligne par occurrence de mot (normalisé
+comme core/recherche.py : minuscules, sans accents) avec sa position dans la
+consultation. Le diagnostic puis les ordonnances (par ordre de création) se
+suivent, séparés d'une position vide : une expression ne chevauche jamais deux
+textes. Les mots vides (le, de, par...) ne sont pas indexés mais comptent dans
+les positions ("3 fois par jour" reste une expression de 4 positions).
+
+Syntaxe des requêtes (tous les critères sont obligatoires) :
+    asthme                 mot entier
+    parac*                 début de mot (au moins PREFIXE_MIN caractères)
+    "fois par jour"        expression, mots consécutifs
+Filtres sur l'index : médecin, date de début, date de fin. Classement : 2 par
+occurrence dans le diagnostic, 1 par occurrence dans une ordonnance, puis les
+consultations les plus récentes.
+
+L'index d'une consultation est réécrit quand elle ou une de ses ordonnances est
+enregistrée (core/signals.py) et supprimé avec elle (CASCADE). Les écritures
+sans signal (bulk_create, update()) doivent appeler indexer(), ou :
+
+    python manage.py reconstruire_index_consultations
+"""
+import re
+
+from django.db import transaction
+from django.db.models import Case, Exists, IntegerField, Max, OuterRef, Q, Sum, Value, When
+from rest_framework import filters
+
+from . import recherche
+from .models import Consultation, IndexConsultation, Ordonnance
+
+
+MOTS_VIDES = frozenset((
+    'a', 'au', 'aux', 'avec', 'ce', 'ces', 'd', 'dans', 'de', 'des', 'du', 'en', 'et', 'l',
+    'la', 'le', 'les', 'ou', 'par', 'pour', 'sa', 'sans', 'ses', 'son', 'sur', 'un', 'une',
+))
+PREFIXE_MIN = 3
+
+# Champ des search_fields -> source de l'index
+SOURCES = {
+    'diagnostic': 'diagnostic',
+    'ordonnance__medicaments': 'medicaments',
+}
+POIDS = {'diagnostic': 2, 'medicaments': 1}
+
+_REQUETE = re.compile(r'"([^"]*)"?|(\S+)')
+
+
+class RequeteInvalide(ValueError):
+    """Requête sans aucun critère cherchable"""
+
+
+# ===== INDEXATION =====
+
+def termes(texte):
+    """(position, terme) des mots du texte ; les mots vides occupent leur position sans être indexés"""
+    return [
+        (position, mot[:recherche.LONGUEUR_MAX])
+        for position, mot in enumerate(recherche.mots(texte))
+        if mot not in MOTS_VIDES
+    ]
+
+
+def lignes_consultation(consultation, ordonnances):
+    """(source, position, terme) d'une consultation et de ses ordonnances"""
+    lignes, decalage = [], 0
+    textes = [('diagnostic', consultation.diagnostic)] + [('medicaments', o.medicaments) for o in ordonnances]
+    for source, texte in textes:
+        mots_texte = termes(texte)
+        lignes += [(source, decalage + position, terme) for position, terme in mots_texte]
+        decalage += len(recherche.mots(texte)) + 1
+    return lignes
+
+
+def indexer(consultation_ids, batch_size=1000):
+    """Réécrit l'index des consultations données ; retourne le nombre de lignes écrites"""
+    consultation_ids = list(consultation_ids)
+    if not consultation_ids:
+        return 0
+    consultations = Consultation.objects.filter(pk__in=consultation_ids).only(
+        'pk', 'diagnostic', 'medecin_id', 'date_cons'
+    )
+    ordonnances = {}
+    for ordonnance in Ordonnance.objects.filter(consultation_id__in=consultation_ids).only(
+        'pk', 'consultation_id', 'medicaments'
+    ).order_by('pk'):
+        ordonnances.setdefault(ordonnance.consultation_id, []).append(ordonnance)
+
+    lignes = [
+        IndexConsultation(
+            consultation_id=consultation.pk, medecin_id=consultation.medecin_id,
+            date_cons=consultation.date_cons, source=source, terme=terme, position=position
+        )
+        for consultation in consultations
+        for source, position, terme in lignes_consultation(consultation, ordonnances.get(consultation.pk, []))
+    ]
+    with transaction.atomic():
+        IndexConsultation.objects.filter(consultation_id__in=consultation_ids).delete()
+        IndexConsultation.objects.bulk_create(lignes, batch_size=batch_size)
+    return len(lignes)
+
+
+def reconstruire(batch_size=500):
+    """Réindexe toutes les consultations par lots ; retourne (consultations, lignes)"""
+    consultations = total = 0
+    dernier = None
+    while True:
+        lot = Consultation.objects.order_by('pk')
+        if dernier is not None:
+            lot = lot.filter(pk__gt=dernier)
+        lot = list(lot.values_list('pk', flat=True)[:batch_size])
+        if not lot:
+            return consultations, total
+        total += indexer(lot, batch_size)
+        consultations += len(lot)
+        dernier = lot[-1]
+
+
+# ===== REQUÊTES =====
+
+def analyser(q):
+    """
+    Critères de la requête : ('mot', terme), ('prefixe', début) ou
+    ('expression', [(décalage, terme), ...])
+    """
+    criteres = []
+    for expression, morceau in _REQUETE.findall(q):
+        prefixe = not expression and morceau.endswith('*')
+        mots_morceau = termes(expression or morceau)
+        if not mots_morceau:
+            continue
+        if len(mots_morceau) > 1:
+            premier = mots_morceau[0][0]
+            criteres.append(('expression', [(position - premier, terme) for position, terme in mots_morceau]))
+        elif prefixe and len(mots_morceau[0][1]) >= PREFIXE_MIN:
+            criteres.append(('prefixe', mots_morceau[0][1]))
+        else:
+            criteres.append(('mot', mots_morceau[0][1]))
+    return criteres
+
+
+def _lignes(filtres):
+    return IndexConsultation.objects.filter(**filtres)
+
+
+def _condition_terme(critere):
+    """Lignes de l'index du critère (premier mot d'une expression)"""
+    nature, valeur = critere
+    if nature == 'prefixe':
+        return Q(terme__startswith=valeur)
+    if nature == 'mot':
+        return Q(terme=valeur)
+    return Q(terme=valeur[0][1])
+
+
+def _ids_critere(critere, filtres):
+    """Sous-requête des consultations qui satisfont un critère"""
+    lignes = _lignes(filtres).filter(_condition_terme(critere))
+    if critere[0] == 'expression':
+        for decalage, terme in critere[1][1:]:
+            lignes = lignes.filter(Exists(IndexConsultation.objects.filter(
+                consultation_id=OuterRef('consultation_id'), position=OuterRef('position') + decalage,
+                terme=terme
+            )))
+    return lignes.values('consultation_id')
+
+
+def _filtres(medecin=None, debut=None, fin=None, sources=None):
+    filtres = {}
+    if medecin:
+        filtres['medecin_id'] = medecin
+    if debut:
+        filtres['date_cons__gte'] = debut
+    if fin:
+        filtres['date_cons__lte'] = fin
+    if sources:
+        filtres['source__in'] = sources
+    return filtres
+
+
+def rechercher_consultations(q, medecin=None, debut=None, fin=None, limite=50, sources=None):
+    """
+    Consultations qui satisfont tous les critères de q, les plus pertinentes
+    d'abord : liste de (id de consultation, score). Une requête SQL.
+    """
+    criteres = analyser(q)
+    if not criteres:
+        raise RequeteInvalide(q)
+    filtres = _filtres(medecin, debut, fin, sources)
+
+    lignes = _lignes(filtres)
+    for critere in criteres:
+        lignes = lignes.filter(consultation_id__in=_ids_critere(critere, filtres))
+    pertinentes = Q()
+    for nature, valeur in criteres:
+        if nature == 'expression':
+            pertinentes |= Q(terme__in=[terme for _, terme in valeur])
+        else:
+            pertinentes |= _condition_terme((nature, valeur))
+    resultats = lignes.filter(pertinentes).values('consultation_id').annotate(
+        score=Sum(Case(
+            *[When(source=source, then=Value(poids)) for source, poids in POIDS.items()],
+            default=Value(1), output_field=IntegerField()
+        )),
+        date=Max('date_cons'),
+    ).order_by('-score', '-date', '-consultation_id')[:limite]
+    return [(ligne['consultation_id'], ligne['score']) for ligne in resultats]
+
+
+def ids_consultations(saisie, sources=None):
+    """
+    Sous-requête des consultations dont le texte contient chaque mot de la
+    saisie (mot entier, ou début de mot dès PREFIXE_MIN caractères) ; pour pk__in
+    """
+    criteres = [
+        ('prefixe', terme) if len(terme) >= PREFIXE_MIN else ('mot', terme)
+        for _, terme in termes(saisie)
+    ]
+    if not criteres:
+        return Consultation.objects.none().values('pk')
+    filtres = _filtres(sources=sources)
+    ids = _ids_critere(criteres[0], filtres)
+    for critere in criteres[1:]:
+        ids = ids.filter(consultation_id__in=_ids_critere(critere, filtres))
+    return ids
+
+
+class RechercheConsultationFilter(filters.SearchFilter):
+    """
+    ?search= des consultations servi par les index : diagnostic et ordonnances
+    par IndexConsultation, nom du patient par l'index des patients. Chaque mot
+    saisi doit se trouver dans un des search_fields, comme avec SearchFilter.
+    Repli sur SearchFilter si un des champs n'est pas indexé.
+    """
+
+    def condition(self, champ):
+        """Fonction saisie -> Q pour un champ des search_fields, ou None si le champ n'est pas indexé"""
+        if champ in SOURCES:
+            return lambda saisie: Q(pk__in=ids_consultations(saisie, [SOURCES[champ]]))
+        chemin, _, nom = champ.rpartition('__')
+        if chemin and nom in recherche.CHAMPS:
+            return lambda saisie: Q(**{f'{chemin}__in': recherche.ids_correspondants(saisie, (nom,))})
+        return None
+
+    def filter_queryset(self, request, queryset, view):
+        champs = self.get_search_fields(view, request)
+        saisies = self.get_search_terms(request)
+        if not champs or not saisies:
+            return queryset
+        conditions = [self.condition(champ) for champ in champs]
+        if None in conditions:
+            return super().filter_queryset(request, queryset, view)
+
+        for saisie in saisies:
+            critere = Q()
+            for condition in conditions:
+                critere |= condition(saisie)
+            queryset = queryset.filter(critere)
+        return queryset
@@ -0,0 +1,316 @@
+# core/requetes.py
+"""
+Plans de requêtes déclaratifs des ViewSets (élimination des requêtes N+1).
+
+Chaque ViewSet déclare, par action, les relations à charger avec la requête
+principale :
+
+    class RDVViewSet(PlanRequetesMixin, viewsets.ModelViewSet):
+        plan_requetes = {
+            'default': Plan(select_related=('patient', 'medecin', 'creneau__medecin')),
+            'destroy': Plan(),
+        }
+
+L'action courante est cherchée dans plan_requetes, puis 'default'. Les actions
+personnalisées doivent partir de self.get_queryset() pour bénéficier du plan.
+
+Avec un serializer à champs dynamiques (?fields= / ?expand=, voir
+ChampsDynamiquesMixin dans core/serializers.py), le plan est restreint aux
+relations réellement rendues et, avec ?fields=, les colonnes lues sont limitées
+par only().
+
+Contrôles :
+- `python manage.py check` compare les chemins `source=` des serializers
+  (champs pointés 'rdv.patient.nom_patient', serializers imbriqués, many=True)
+  au plan de chaque action (avertissement core.W001) ;
+- en DEBUG, tout chargement paresseux d'une clé étrangère pendant une requête
+  GET d'un ViewSet à plan déclenche un ChargementParesseuxWarning.
+"""
+import contextvars
+import warnings
+from collections import Counter, namedtuple
+
+from django.conf import settings
+from django.core import checks
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models.fields.related_descriptors import ForwardManyToOneDescriptor
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+Plan = namedtuple('Plan', ['select_related', 'prefetch_related'], defaults=((), ()))
+
+PLAN_VIDE = Plan()
+
+
+class ChargementParesseuxWarning(RuntimeWarning):
+    """Clé étrangère chargée à la demande (une requête par objet sérialisé)"""
+
+
+# ===== MIXIN =====
+
+class PlanRequetesMixin:
+    plan_requetes = {}
+
+    @classmethod
+    def plan_pour(cls, action):
+        plan = cls.plan_requetes.get(action, cls.plan_requetes.get('default'))
+        return plan or PLAN_VIDE
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        plan = self.plan_pour(getattr(self, 'action', None))
+        colonnes = None
+
+        serializer = self._serializer_restreint()
+        if serializer is not None:
+            plan, colonnes = ajuster_plan(
+                plan, serializer, self.get_serializer_class()(), queryset.model,
+                'fields' in self.request.query_params
+            )
+
+        if colonnes:
+            queryset = queryset.only(*colonnes, *self._colonnes_tri(queryset.model))
+        if plan.select_related:
+            queryset = queryset.select_related(*plan.select_related)
+        if plan.prefetch_related:
+            queryset = queryset.prefetch_related(*plan.prefetch_related)
+        return queryset
+
+    def _serializer_restreint(self):
+        """Serializer de la requête GET courante si ses champs dépendent de ?fields= / ?expand="""
+        from .serializers import ChampsDynamiquesMixin
+
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+        classe = self.get_serializer_class()
+        if not issubclass(classe, ChampsDynamiquesMixin):
+            return None
+        if not getattr(classe.Meta, 'expandables', ()) and not (
+            'fields' in request.query_params or 'expand' in request.query_params
+        ):
+            return None
+        return self.get_serializer()
+
+    def _colonnes_tri(self, modele):
+        """Colonnes de tri (?ordering=, curseur de pagination), lues pour chaque ligne"""
+        tri = self.request.query_params.get('ordering', '').split(',')
+        curseur = getattr(self, 'cursor_ordering', ())
+        tri += [curseur] if isinstance(curseur, str) else list(curseur)
+        colonnes = []
+        for nom in tri:
+            nom = nom.strip().lstrip('-')
+            try:
+                if nom and modele._meta.get_field(nom).concrete:
+                    colonnes.append(nom)
+            except FieldDoesNotExist:
+                pass
+        return colonnes
+
+    def dispatch(self, request, *args, **kwargs):
+        if not settings.DEBUG or request.method not in SAFE_METHODS:
+            return super().dispatch(request, *args, **kwargs)
+        with surveiller_chargements(type(self).__name__):
+            return super().dispatch(request, *args, **kwargs)
+
+
+# ===== SURVEILLANCE DES CHARGEMENTS PARESSEUX (DEBUG) =====
+
+_chargements = contextvars.ContextVar('chargements_paresseux', default=None)
+
+
+class surveiller_chargements:
+    """Compte les clés étrangères chargées à la demande et avertit à la sortie"""
+
+    def __init__(self, nom):
+        self.nom = nom
+
+    def __enter__(self):
+        self.compteur = Counter()
+        self._jeton = _chargements.set(self.compteur)
+        return self.compteur
+
+    def __exit__(self, *exc):
+        _chargements.reset(self._jeton)
+        if self.compteur:
+            details = ', '.join(f"{champ} x{n}" for champ, n in self.compteur.most_common())
+            warnings.warn(
+                f"{self.nom} : {sum(self.compteur.values())} chargement(s) paresseux ({details}) "
+                f"- compléter plan_requetes",
+                ChargementParesseuxWarning,
+                stacklevel=2
+            )
+        return False
+
+
+_get_object_origine = ForwardManyToOneDescriptor.get_object
+
+
+def _get_object_surveille(self, instance):
+    compteur = _chargements.get()
+    if compteur is not None:
+        compteur[f"{self.field.model.__name__}.{self.field.name}"] += 1
+    return _get_object_origine(self, instance)
+
+
+def installer_surveillance():
+    """Appelé par CoreConfig.ready() en DEBUG"""
+    ForwardManyToOneDescriptor.get_object = _get_object_surveille
+
+
+# ===== CONTRÔLE DES PLANS (manage.py check) =====
+
+def _relation(modele, attribut):
+    """Champ relationnel de `modele` accessible par `attribut` (nom ou accessor inverse)"""
+    for champ in modele._meta.get_fields():
+        if not champ.is_relation:
+            continue
+        nom = champ.get_accessor_name() if champ.auto_created and not champ.concrete else champ.name
+        if nom == attribut:
+            return champ
+    return None
+
+
+def relations_requises(serializer, modele, prefixe=''):
+    """
+    Chemins ORM ('rdv__patient', 'consultationacte_set'...) parcourus par les
+    champs du serializer, répartis en (select_related, prefetch_related).
+    """
+    select, prefetch = set(), set()
+
+    for champ in serializer.fields.values():
+        if champ.write_only or champ.source == '*':
+            continue
+
+        imbrique = isinstance(champ, serializers.BaseSerializer)
+        attributs = champ.source_attrs if imbrique else champ.source_attrs[:-1]
+
+        courant, chemin, multiple = modele, prefixe, False
+        for attribut in attributs:
+            relation = _relation(courant, attribut)
+            if relation is None:
+                break
+            chemin = f"{chemin}__{attribut}" if chemin else attribut
+            multiple = multiple or relation.one_to_many or relation.many_to_many
+            (prefetch if multiple else select).add(chemin)
+            courant = relation.related_model
+        else:
+            if imbrique:
+                enfant = champ.child if isinstance(champ, serializers.ListSerializer) else champ
+                if isinstance(enfant, serializers.ModelSerializer):
+                    sous_select, sous_prefetch = relations_requises(enfant, courant, chemin)
+                    (prefetch if multiple else select).update(sous_select)
+                    prefetch.update(sous_prefetch)
+
+    return select, prefetch
+
+
+def _couvert(chemin, chemins):
+    return any(c == chemin or c.startswith(chemin + '__') for c in chemins)
+
+
+def colonnes_rendues(serializer, modele, prefixe=''):
+    """
+    Chemins ORM des colonnes lues par les champs du serializer, pour only().
+    Retourne None si un champ lit l'objet entier (SerializerMethodField, source='*')
+    ou un attribut qui n'est pas une colonne.
+    """
+    colonnes = []
+    for champ in serializer.fields.values():
+        if champ.write_only:
+            continue
+        if champ.source == '*':
+            return None
+        if isinstance(champ, serializers.ListSerializer):
+            continue  # relation multiple : préchargée à part
+
+        courant, chemin = modele, prefixe
+        for attribut in champ.source_attrs[:-1]:
+            relation = _relation(courant, attribut)
+            if relation is None:
+                return None
+            chemin = f"{chemin}__{attribut}" if chemin else attribut
+            courant = relation.related_model
+
+        dernier = champ.source_attrs[-1]
+        if isinstance(champ, serializers.BaseSerializer):
+            relation = _relation(courant, dernier)
+            if relation is None or not isinstance(champ, serializers.ModelSerializer):
+                return None
+            sous_colonnes = colonnes_rendues(champ, relation.related_model, f"{chemin}__{dernier}" if chemin else dernier)
+            if sous_colonnes is None:
+                return None
+            colonnes.extend(sous_colonnes)
+            continue
+
+        try:
+            courant._meta.get_field(dernier)
+        except FieldDoesNotExist:
+            return None
+        colonnes.append(f"{chemin}__{dernier}" if chemin else dernier)
+    return colonnes
+
+
+def ajuster_plan(plan, serializer, complet, modele, restreindre_colonnes):
+    """
+    Retire du plan les relations lues uniquement par des champs non rendus
+    (non demandés dans ?fields= ou non étendus par ?expand=). Retourne
+    (plan, colonnes) où colonnes est la liste à passer à only(), ou None.
+    """
+    select, prefetch = relations_requises(serializer, modele)
+    select_complet, prefetch_complet = relations_requises(complet, modele)
+    inutiles = (select_complet | prefetch_complet) - (select | prefetch)
+
+    colonnes = colonnes_rendues(serializer, modele) if restreindre_colonnes else None
+    if colonnes is not None:
+        # Colonnes connues exactement : le plan se déduit entièrement du serializer
+        return Plan(tuple(sorted(select)), tuple(sorted(prefetch))), colonnes
+
+    garder_select = [c for c in plan.select_related if c not in inutiles]
+    garder_prefetch = [c for c in plan.prefetch_related if c not in inutiles]
+    garder_select += sorted(c for c in select if not _couvert(c, garder_select))
+    garder_prefetch += sorted(c for c in prefetch if not _couvert(c, garder_prefetch))
+    return Plan(tuple(garder_select), tuple(garder_prefetch)), None
+
+
+def chemins_manquants(plan, serializer, modele):
+    charges = set(plan.select_related) | set(plan.prefetch_related)
+    select, prefetch = relations_requises(serializer, modele)
+    return sorted(chemin for chemin in select | prefetch if not _couvert(chemin, charges))
+
+
+def _actions(viewset):
+    actions = {'list', 'retrieve'}
+    for extra in viewset.get_extra_actions():
+        if 'get' in extra.mapping:
+            actions.add(extra.__name__)
+    return sorted(actions)
+
+
+@checks.register()
+def verifier_plans_requetes(app_configs=None, **kwargs):
+    from .urls import router
+
+    erreurs = []
+    vus = set()
+    for _, viewset, _ in router.registry:
+        if not issubclass(viewset, PlanRequetesMixin) or viewset in vus:
+            continue
+        vus.add(viewset)
+        modele = viewset.queryset.model
+        for action in _actions(viewset):
+            vue = viewset(action=action, request=None, format_kwarg=None, kwargs={})
+            serializer = vue.get_serializer_class()()
+            if not isinstance(serializer, serializers.ModelSerializer):
+                continue
+            manquants = chemins_manquants(viewset.plan_pour(action), serializer, modele)
+            if manquants:
+                erreurs.append(checks.Warning(
+                    f"{viewset.__name__}.{action} : relations non chargées par plan_requetes : "
+                    f"{', '.join(manquants)}",
+                    hint="Ajouter ces chemins à select_related / prefetch_related du plan",
+                    obj=viewset,
+                    id='core.W001',
+                ))
+    return erreurs
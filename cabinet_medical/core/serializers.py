@@ -1,22 +1,59 @@
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from .models import (
     Patient, Medecin, RDV, Creneau, Consultation,
     Employe, ActeMedical, ConsultationActe,
     Ordonnance, OrdonnanceAnalyse, OrdonnanceRadio,
     Analyse, Radio, DossierMedical, Facture, Maladie, MaladieDossier,        
     Vaccin, VaccinDossier,             
-    Allergie, AllergieDossier,JourTravail,OrganismeAssurance,PatientOrganisme
+    Allergie, AllergieDossier,JourTravail,OrganismeAssurance,PatientOrganisme,
+    ModeleHoraire, Fermeture
 )
 
 
 
-class EmployeSerializer(serializers.ModelSerializer):
+class ChampsDynamiquesMixin:
+    """
+    Champs rendus à la demande (requêtes GET uniquement) :
+        ?fields=a,b,c   restreint la réponse à ces champs
+        ?expand=x,y     inclut les champs de Meta.expandables (exclus par défaut)
+    Le ViewSet (core/requetes.py) adapte select_related / prefetch_related et
+    limite les colonnes lues avec only() en conséquence.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return
+
+        demandes = parametre_liste(request, 'fields')
+        etendus = parametre_liste(request, 'expand') or set()
+        expandables = getattr(self.Meta, 'expandables', ())
+        for nom in list(self.fields):
+            if nom in expandables:
+                garder = nom in etendus or (demandes is not None and nom in demandes)
+            else:
+                garder = demandes is None or nom in demandes
+            if not garder:
+                self.fields.pop(nom)
+
+
+def parametre_liste(request, nom):
+    """Valeurs d'un paramètre 'a,b,c' de la query string (None si absent)"""
+    valeur = request.query_params.get(nom)
+    if valeur is None:
+        return None
+    return {v.strip() for v in valeur.split(',') if v.strip()}
+
+
+class EmployeSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     class Meta:
         model = Employe
         fields = '__all__'
 
 
-class PatientSerializer(serializers.ModelSerializer):
+class PatientSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     employe_nom = serializers.CharField(source='employe.nom_empl', read_only=True)
     
     class Meta:
@@ -24,7 +61,7 @@ class PatientSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class MedecinSerializer(serializers.ModelSerializer):
+class MedecinSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     nom_complet = serializers.SerializerMethodField()
     
     class Meta:
@@ -35,7 +72,7 @@ class MedecinSerializer(serializers.ModelSerializer):
         return f"Dr {obj.nom_med} {obj.prenom_med}"
 
 
-class CreneauSerializer(serializers.ModelSerializer):
+class CreneauSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     medecin_nom = serializers.CharField(source='medecin.nom_med', read_only=True)
     medecin_prenom = serializers.CharField(source='medecin.prenom_med', read_only=True)
     
@@ -44,7 +81,7 @@ class CreneauSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class RDVSerializer(serializers.ModelSerializer):
+class RDVSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     patient_nom = serializers.CharField(source='patient.nom_patient', read_only=True)
     patient_prenom = serializers.CharField(source='patient.prenom_patient', read_only=True)
     medecin_nom = serializers.CharField(source='medecin.nom_med', read_only=True)
@@ -55,9 +92,21 @@ class RDVSerializer(serializers.ModelSerializer):
     class Meta:
         model = RDV
         fields = '__all__'
+        expandables = ('creneau_details',)
+
+
+class ReservationSerializer(serializers.Serializer):
+    """Paramètres de réservation atomique d'un créneau"""
+    patient = serializers.PrimaryKeyRelatedField(queryset=Patient.objects.all())
+    creneau = serializers.IntegerField()
+
 
+class DeplacementRDVSerializer(serializers.Serializer):
+    """Paramètres de déplacement d'un RDV vers un autre créneau"""
+    creneau = serializers.IntegerField()
 
-class ConsultationActeSerializer(serializers.ModelSerializer):
+
+class ConsultationActeSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     acte_nom = serializers.CharField(source='acte.nom_acte', read_only=True)
     
     class Meta:
@@ -65,7 +114,7 @@ class ConsultationActeSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class ConsultationSerializer(serializers.ModelSerializer):
+class ConsultationSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     patient_nom = serializers.CharField(source='rdv.patient.nom_patient', read_only=True)
     patient_prenom = serializers.CharField(source='rdv.patient.prenom_patient', read_only=True)
     medecin_nom = serializers.CharField(source='medecin.nom_med', read_only=True)
@@ -76,26 +125,28 @@ class ConsultationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Consultation
         fields = '__all__'
+        read_only_fields = ['total_actes', 'nb_actes', 'montant_total']
+        expandables = ('actes_list',)
 
-class ActeMedicalSerializer(serializers.ModelSerializer):
+class ActeMedicalSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     class Meta:
         model = ActeMedical
         fields = '__all__'
 
 
-class AnalyseSerializer(serializers.ModelSerializer):
+class AnalyseSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     class Meta:
         model = Analyse
         fields = '__all__'
 
 
-class RadioSerializer(serializers.ModelSerializer):
+class RadioSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     class Meta:
         model = Radio
         fields = '__all__'
 
 
-class OrdonnanceAnalyseSerializer(serializers.ModelSerializer):
+class OrdonnanceAnalyseSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     analyse_nom = serializers.CharField(source='analyse.nom_analyse', read_only=True)
     patient_nom = serializers.CharField(source='consultation.rdv.patient.nom_patient', read_only=True)
     medecin_nom = serializers.CharField(source='consultation.medecin.nom_med', read_only=True)
@@ -105,7 +156,7 @@ class OrdonnanceAnalyseSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class OrdonnanceRadioSerializer(serializers.ModelSerializer):
+class OrdonnanceRadioSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     radio_nom = serializers.CharField(source='radio.nom_rad', read_only=True)
     patient_nom = serializers.CharField(source='consultation.rdv.patient.nom_patient', read_only=True)
     medecin_nom = serializers.CharField(source='consultation.medecin.nom_med', read_only=True)
@@ -115,7 +166,7 @@ class OrdonnanceRadioSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class OrdonnanceSerializer(serializers.ModelSerializer):
+class OrdonnanceSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     patient_nom = serializers.CharField(source='consultation.rdv.patient.nom_patient', read_only=True)
     medecin_nom = serializers.CharField(source='consultation.medecin.nom_med', read_only=True)
     medecin_specialite = serializers.CharField(source='consultation.medecin.specialite_med', read_only=True)
@@ -124,7 +175,7 @@ class OrdonnanceSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class DossierMedicalSerializer(serializers.ModelSerializer):
+class DossierMedicalSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     patient_nom = serializers.CharField(source='patient.nom_patient', read_only=True)
     patient_prenom = serializers.CharField(source='patient.prenom_patient', read_only=True)
     
@@ -135,7 +186,7 @@ class DossierMedicalSerializer(serializers.ModelSerializer):
 
 
 
-class FactureSerializer(serializers.ModelSerializer):
+class FactureSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     patient_nom = serializers.CharField(source='consultation.rdv.patient.nom_patient', read_only=True)
     patient_prenom = serializers.CharField(source='consultation.rdv.patient.prenom_patient', read_only=True)
     medecin_nom = serializers.CharField(source='consultation.medecin.nom_med', read_only=True)
@@ -145,6 +196,9 @@ class FactureSerializer(serializers.ModelSerializer):
     class Meta:
         model = Facture
         fields = '__all__'
+        read_only_fields = ['total_actes', 'nb_actes', 'montant_total']
+        # Colonne équivalente pour la lecture rapide (core/lecture_rapide.py)
+        colonnes_methodes = {'montant_calcule': 'montant_total'}
     
     def get_montant_calcule(self, obj):
         return obj.calculer_montant()
@@ -153,7 +207,7 @@ class FactureSerializer(serializers.ModelSerializer):
 
 # Ajoutez ces serializers dans votre fichiers serializers.py
 
-class FactureDetailSerializer(serializers.ModelSerializer):
+class FactureDetailSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     """Serializer détaillé pour une facture avec tous les actes médicaux"""
     
     # Informations patient
@@ -170,8 +224,8 @@ class FactureDetailSerializer(serializers.ModelSerializer):
     # Actes médicaux avec détails
     actes_medicaux = serializers.SerializerMethodField()
     
-    # Montant total calculé
-    montant_total = serializers.SerializerMethodField()
+    # Montant total (stocké, tenu à jour par core/totaux.py)
+    montant_total = serializers.FloatField(read_only=True)
     
     class Meta:
         model = Facture
@@ -192,8 +246,8 @@ class FactureDetailSerializer(serializers.ModelSerializer):
     
     def get_actes_medicaux(self, obj):
         """Récupère tous les actes médicaux de la consultation"""
-        consultation = obj.consultation
-        actes = ConsultationActe.objects.filter(consultation=consultation)
+        # consultationacte_set__acte est préchargé par le plan de FactureViewSet
+        actes = obj.consultation.consultationacte_set.all()
         
         return [{
             'id': acte.id,
@@ -203,19 +257,16 @@ class FactureDetailSerializer(serializers.ModelSerializer):
             'prix_total': acte.prix_applique * acte.quantite
         } for acte in actes]
     
-    def get_montant_total(self, obj):
-        """Calcule le montant total (consultation + actes)"""
-        return obj.calculer_montant()
     
 # Ajoutez ces serializers à la fin du fichier
 
-class OrganismeAssuranceSerializer(serializers.ModelSerializer):
+class OrganismeAssuranceSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     class Meta:
         model = OrganismeAssurance
         fields = '__all__'
 
 
-class PatientOrganismeSerializer(serializers.ModelSerializer):
+class PatientOrganismeSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     organisme_nom = serializers.CharField(source='organisme.nom_org', read_only=True)
     organisme_type = serializers.CharField(source='organisme.type_org', read_only=True)
     
@@ -223,13 +274,13 @@ class PatientOrganismeSerializer(serializers.ModelSerializer):
         model = PatientOrganisme
         fields = '__all__'
 
-class MaladieSerializer(serializers.ModelSerializer):
+class MaladieSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     class Meta:
         model = Maladie
         fields = '__all__'
 
 
-class MaladieDossierSerializer(serializers.ModelSerializer):
+class MaladieDossierSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     maladie_nom = serializers.CharField(source='maladie.nom_malad', read_only=True)
     
     class Meta:
@@ -237,13 +288,13 @@ class MaladieDossierSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class VaccinSerializer(serializers.ModelSerializer):
+class VaccinSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     class Meta:
         model = Vaccin
         fields = '__all__'
 
 
-class VaccinDossierSerializer(serializers.ModelSerializer):
+class VaccinDossierSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     vaccin_nom = serializers.CharField(source='vaccin.nom_vacc', read_only=True)
     
     class Meta:
@@ -251,13 +302,13 @@ class VaccinDossierSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class AllergieSerializer(serializers.ModelSerializer):
+class AllergieSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     class Meta:
         model = Allergie
         fields = '__all__'
 
 
-class AllergieDossierSerializer(serializers.ModelSerializer):
+class AllergieDossierSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     allergie_nom = serializers.CharField(source='allergie.nom_allerg', read_only=True)
     
     class Meta:
@@ -267,16 +318,79 @@ class AllergieDossierSerializer(serializers.ModelSerializer):
 # Ajoutez ceci dans votre serializers.py
 
 
-class JourTravailSerializer(serializers.ModelSerializer):
+class JourTravailSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
     medecin_nom = serializers.SerializerMethodField(read_only=True)
     
     class Meta:
         model = JourTravail
-        fields = ['id', 'medecin', 'medecin_nom', 'date', 'heure_debut', 'heure_fin']
+        fields = ['id', 'medecin', 'medecin_nom', 'date', 'heure_debut', 'heure_fin', 'duree_creneau']
         
     def get_medecin_nom(self, obj):
         """Retourne le nom complet du médecin"""
         return f"Dr {obj.medecin.nom_med} {obj.medecin.prenom_med}"
+
+
+class ModeleHoraireSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
+    medecin_nom = serializers.SerializerMethodField(read_only=True)
+
+    class Meta:
+        model = ModeleHoraire
+        fields = '__all__'
+
+    def get_medecin_nom(self, obj):
+        return f"Dr {obj.medecin.nom_med} {obj.medecin.prenom_med}"
+
+    def validate_jours_semaine(self, value):
+        try:
+            jours = sorted({int(j) for j in value.split(',') if j.strip() != ''})
+        except ValueError:
+            raise serializers.ValidationError("Jours invalides (ex : 0,1,2,3,4)")
+        if not jours or any(j < 0 or j > 6 for j in jours):
+            raise serializers.ValidationError("Les jours doivent être compris entre 0 (lundi) et 6 (dimanche)")
+        return ','.join(str(j) for j in jours)
+
+    def validate(self, data):
+        debut = data.get('heure_debut', getattr(self.instance, 'heure_debut', None))
+        fin = data.get('heure_fin', getattr(self.instance, 'heure_fin', None))
+        if debut and fin and fin <= debut:
+            raise serializers.ValidationError("L'heure de fin doit être après l'heure de début")
+        if data.get('duree_creneau') == 0:
+            raise serializers.ValidationError("La durée d'un créneau doit être positive")
+
+        # Plusieurs plages par jour (matin, après-midi) si elles ne se chevauchent pas
+        modele = ModeleHoraire(pk=getattr(self.instance, 'pk', None), heure_debut=debut, heure_fin=fin)
+        for champ in ('medecin', 'jours_semaine', 'actif'):
+            if champ in data:
+                setattr(modele, champ, data[champ])
+            elif self.instance is not None:
+                setattr(modele, champ, getattr(self.instance, champ))
+        autre = modele.chevauchement() if debut and fin else None
+        if autre:
+            raise serializers.ValidationError(f"Chevauche le modèle horaire « {autre} »")
+        return data
+
+
+class FermetureSerializer(ChampsDynamiquesMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Fermeture
+        fields = '__all__'
+
+
+class PublicationHoraireSerializer(serializers.Serializer):
+    """Paramètres de publication des modèles horaires sur une période"""
+    date_debut = serializers.DateField()
+    date_fin = serializers.DateField()
+    exclusions = serializers.ListField(child=serializers.DateField(), required=False, default=list)
+    medecins = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+
+    MAX_JOURS = 366
+
+    def validate(self, data):
+        if data['date_fin'] < data['date_debut']:
+            raise serializers.ValidationError("La date de fin doit être après la date de début")
+        if (data['date_fin'] - data['date_debut']).days >= self.MAX_JOURS:
+            raise serializers.ValidationError(f"La période ne peut pas dépasser {self.MAX_JOURS} jours")
+        return data
     
 # ===== Dans serializers.py =====
 
@@ -1,38 +1,164 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from datetime import datetime, timedelta
 
-from .models import JourTravail, Creneau
+from django.contrib.auth import get_user_model
 
+from . import catalogues, disponibilites, identites, modifications, recherche, recherche_texte, totaux
+from .models import (
+    JourTravail, Creneau, Medecin, Patient, RDV, Consultation, Facture, ConsultationActe,
+    ActeMedical, Analyse, Radio, Maladie, Vaccin, Allergie, OrganismeAssurance, Ordonnance
+)
+from .statistiques import invalider_statistiques
+from .planning import generer_creneaux_jour, supprimer_creneaux_libres
 
-def generer_creneaux(medecin, date, debut, fin, duree=30):
-    heure = debut
-    duree = timedelta(minutes=duree)
 
-    while heure < fin:
-        heure_fin = (datetime.combine(date, heure) + duree).time()
+@receiver(post_save, sender=JourTravail)
+def creer_creneaux_jour_travail(sender, instance, created, **kwargs):
+    """
+    À la création d'un jour de travail, matérialise ses créneaux de
+    duree_creneau minutes (un seul INSERT groupé, les créneaux déjà existants
+    sont ignorés)
+    """
+    if created:
+        instance.creneaux_crees = generer_creneaux_jour(instance)
 
-        if heure_fin > fin:
-            break
 
-        Creneau.objects.get_or_create(
-            medecin=medecin,
-            date=date,
-            heure_debut=heure,
-            heure_fin=heure_fin,
-            defaults={'libre': True}
-        )
+@receiver(post_delete, sender=JourTravail)
+def supprimer_creneaux_jour_travail(sender, instance, **kwargs):
+    """
+    Supprime les créneaux libres de la plage : les autres plages du jour et
+    les créneaux réservés (et leurs RDV) sont conservés
+    """
+    supprimer_creneaux_libres(instance)
 
-        heure = heure_fin
 
+# ===== COHÉRENCE DU CACHE DES DISPONIBILITÉS =====
 
-@receiver(post_save, sender=JourTravail)
-def creer_creneaux_jour_travail(sender, instance, created, **kwargs):
-    if created:
-        generer_creneaux(
-            medecin=instance.medecin,
-            date=instance.date,
-            debut=instance.heure_debut,
-            fin=instance.heure_fin,
-            duree=30
-        )
+@receiver(post_save, sender=Creneau)
+@receiver(post_delete, sender=Creneau)
+def invalider_disponibilites_creneau(sender, instance, **kwargs):
+    disponibilites.invalider(instance.medecin_id, instance.date)
+
+
+@receiver(post_save, sender=Medecin)
+@receiver(post_delete, sender=Medecin)
+def invalider_disponibilites_medecin(sender, instance, **kwargs):
+    disponibilites.invalider_medecin(instance.pk)
+
+
+# ===== TOTAUX DÉNORMALISÉS DES CONSULTATIONS ET FACTURES =====
+
+@receiver(pre_save, sender=ConsultationActe)
+def memoriser_ancien_acte(sender, instance, **kwargs):
+    """Mémorise la consultation et le montant d'un acte modifié pour calculer le delta"""
+    instance._ancien_acte = None
+    if instance.pk:
+        instance._ancien_acte = ConsultationActe.objects.filter(pk=instance.pk).values_list(
+            'consultation_id', 'prix_applique', 'quantite'
+        ).first()
+
+
+@receiver(post_save, sender=ConsultationActe)
+def ajuster_totaux_acte(sender, instance, created, **kwargs):
+    ancien = getattr(instance, '_ancien_acte', None)
+    if ancien:
+        consultation_id, prix, quantite = ancien
+        totaux.appliquer_delta(consultation_id, -(prix or 0) * quantite, -1)
+    totaux.appliquer_delta(instance.consultation_id, totaux.montant_acte(instance), 1)
+
+
+@receiver(post_delete, sender=ConsultationActe)
+def retirer_totaux_acte(sender, instance, **kwargs):
+    totaux.appliquer_delta(instance.consultation_id, -totaux.montant_acte(instance), -1)
+
+
+# ===== INVALIDATION DES STATISTIQUES DU TABLEAU DE BORD =====
+
+def _invalider_statistiques(sender, **kwargs):
+    invalider_statistiques()
+
+
+for _modele in (get_user_model(), Patient, Medecin, RDV, Consultation, Facture):
+    post_save.connect(_invalider_statistiques, sender=_modele, dispatch_uid=f'stats_save_{_modele.__name__}')
+    post_delete.connect(_invalider_statistiques, sender=_modele, dispatch_uid=f'stats_delete_{_modele.__name__}')
+
+
+# ===== JOURNAL DES MODIFICATIONS (ETag / since= des écrans de réception) =====
+
+def _journaliser_sauvegarde(sender, instance, **kwargs):
+    modifications.enregistrer(sender._meta.model_name, [instance.pk])
+
+
+@receiver(post_save, sender=RDV)
+def journaliser_rdv(sender, instance, **kwargs):
+    """Les changements de RDV sont diffusés avec leur statut (écrans de salle d'attente)"""
+    modifications.enregistrer('rdv', [instance.pk], details={
+        'statut': instance.statut,
+        'patient': instance.patient_id,
+        'medecin': instance.medecin_id,
+        'creneau': instance.creneau_id,
+    })
+
+
+def _journaliser_suppression(sender, instance, **kwargs):
+    modifications.enregistrer(sender._meta.model_name, [instance.pk], supprime=True)
+
+
+for _modele in (RDV, Creneau, Consultation, ConsultationActe, Patient, Medecin):
+    if _modele is not RDV:
+        post_save.connect(_journaliser_sauvegarde, sender=_modele, dispatch_uid=f'journal_save_{_modele.__name__}')
+    post_delete.connect(_journaliser_suppression, sender=_modele, dispatch_uid=f'journal_delete_{_modele.__name__}')
+
+
+# ===== VERSIONS DU CACHE DES RÉFÉRENTIELS (core/catalogues.py) =====
+
+def _invalider_catalogue(sender, **kwargs):
+    catalogues.invalider(sender._meta.model_name)
+
+
+for _modele in (ActeMedical, Analyse, Radio, Maladie, Vaccin, Allergie, OrganismeAssurance, Medecin):
+    post_save.connect(_invalider_catalogue, sender=_modele, dispatch_uid=f'catalogue_save_{_modele.__name__}')
+    post_delete.connect(_invalider_catalogue, sender=_modele, dispatch_uid=f'catalogue_delete_{_modele.__name__}')
+
+
+# ===== CARTE D'IDENTITÉS PAR REQUÊTE (core/identites.py) =====
+
+@receiver(post_save, dispatch_uid='identites_save')
+@receiver(post_delete, dispatch_uid='identites_delete')
+def oublier_identite(sender, instance, **kwargs):
+    identites.oublier(instance)
+
+
+# ===== INDEX DE RECHERCHE DES PATIENTS (core/recherche.py) =====
+
+@receiver(post_save, sender=Patient)
+def indexer_patient(sender, instance, update_fields=None, **kwargs):
+    """Réécrit les jetons du patient (supprimés avec lui par CASCADE)"""
+    if update_fields is None or set(update_fields) & set(recherche.CHAMPS):
+        recherche.indexer([instance])
+    catalogues.invalider('patient')  # suggestions en cache
+
+
+@receiver(post_delete, sender=Patient)
+def invalider_suggestions_patient(sender, instance, **kwargs):
+    catalogues.invalider('patient')
+
+
+# ===== INDEX PLEIN TEXTE DES CONSULTATIONS (core/recherche_texte.py) =====
+
+@receiver(post_save, sender=Consultation)
+def indexer_consultation(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {'diagnostic', 'medecin', 'date_cons'} & set(update_fields):
+        recherche_texte.indexer([instance.pk])
+
+
+@receiver(post_save, sender=Ordonnance)
+def indexer_ordonnance(sender, instance, **kwargs):
+    recherche_texte.indexer([instance.consultation_id])
+
+
+@receiver(post_delete, sender=Ordonnance)
+def desindexer_ordonnance(sender, instance, origin=None, **kwargs):
+    """Une ordonnance supprimée avec sa consultation n'est pas réindexée (index supprimé par CASCADE)"""
+    if getattr(origin, 'model', type(origin)) is Ordonnance:
+        recherche_texte.indexer([instance.consultation_id])
@@ -0,0 +1,88 @@
+# core/statistiques.py
+"""
+Statistiques du tableau de bord administrateur, calculées par agrégats SQL
+(COUNT / GROUP BY) et mises en cache brièvement. Le cache est invalidé par
+les signaux d'écriture (voir core/signals.py).
+"""
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import Patient, Medecin, RDV, Consultation, Facture
+
+
+CACHE_CLE = 'stats:dashboard'
+CACHE_DUREE = 60  # secondes
+
+
+def calculer_statistiques(aujourdhui=None):
+    aujourdhui = aujourdhui or timezone.localdate()
+    debut_semaine = aujourdhui - timedelta(days=aujourdhui.weekday())
+    User = get_user_model()
+
+    utilisateurs = {}
+    comptes_en_attente = 0
+    for ligne in User.objects.values('role', 'is_active').annotate(n=Count('id')).order_by():
+        role = utilisateurs.setdefault(ligne['role'], {'actifs': 0, 'inactifs': 0})
+        role['actifs' if ligne['is_active'] else 'inactifs'] += ligne['n']
+        if not ligne['is_active'] and ligne['role'] != 'PATIENT':
+            comptes_en_attente += ligne['n']
+
+    rdvs = RDV.objects.aggregate(
+        total=Count('id'),
+        aujourdhui=Count('id', filter=Q(creneau__date=aujourdhui)),
+        semaine=Count('id', filter=Q(creneau__date__range=(debut_semaine, debut_semaine + timedelta(days=6)))),
+        mois=Count('id', filter=Q(creneau__date__year=aujourdhui.year, creneau__date__month=aujourdhui.month)),
+    )
+
+    chiffre_affaires = Facture.objects.aggregate(
+        total=Sum('montant_total'),
+        mois=Sum('montant_total', filter=Q(date_fact__year=aujourdhui.year, date_fact__month=aujourdhui.month)),
+    )
+
+    consultations_par_medecin = [
+        {
+            'medecin': ligne['medecin_id'],
+            'medecin_nom': ligne['medecin__nom_med'],
+            'medecin_prenom': ligne['medecin__prenom_med'],
+            'consultations': ligne['n'],
+        }
+        for ligne in Consultation.objects.values(
+            'medecin_id', 'medecin__nom_med', 'medecin__prenom_med'
+        ).annotate(n=Count('id_cons')).order_by('-n')
+    ]
+
+    return {
+        'date': str(aujourdhui),
+        'patients': Patient.objects.count(),
+        'medecins': Medecin.objects.count(),
+        'consultations': sum(c['consultations'] for c in consultations_par_medecin),
+        'factures': Facture.objects.count(),
+        'chiffre_affaires': {cle: valeur or 0 for cle, valeur in chiffre_affaires.items()},
+        'rendezvous': rdvs,
+        'utilisateurs_par_role': utilisateurs,
+        'comptes_en_attente': comptes_en_attente,
+        'consultations_par_medecin': consultations_par_medecin,
+    }
+
+
+def statistiques():
+    """Statistiques depuis le cache (recalculées au plus toutes les CACHE_DUREE secondes)"""
+    aujourdhui = timezone.localdate()
+    stats = cache.get(CACHE_CLE)
+    if stats is None or stats['date'] != str(aujourdhui):
+        stats = calculer_statistiques(aujourdhui)
+        cache.set(CACHE_CLE, stats, CACHE_DUREE)
+    return stats
+
+
+def invalider_statistiques():
+    """
+    Suppression au commit de la transaction en cours, comme core/disponibilites.py :
+    une lecture concurrente ne remet pas en cache un état non encore validé
+    """
+    transaction.on_commit(lambda: cache.delete(CACHE_CLE))
@@ -1,3 +1,1706 @@
-from django.test import TestCase
+"""
+Budgets de performance de l'API REST : nombre de requêtes SQL, temps de
+réponse et taille des réponses des endpoints les plus sollicités.
 
-# Create your tests here.
+Un jeu de données réaliste (médecins, patients, dossiers, créneaux, RDV,
+consultations, actes, factures) est créé une fois, puis chaque endpoint est
+appelé à froid (caches vidés). Le test échoue si une mesure dépasse le budget
+enregistré dans core/budgets_api.json : une régression N+1 est détectée en
+local, sur SQLite, avant d'atteindre la base MySQL de production.
+
+    python manage.py test core
+
+Après une évolution volontaire, réenregistrer les budgets :
+
+    BUDGETS_ENREGISTRER=1 python manage.py test core.tests.BudgetsAPITests
+
+CacheCatalogueTests vérifie que les référentiels (core/catalogues.py) sont servis
+depuis le cache sans requête SQL et invalidés par les écritures.
+
+CarteIdentitesTests vérifie qu'un objet référencé par de nombreuses lignes n'est
+lu qu'une fois par requête (core/identites.py).
+
+RechercheTexteTests vérifie la recherche plein texte des diagnostics et
+ordonnances (core/recherche_texte.py) et la mise à jour incrémentale de l'index.
+
+RecherchePatientTests vérifie la recherche des patients par l'index de jetons
+(core/recherche.py) : normalisation, classement, CIN et téléphone exacts,
+candidats bornés lus sans tri (EXPLAIN) pour le mot le plus sélectif, saisie
+d'une lettre.
+
+RechercheGlobaleTests vérifie la recherche dans toutes les entités
+(core/recherche_globale.py) : groupes, classement commun, budget de temps.
+
+TotauxTests vérifie les totaux dénormalisés des consultations et factures
+(core/totaux.py) : acte ajouté, modifié, déplacé, supprimé, prix de la
+consultation modifié, et la réparation par verifier_totaux --reparer.
+
+ModelesHorairesTests vérifie la validation des modèles horaires et leur
+matérialisation (core/planning.py) : plages matin et après-midi, fermetures,
+modification et suppression d'une plage sans toucher aux autres.
+
+ReservationTests vérifie la réservation et le déplacement des RDV : créneau
+déjà pris ou passé (409), inexistant (404), ancien créneau libéré et relu
+sous verrou.
+
+CoherenceDisponibilitesTests vérifie le cache des disponibilités
+(core/disponibilites.py) : invalidation au commit, lecture concurrente d'une
+écriture, cache partagé entre processus, taille et durée bornées.
+
+StatistiquesTests vérifie l'invalidation du cache des statistiques du
+tableau de bord (core/statistiques.py) au commit de l'écriture.
+
+PaginationTests vérifie la pagination par curseur (core/pagination.py) :
+première page par défaut, référentiels complets, pages exactes sur un ordre
+à valeurs en double.
+
+SuiviModificationsTests vérifie les réponses conditionnelles et les deltas
+(core/modifications.py) : 304, ?since=, suppressions, lignes sorties des
+filtres, versions dans l'ordre des commits, un compteur par modèle.
+
+EvenementsTests vérifie le flux temps réel (core/evenements.py) : broker,
+flux Server-Sent Events, pas d'événement créneau sur un changement de statut.
+
+LectureRapideTests vérifie que la lecture rapide des listes (core/lecture_rapide.py)
+rend les mêmes octets que les serializers et compare les deux chemins sur 10 000 lignes.
+"""
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from datetime import date, time as heure, timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import CacheHandler, cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Max
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import (
+    disponibilites, evenements, modifications, recherche, recherche_globale, recherche_texte, statistiques, totaux
+)
+from .checks import verifier_caches_partages
+from .identites import carte_identites
+from .lecture_rapide import JSONRapideRenderer, lecteur_pour
+from .models import (
+    Patient, Medecin, RDV, Creneau, Consultation, ActeMedical, ConsultationActe,
+    Ordonnance, DossierMedical, Facture, Maladie, MaladieDossier, Vaccin,
+    VaccinDossier, Allergie, AllergieDossier, ModeleHoraire, IndexPatient, IndexConsultation,
+    Fermeture, JourTravail, Modification, CompteurModifications, CHAMPS_TOTAUX
+)
+from .planning import calculer_creneaux, deplacer_rdv, materialiser_modeles
+from .serializers import RDVSerializer
+from .views import VaccinViewSet
+
+
+FICHIER_BUDGETS = Path(__file__).with_name('budgets_api.json')
+
+MARGE_OCTETS = 1.10   # +10 % de taille de réponse tolérés
+FACTEUR_TEMPS = 5     # budget de temps enregistré = 5 x la mesure (machines variables)
+TEMPS_MINIMUM = 100   # ms
+
+NOMS = ['Alaoui', 'Benali', 'Chraibi', 'Dahbi', 'El Fassi', 'Fikri', 'Ghali', 'Haddad',
+        'Idrissi', 'Jabri', 'Kettani', 'Lahlou', 'Mansouri', 'Naciri', 'Ouazzani', 'Rami',
+        'Sebti', 'Tazi', 'Wahbi', 'Zniber']
+PRENOMS = ['Amine', 'Salma', 'Youssef', 'Khadija', 'Omar', 'Imane', 'Mehdi', 'Sara',
+           'Hamza', 'Nadia', 'Karim', 'Leila']
+SPECIALITES = ['Généraliste', 'Cardiologie', 'Pédiatrie', 'Dermatologie']
+
+
+def creer_jeu_de_donnees(nb_medecins=8, nb_patients=400, jours=10, graine=42):
+    """
+    Jeu de données déterministe : `jours` jours passés et à venir de planning,
+    un RDV sur deux créneaux passés et un sur quatre à venir, une consultation
+    (avec actes, ordonnance et facture) par RDV passé. Retourne un dict d'ids utiles.
+    """
+    aleatoire = random.Random(graine)
+    aujourdhui = timezone.localdate()
+
+    medecins = Medecin.objects.bulk_create([
+        Medecin(nom_med=NOMS[i % len(NOMS)], prenom_med=PRENOMS[i % len(PRENOMS)],
+                specialite_med=SPECIALITES[i % len(SPECIALITES)])
+        for i in range(nb_medecins)
+    ])
+    patients = Patient.objects.bulk_create([
+        Patient(
+            nom_patient=NOMS[i % len(NOMS)], prenom_patient=PRENOMS[(i * 7) % len(PRENOMS)],
+            sexe='F' if i % 2 else 'M', cin=f"BK{100000 + i}", adresse=f"{i} rue des Oliviers",
+            date_naissance=aujourdhui - timedelta(days=365 * (5 + i % 70) + i),
+            telephone=f"06{i:08d}", situation_familiale='Célibataire'
+        )
+        for i in range(nb_patients)
+    ])
+    recherche.indexer(patients)  # bulk_create n'envoie pas les signaux
+    dossiers = DossierMedical.objects.bulk_create([DossierMedical(patient=p) for p in patients])
+
+    maladies = Maladie.objects.bulk_create([Maladie(nom_malad=n) for n in ('Diabète', 'Asthme', 'Hypertension')])
+    vaccins = Vaccin.objects.bulk_create([Vaccin(nom_vacc=n) for n in ('BCG', 'ROR', 'Tétanos')])
+    allergies = Allergie.objects.bulk_create([Allergie(nom_allerg=n) for n in ('Pénicilline', 'Pollen')])
+    MaladieDossier.objects.bulk_create([
+        MaladieDossier(dossier=d, maladie=aleatoire.choice(maladies)) for d in dossiers[::3]
+    ])
+    VaccinDossier.objects.bulk_create([
+        VaccinDossier(dossier=d, vaccin=v) for d in dossiers for v in vaccins[:1 + d.pk % 3]
+    ])
+    AllergieDossier.objects.bulk_create([
+        AllergieDossier(dossier=d, allergie=aleatoire.choice(allergies)) for d in dossiers[::5]
+    ])
+
+    modeles = [
+        ModeleHoraire(medecin=m, nom='Semaine', jours_semaine='0,1,2,3,4,5,6',
+                      heure_debut=heure(9), heure_fin=heure(17), duree_creneau=30)
+        for m in medecins
+    ]
+    ModeleHoraire.objects.bulk_create(modeles)
+    materialiser_modeles(modeles, aujourdhui - timedelta(days=jours), aujourdhui + timedelta(days=jours))
+
+    rdvs = []
+    pris = []
+    for creneau in Creneau.objects.order_by('date', 'heure_debut', 'medecin_id'):
+        if aleatoire.random() < (0.5 if creneau.date <= aujourdhui else 0.25):
+            rdvs.append(RDV(patient=aleatoire.choice(patients), medecin_id=creneau.medecin_id,
+                            creneau=creneau, statut='CONFIRME' if creneau.date == aujourdhui else 'RESERVE'))
+            pris.append(creneau.pk)
+    RDV.objects.bulk_create(rdvs)
+    Creneau.objects.filter(pk__in=pris).update(libre=False)
+
+    actes = ActeMedical.objects.bulk_create([
+        ActeMedical(nom_acte=n, prix_acte=p)
+        for n, p in (('ECG', 150), ('Échographie', 300), ('Pansement', 50), ('Injection', 40))
+    ])
+    passes = [r for r in rdvs if r.creneau.date < aujourdhui]
+    consultations = Consultation.objects.bulk_create([
+        Consultation(rdv=r, medecin_id=r.medecin_id, date_cons=r.creneau.date,
+                     diagnostic=f"Consultation de contrôle n°{i}", prix_cons=200 + 50 * (i % 3),
+                     montant_total=200 + 50 * (i % 3))
+        for i, r in enumerate(passes)
+    ])
+    ConsultationActe.objects.bulk_create([
+        ConsultationActe(consultation=c, acte=a, quantite=1 + k % 2, prix_applique=a.prix_acte)
+        for c in consultations for k, a in enumerate(aleatoire.sample(actes, c.pk % 4))
+    ])
+    Ordonnance.objects.bulk_create([
+        Ordonnance(consultation=c, date_ord=c.date_cons, medicaments='Paracétamol 1g, 3 fois par jour')
+        for c in consultations[::2]
+    ])
+    Facture.objects.bulk_create([
+        Facture(consultation=c, patient_id=c.rdv.patient_id, date_fact=c.date_cons,
+                type_facture='Consultation', montant=c.prix_cons)
+        for c in consultations
+    ])
+    # bulk_create n'envoie pas les signaux : totaux recalculés en SQL, index reconstruit
+    totaux.verifier(reparer=True)
+    recherche_texte.reconstruire()
+
+    patient = patients[0]
+    return {
+        'aujourdhui': aujourdhui,
+        'medecin': medecins[0].pk,
+        'medecins': [m.pk for m in medecins[:4]],
+        'patient': patient.pk,
+        'patient_nom': patient.nom_patient,
+        'patient_cin': patient.cin,
+        'dossier': DossierMedical.objects.get(patient=patient).pk,
+        'consultation': consultations[0].pk,
+        'rdv_consultation': consultations[0].rdv_id,
+        'facture': Facture.objects.get(consultation=consultations[0]).pk,
+    }
+
+
+def endpoints(d):
+    """(nom, url, appel préalable pour mesurer à chaud)"""
+    jour = d['aujourdhui'] + timedelta(days=1)
+    medecins = ','.join(str(m) for m in d['medecins'])
+    return [
+        ('patients_recherche', f"/api/patients/?search={d['patient_nom']}", False),
+        ('patients_cin', f"/api/patients/search-cin/?cin={d['patient_cin']}", False),
+        ('patients_recherche_index', f"/api/patients/recherche/?q={d['patient_nom']}", False),
+        ('patients_recherche_nom', f"/api/patients/search-name/?nom={d['patient_nom']}", False),
+        ('patients_recherche_approchee', f"/api/patients/recherche/?q={d['patient_nom']}&mode=approche", False),
+        ('patients_suggestions', f"/api/patients/suggestions/?q={d['patient_nom'][:3]}", False),
+        ('patients_suggestions_chaud', f"/api/patients/suggestions/?q={d['patient_nom'][:3]}", True),
+        ('patients_liste', "/api/patients/?page_size=50", False),
+        ('recherche_globale', f"/api/search/?q={d['patient_nom'][:3]}", False),
+        ('recherche_globale_chaud', f"/api/search/?q={d['patient_nom'][:3]}", True),
+        ('creneaux_disponibles', f"/api/creneaux/disponibles/?medecin={d['medecin']}&date={jour}", False),
+        ('creneaux_disponibles_chaud', f"/api/creneaux/disponibles/?medecin={d['medecin']}&date={jour}", True),
+        ('creneaux_recherche', "/api/creneaux/recherche/?limit=20", False),
+        ('creneaux_calendrier', f"/api/creneaux/calendrier/?medecins={medecins}&debut={d['aujourdhui']}", False),
+        ('creneaux_liste', f"/api/creneaux/?date={jour}", False),
+        ('rdvs_liste', "/api/rdvs/?expand=creneau_details&page_size=100", False),
+        ('rdvs_patient', f"/api/rdvs/?patient={d['patient']}&expand=creneau_details", False),
+        ('rdvs_aujourdhui', "/api/rdvs/aujourdhui/?expand=creneau_details", False),
+        ('rdvs_salle_attente', "/api/rdvs/salle-attente/", False),
+        ('consultations_liste', "/api/consultations/?page_size=50", False),
+        ('consultations_actes', "/api/consultations/?expand=actes_list&page_size=50", False),
+        ('consultations_medecin', f"/api/consultations/?medecin={d['medecin']}&page_size=50", False),
+        ('consultations_recherche', "/api/consultations/?search=controle&page_size=50", False),
+        ('consultations_recherche_texte',
+         f"/api/consultations/recherche-texte/?q=\"fois par jour\" parac*&medecin={d['medecin']}", False),
+        ('factures_liste', "/api/factures/?ordering=-montant_total&page_size=50", False),
+        ('facture_detail', f"/api/factures/{d['facture']}/detail/", False),
+        ('rdv_espace_consultation', f"/api/rdvs/{d['rdv_consultation']}/espace-consultation/", False),
+        ('ordonnances_consultation', f"/api/ordonnances/?consultation={d['consultation']}", False),
+        ('dossier_patient', f"/api/dossiers/?patient={d['patient']}", False),
+        ('dossier_bundle', f"/api/patients/{d['patient']}/bundle/", False),
+        ('dossier_bundle_cin', f"/api/patients/bundle/?cin={d['patient_cin']}", False),
+        ('dossier_maladies', f"/api/maladie-dossiers/?dossier={d['dossier']}", False),
+        ('dossier_vaccins', f"/api/vaccin-dossiers/?dossier={d['dossier']}", False),
+        ('dossier_allergies', f"/api/allergie-dossiers/?dossier={d['dossier']}", False),
+        ('statistiques', "/api/stats/", False),
+    ]
+
+
+class Horloge:
+    """Horloge monotone des tests, avancée à la main"""
+
+    def __init__(self):
+        self.secondes = 1000.0
+
+    def __call__(self):
+        return self.secondes
+
+    def avancer(self, secondes):
+        self.secondes += secondes
+
+
+def vider_caches():
+    cache.clear()
+    disponibilites.vider()
+    recherche.vider_suggestions()
+
+
+class BudgetsAPITests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.donnees = creer_jeu_de_donnees()
+        cls.admin = get_user_model().objects.create_superuser('admin', 'admin@cabinet.ma', 'admin123', role='ADMIN')
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.mesures = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.mesures:
+            lignes = [f"{'endpoint':30} {'requêtes':>9} {'ms':>8} {'octets':>9}"]
+            lignes += [
+                f"{nom:30} {m['requetes']:>9} {m['ms']:>8.1f} {m['octets']:>9}"
+                for nom, m in cls.mesures.items()
+            ]
+            sys.stderr.write('\n' + '\n'.join(lignes) + '\n')
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def mesurer(self, url, chaud=False):
+        vider_caches()
+        if chaud:
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as requetes:
+            debut = time.perf_counter()
+            response = self.client.get(url)
+            duree = (time.perf_counter() - debut) * 1000
+        self.assertEqual(response.status_code, 200, f"{url} : {response.status_code}")
+        return {'requetes': len(requetes), 'ms': duree, 'octets': len(response.content)}
+
+    def test_budgets(self):
+        budgets = json.loads(FICHIER_BUDGETS.read_text()) if FICHIER_BUDGETS.exists() else {}
+        enregistrer = bool(os.environ.get('BUDGETS_ENREGISTRER'))
+
+        for nom, url, chaud in endpoints(self.donnees):
+            mesure = self.mesurer(url, chaud)
+            self.mesures[nom] = mesure
+            if enregistrer:
+                budgets[nom] = {
+                    'requetes': mesure['requetes'],
+                    'ms': max(TEMPS_MINIMUM, math.ceil(mesure['ms'] * FACTEUR_TEMPS)),
+                    'octets': mesure['octets'],
+                }
+                continue
+
+            with self.subTest(endpoint=nom):
+                self.assertIn(nom, budgets, f"Pas de budget pour {nom} (lancer avec BUDGETS_ENREGISTRER=1)")
+                budget = budgets[nom]
+                self.assertLessEqual(
+                    mesure['requetes'], budget['requetes'],
+                    f"{nom} : {mesure['requetes']} requêtes SQL (budget {budget['requetes']}) - {url}"
+                )
+                self.assertLessEqual(
+                    mesure['octets'], budget['octets'] * MARGE_OCTETS,
+                    f"{nom} : réponse de {mesure['octets']} octets (budget {budget['octets']})"
+                )
+                self.assertLessEqual(
+                    mesure['ms'], budget['ms'],
+                    f"{nom} : {mesure['ms']:.1f} ms (budget {budget['ms']} ms)"
+                )
+
+        if enregistrer:
+            FICHIER_BUDGETS.write_text(json.dumps(budgets, indent=2, sort_keys=True) + '\n')
+
+    def test_dossier_bundle_requetes_fixes(self):
+        """Le dossier complet se charge en un nombre fixe de requêtes, vide ou rempli"""
+        complet = self.mesurer(f"/api/patients/{self.donnees['patient']}/bundle/")
+        vide = Patient.objects.create(
+            nom_patient='Sans', prenom_patient='Dossier', sexe='F', cin='ZZ999999', adresse='-',
+            date_naissance=self.donnees['aujourdhui'], telephone='0600000000', situation_familiale='-'
+        )
+        response = self.client.get(f"/api/patients/{vide.pk}/bundle/")
+        self.assertIsNone(response.json()['dossier'])
+        self.assertEqual(response.json()['maladies'], [])
+        self.assertLessEqual(self.mesurer(f"/api/patients/{vide.pk}/bundle/")['requetes'], complet['requetes'])
+
+        donnees = self.client.get(f"/api/patients/{self.donnees['patient']}/bundle/").json()
+        self.assertEqual(donnees['dossier']['id_dossier'], self.donnees['dossier'])
+        self.assertTrue(all(r['creneau_details']['date'] >= str(self.donnees['aujourdhui'])
+                            for r in donnees['rdvs_a_venir']))
+        self.assertEqual(self.client.get("/api/patients/bundle/?cin=INCONNU").status_code, 404)
+
+    def test_espace_consultation(self):
+        """Consultation, prescriptions et chaîne de suivi du RDV ; nombre de requêtes borné"""
+        d = self.donnees
+        initiale = Consultation.objects.get(pk=d['consultation'])
+        seul = self.mesurer(f"/api/rdvs/{d['rdv_consultation']}/espace-consultation/")
+
+        controles = []
+        for rdv in RDV.objects.filter(consultation__isnull=True).order_by('pk')[:2]:
+            controles.append(Consultation.objects.create(
+                rdv=rdv, medecin_id=rdv.medecin_id, date_cons=initiale.date_cons + timedelta(days=7 * (len(controles) + 1)),
+                diagnostic='Contrôle', prix_cons=100, consultation_initiale=controles[-1] if controles else initiale
+            ))
+        self.assertEqual(len(controles), 2)
+
+        chaine = self.mesurer(f"/api/rdvs/{controles[0].rdv_id}/espace-consultation/")
+        # Une requête par niveau de suivi parcouru (1 au-dessus, 2 au-dessous), la chaîne lue en 2
+        self.assertLessEqual(chaine['requetes'], seul['requetes'] + 3 + 2)
+        donnees = self.client.get(f"/api/rdvs/{controles[0].rdv_id}/espace-consultation/").json()
+        self.assertEqual(donnees['consultation']['id_cons'], controles[0].pk)
+        self.assertEqual([c['id_cons'] for c in donnees['suivi']], [initiale.pk] + [c.pk for c in controles])
+        # Historique : consultations précédentes du patient, hors RDV ouvert, les plus récentes d'abord
+        self.assertEqual(
+            [c['id_cons'] for c in donnees['historique']],
+            list(Consultation.objects.filter(rdv__patient_id=controles[0].rdv.patient_id).exclude(
+                rdv_id=controles[0].rdv_id
+            ).order_by('-date_cons', '-pk').values_list('pk', flat=True))
+        )
+        self.assertEqual(donnees['patient']['id_patient'], controles[0].rdv.patient_id)
+
+        donnees = self.client.get(f"/api/rdvs/{d['rdv_consultation']}/espace-consultation/").json()
+        self.assertEqual(len(donnees['ordonnances']), 1)
+
+        # Nouveau RDV sans consultation ni suivi : l'historique du patient est renvoyé
+        nouveau = RDV.objects.create(patient_id=initiale.rdv.patient_id, medecin_id=initiale.medecin_id)
+        donnees = self.client.get(f"/api/rdvs/{nouveau.pk}/espace-consultation/").json()
+        self.assertIsNone(donnees['consultation'])
+        self.assertEqual(donnees['suivi'], [])
+        self.assertIn(initiale.pk, [c['id_cons'] for c in donnees['historique']])
+        self.assertEqual(self.client.get("/api/rdvs/999999/espace-consultation/").status_code, 404)
+
+    def test_listes_sans_n_plus_1(self):
+        """Le nombre de requêtes d'une liste ne dépend pas du nombre de lignes rendues"""
+        listes = [
+            "/api/patients/",
+            "/api/creneaux/",
+            "/api/rdvs/?expand=creneau_details",
+            "/api/consultations/?expand=actes_list",
+            "/api/factures/",
+            "/api/ordonnances/",
+            "/api/vaccin-dossiers/",
+        ]
+        for url in listes:
+            separateur = '&' if '?' in url else '?'
+            with self.subTest(url=url):
+                petite = self.mesurer(f"{url}{separateur}page_size=5")
+                grande = self.mesurer(f"{url}{separateur}page_size=200")
+                self.assertGreater(grande['octets'], petite['octets'])
+                self.assertEqual(
+                    grande['requetes'], petite['requetes'],
+                    f"{url} : {petite['requetes']} requêtes pour 5 lignes, {grande['requetes']} pour 200"
+                )
+
+
+class LectureRapideTests(TestCase):
+    NB_LIGNES_BENCHMARK = 10000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.donnees = creer_jeu_de_donnees(nb_patients=100, jours=4)
+        cls.admin = get_user_model().objects.create_superuser('admin', 'admin@cabinet.ma', 'admin123', role='ADMIN')
+        # Cas limites : RDV sans créneau, caractères à échapper, prix sans décimales
+        consultation = Consultation.objects.get(pk=cls.donnees['consultation'])
+        Consultation.objects.filter(pk=consultation.pk).update(
+            diagnostic='Ligne 1\u2028ligne 2 "guillemets" \\ é\tà', prix_cons=0
+        )
+        RDV.objects.create(patient_id=cls.donnees['patient'], medecin_id=cls.donnees['medecin'], creneau=None)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def obtenir(self, url, rapide):
+        with override_settings(LECTURE_RAPIDE=rapide), CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return response, len(requetes)
+
+    def test_sortie_identique(self):
+        d = self.donnees
+        urls = [
+            "/api/creneaux/",
+            f"/api/creneaux/?date={d['aujourdhui']}&ordering=heure_debut",
+            "/api/creneaux/?fields=id,date,libre,medecin_nom",
+            "/api/rdvs/",
+            "/api/rdvs/?expand=creneau_details",
+            f"/api/rdvs/?patient={d['patient']}&expand=creneau_details&page_size=3",
+            "/api/rdvs/?fields=id,patient_nom,creneau_details,statut",
+            "/api/consultations/",
+            "/api/consultations/?expand=actes_list",
+            f"/api/consultations/?medecin={d['medecin']}&fields=id_cons,diagnostic,actes_list",
+            "/api/consultations/?search=contrôle&page_size=7",
+            "/api/factures/",
+            "/api/factures/?ordering=-montant_total&page_size=20",
+            "/api/factures/?fields=id_facture,montant_calcule,patient_nom",
+            "/api/factures/?montant_min=250&ordering=date_fact",
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                normale, requetes_normales = self.obtenir(url, rapide=False)
+                rapide, requetes_rapides = self.obtenir(url, rapide=True)
+                self.assertEqual(rapide.content, normale.content)
+                self.assertEqual(rapide['Content-Type'], normale['Content-Type'])
+                self.assertEqual(rapide.get('Link'), normale.get('Link'))
+                self.assertLessEqual(requetes_rapides, requetes_normales)
+
+                # Page suivante du curseur
+                lien = normale.get('Link', '')
+                if 'rel="next"' in lien:
+                    suivante = lien.split('>')[0].lstrip('<')
+                    self.assertEqual(
+                        self.obtenir(suivante, rapide=True)[0].content,
+                        self.obtenir(suivante, rapide=False)[0].content
+                    )
+
+    def test_repli_sur_le_chemin_normal(self):
+        """Valeur que orjson écrirait autrement (1e-05) ou API navigable : chemin normal"""
+        Facture.objects.filter(pk=Facture.objects.latest('pk').pk).update(montant=1e-05)
+        normale = self.obtenir("/api/factures/", rapide=False)[0].content
+        self.assertEqual(self.obtenir("/api/factures/", rapide=True)[0].content, normale)
+        self.assertTrue(b'"montant":1e-05' in normale)
+
+        response = self.obtenir("/api/rdvs/?format=api", rapide=True)[0]
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+
+    def test_benchmark_10000_lignes(self):
+        """Serializer + JSONRenderer contre lecture compilée + JSONRapideRenderer"""
+        medecin = Medecin.objects.get(pk=self.donnees['medecin'])
+        jour = self.donnees['aujourdhui'] + timedelta(days=400)
+        creneaux = Creneau.objects.bulk_create([
+            Creneau(medecin=medecin, date=jour + timedelta(days=i // 16),
+                    heure_debut=heure(9 + i % 16 // 2, 30 * (i % 2)),
+                    heure_fin=heure(9 + (i % 16 + 1) // 2, 30 * ((i + 1) % 2)), libre=False)
+            for i in range(self.NB_LIGNES_BENCHMARK)
+        ])
+        RDV.objects.bulk_create([
+            RDV(patient_id=self.donnees['patient'], medecin=medecin, creneau=c) for c in creneaux
+        ])
+        queryset = RDV.objects.filter(creneau__date__gte=jour).order_by('-pk')
+        self.assertEqual(queryset.count(), self.NB_LIGNES_BENCHMARK)
+
+        requete = self.client.get('/').wsgi_request  # contexte des champs dynamiques
+        requete.query_params = {'expand': 'creneau_details'}
+        requete.method = 'GET'
+        serializer = RDVSerializer(context={'request': requete})
+
+        debut = time.perf_counter()
+        objets = queryset.select_related('patient', 'medecin', 'creneau__medecin')
+        normal = JSONRenderer().render(RDVSerializer(objets, many=True, context={'request': requete}).data)
+        duree_normale = time.perf_counter() - debut
+
+        debut = time.perf_counter()
+        lecteur = lecteur_pour(serializer, RDV)
+        lignes = queryset.values('pk', *lecteur.colonnes)
+        rapide = JSONRapideRenderer().render(lecteur.lire(lignes))
+        duree_rapide = time.perf_counter() - debut
+
+        self.assertEqual(rapide, normal)
+        sys.stderr.write(
+            f"\n{self.NB_LIGNES_BENCHMARK} RDV (expand=creneau_details, {len(normal)} octets) : "
+            f"serializer {duree_normale * 1000:.0f} ms, lecture rapide {duree_rapide * 1000:.0f} ms "
+            f"(x{duree_normale / duree_rapide:.1f})\n"
+        )
+        self.assertLess(duree_rapide, duree_normale)
+
+
+class CacheCatalogueTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Vaccin.objects.bulk_create([Vaccin(nom_vacc=n) for n in ('BCG', 'ROR', 'Tétanos', 'Hépatite B')])
+        Medecin.objects.create(nom_med='Tazi', prenom_med='Sara', specialite_med='Pédiatrie')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def obtenir(self, url):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return response.json(), len(requetes)
+
+    def test_lecture_depuis_le_cache(self):
+        for url in ("/api/vaccins/", "/api/vaccins/?search=B", "/api/medecins/?ordering=-nom_med",
+                    f"/api/vaccins/{Vaccin.objects.first().pk}/"):
+            with self.subTest(url=url):
+                froid, requetes_froid = self.obtenir(url)
+                chaud, requetes_chaud = self.obtenir(url)
+                self.assertGreater(requetes_froid, 0)
+                self.assertEqual(requetes_chaud, 0)
+                self.assertEqual(chaud, froid)
+
+        self.assertEqual(len(self.obtenir("/api/vaccins/")[0]), 4)
+        self.assertEqual(len(self.obtenir("/api/vaccins/?search=B")[0]), 2)
+
+    def test_invalidation_par_les_ecritures(self):
+        self.obtenir("/api/vaccins/")
+        vaccin = Vaccin.objects.create(nom_vacc='Grippe')
+        donnees, requetes = self.obtenir("/api/vaccins/")
+        self.assertGreater(requetes, 0)
+        self.assertIn('Grippe', [v['nom_vacc'] for v in donnees])
+
+        vaccin.delete()
+        self.assertNotIn('Grippe', [v['nom_vacc'] for v in self.obtenir("/api/vaccins/")[0]])
+
+        # Le cache des autres référentiels n'est pas touché
+        self.obtenir("/api/medecins/")
+        Vaccin.objects.create(nom_vacc='Rage')
+        self.assertEqual(self.obtenir("/api/medecins/")[1], 0)
+
+    def test_version_perdue(self):
+        """Après une éviction de la version, l'ancien contenu n'est plus servi"""
+        self.obtenir("/api/vaccins/")
+        cache.delete('catalogue:version:vaccin')
+        Vaccin.objects.filter(nom_vacc='BCG').update(nom_vacc='BCG (1re dose)')  # sans signal
+        time.sleep(0.002)
+        self.assertIn('BCG (1re dose)', [v['nom_vacc'] for v in self.obtenir("/api/vaccins/")[0]])
+
+    @override_settings(CATALOGUES_CACHE_DUREE=60)
+    def test_versions_expirent(self):
+        """Les versions ne restent pas indéfiniment dans le cache partagé"""
+        with mock.patch.object(cache, 'add', wraps=cache.add) as ajout:
+            self.obtenir("/api/vaccins/")
+        self.assertEqual(ajout.call_args.args[0], 'catalogue:version:vaccin')
+        self.assertEqual(ajout.call_args.args[2], 120)
+
+
+class RechercheTexteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_superuser('admin', 'admin@cabinet.ma', 'admin123', role='ADMIN')
+        cls.medecins = [
+            Medecin.objects.create(nom_med=nom, prenom_med='Dr', specialite_med='Généraliste')
+            for nom in ('Tazi', 'Alaoui')
+        ]
+        patient = Patient.objects.create(
+            nom_patient='Bennani', prenom_patient='Karim', sexe='M', cin='GH123456', adresse='-',
+            date_naissance=timezone.localdate() - timedelta(days=365 * 30), telephone='0600000000',
+            situation_familiale='-'
+        )
+        cls.consultations = {}
+        for cle, medecin, jour, diagnostic, medicaments in (
+            ('crise', 0, '2025-03-01', "Crise d'asthme sévère", 'Ventoline 2 bouffées 3 fois par jour'),
+            ('controle', 0, '2025-11-10', 'Asthme allergique, contrôle', 'Cortancyl 20 mg'),
+            ('tension', 1, '2025-06-01', 'Hypertension artérielle', 'Amlodipine 5 mg, 1 fois par jour'),
+        ):
+            rdv = RDV.objects.create(patient=patient, medecin=cls.medecins[medecin])
+            consultation = Consultation.objects.create(
+                rdv=rdv, medecin=cls.medecins[medecin], date_cons=jour, diagnostic=diagnostic, prix_cons=200
+            )
+            Ordonnance.objects.create(consultation=consultation, date_ord=jour, medicaments=medicaments)
+            cls.consultations[cle] = consultation
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def chercher(self, q, **params):
+        response = self.client.get("/api/consultations/recherche-texte/", {'q': q, **params})
+        self.assertEqual(response.status_code, 200, q)
+        return [r['id_cons'] for r in response.json()]
+
+    def ids(self, *cles):
+        return [self.consultations[cle].pk for cle in cles]
+
+    def test_mots_prefixes_expressions(self):
+        self.assertEqual(self.chercher('ASTHME'), self.ids('controle', 'crise'))  # plus récente d'abord
+        self.assertEqual(self.chercher('asthme severe'), self.ids('crise'))
+        self.assertEqual(self.chercher('cortan*'), self.ids('controle'))
+        self.assertEqual(self.chercher('cortan'), [])
+        self.assertEqual(self.chercher('"fois par jour"'), self.ids('tension', 'crise'))
+        self.assertEqual(self.chercher('ventoline "2 bouffees"'), self.ids('crise'))
+        self.assertEqual(self.chercher('"jour par fois"'), [])
+        # Une expression ne chevauche pas le diagnostic et l'ordonnance
+        self.assertEqual(self.chercher('"severe ventoline"'), [])
+
+        self.assertEqual(self.client.get("/api/consultations/recherche-texte/").status_code, 400)
+        self.assertEqual(self.client.get("/api/consultations/recherche-texte/", {'q': 'de la'}).status_code, 400)
+
+    def test_classement_et_filtres(self):
+        self.assertEqual(self.chercher('"fois par jour"', medecin=self.medecins[0].pk), self.ids('crise'))
+        self.assertEqual(self.chercher('asthme', debut='2025-06-01'), self.ids('controle'))
+        self.assertEqual(self.chercher('asthme', fin='2025-06-01'), self.ids('crise'))
+        self.assertEqual(self.chercher('asthme', limit=1), self.ids('controle'))
+        # Diagnostic (2) avant ordonnance (1)
+        ordonnance = Ordonnance.objects.create(
+            consultation=self.consultations['tension'], date_ord='2025-06-01', medicaments='Hypertension : contrôle'
+        )
+        self.assertEqual(self.chercher('controle'), self.ids('controle', 'tension'))
+        ordonnance.delete()
+
+        with CaptureQueriesContext(connection) as requetes:
+            self.chercher('asthme "fois par jour" vento*', medecin=self.medecins[0].pk, debut='2025-01-01')
+        self.assertEqual(len(requetes), 1)
+
+    def test_index_incremental(self):
+        tension = self.consultations['tension']
+        ordonnance = Ordonnance.objects.create(consultation=tension, date_ord='2025-06-02', medicaments='Ventoline')
+        self.assertEqual(self.chercher('ventoline'), self.ids('tension', 'crise'))
+        ordonnance.delete()
+        self.assertEqual(self.chercher('ventoline'), self.ids('crise'))
+
+        tension.diagnostic = 'Bronchite'
+        tension.save()
+        self.assertEqual(self.chercher('bronchite'), self.ids('tension'))
+        self.assertEqual(self.chercher('hypertension'), [])
+
+        tension.delete()
+        self.assertFalse(IndexConsultation.objects.filter(consultation_id=self.ids('tension')[0]).exists())
+
+        IndexConsultation.objects.all().delete()
+        self.assertEqual(recherche_texte.reconstruire(batch_size=1)[0], 2)
+        self.assertEqual(self.chercher('"fois par jour"'), self.ids('crise'))
+
+    def test_search_filter(self):
+        def chercher(search):
+            response = self.client.get("/api/consultations/", {'search': search})
+            self.assertEqual(response.status_code, 200)
+            return sorted(c['id_cons'] for c in response.json())
+
+        self.assertEqual(chercher('asthme'), sorted(self.ids('crise', 'controle')))
+        self.assertEqual(chercher('vento'), self.ids('crise'))  # ordonnances
+        self.assertEqual(chercher('bennani hypert'), self.ids('tension'))  # patient et diagnostic
+        self.assertEqual(chercher('inconnu'), [])
+
+
+class RecherchePatientTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_superuser('admin', 'admin@cabinet.ma', 'admin123', role='ADMIN')
+        naissance = timezone.localdate() - timedelta(days=365 * 30)
+        cls.patients = {
+            cle: Patient.objects.create(
+                nom_patient=nom, prenom_patient=prenom, sexe='F', cin=cin, adresse='-',
+                date_naissance=naissance, telephone=telephone, situation_familiale='-'
+            )
+            for cle, nom, prenom, cin, telephone in (
+                ('fassi', 'El Fassi', 'Hélène', 'BK123456', '06 12 34 56 78'),
+                ('fassiri', 'Fassiri', 'Omar', 'BK654321', '+212 661 000 000'),
+                ('tazi', 'Tazi', 'Élodie', 'A98765', '0522000000'),
+            )
+        }
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def chercher(self, q, **params):
+        response = self.client.get("/api/patients/recherche/", {'q': q, **params})
+        self.assertEqual(response.status_code, 200, q)
+        return [p['id_patient'] for p in response.json()]
+
+    def ids(self, *cles):
+        return [self.patients[cle].pk for cle in cles]
+
+    def test_normalisation_et_prefixes(self):
+        self.assertEqual(self.chercher('elodie'), self.ids('tazi'))
+        self.assertEqual(self.chercher('ÉLO'), self.ids('tazi'))
+        self.assertEqual(self.chercher('el-fa hel'), self.ids('fassi'))
+        self.assertEqual(self.chercher('fassi omar'), self.ids('fassiri'))
+        self.assertEqual(self.chercher('z'), [])
+
+    def test_classement(self):
+        """Mot entier avant préfixe"""
+        self.assertEqual(self.chercher('fassi'), self.ids('fassi', 'fassiri'))
+        self.assertEqual(self.chercher('fassiri'), self.ids('fassiri'))
+        self.assertEqual(self.chercher('fa', limit=1), self.ids('fassi'))
+
+    def test_candidats_bornes(self):
+        """Mot courant : seuls les premiers candidats de l'index, mots entiers d'abord, sont classés"""
+        naissance = self.patients['fassi'].date_naissance
+        for i in range(5):
+            Patient.objects.create(
+                nom_patient='Fassia', prenom_patient='Sara', sexe='F', cin=f"EF{i}0000", adresse='-',
+                date_naissance=naissance, telephone='0600000000', situation_familiale='-'
+            )
+        self.assertEqual(len(recherche.rechercher('fassi', 10)), 7)
+        with mock.patch.object(recherche, 'CANDIDATS_RECHERCHE_MAX', 3):
+            trouves = recherche.rechercher('fassi sa', 10)
+            # Candidats : les trois derniers Fassia (El Fassi n'a pas de mot commençant par "sa")
+            self.assertEqual(len(trouves), 3)
+            self.assertTrue(all(patient.nom_patient == 'Fassia' for patient in trouves))
+            self.assertEqual(recherche.rechercher('fassi', 10)[0].pk, self.ids('fassi')[0])
+
+        # Lecture de l'index sans tri (EXPLAIN)
+        plan = recherche.requete_candidats(['fassi']).explain()
+        if connection.vendor == 'sqlite':
+            self.assertIn('USING INDEX indexpatient_jeton_idx', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+        elif connection.vendor == 'mysql':
+            self.assertIn('indexpatient_jeton_idx', plan)
+            self.assertNotIn('filesort', plan)
+
+    def test_mot_courant_et_mot_rare(self):
+        """Mot long porté par plus de CANDIDATS_RECHERCHE_MAX patients, mot court rare : candidats lus pour le mot rare"""
+        naissance = self.patients['fassi'].date_naissance
+        alaoui = Patient.objects.create(
+            nom_patient='Alaoui', prenom_patient='Mohamed', sexe='M', cin='AB000001', adresse='-',
+            date_naissance=naissance, telephone='0600000001', situation_familiale='-'
+        )
+        for i in range(6):
+            Patient.objects.create(
+                nom_patient=f'Nom{i:04d}', prenom_patient='Mohamed', sexe='M', cin=f'CD{i:06d}', adresse='-',
+                date_naissance=naissance, telephone='0600000000', situation_familiale='-'
+            )
+        with mock.patch.object(recherche, 'CANDIDATS_RECHERCHE_MAX', 3):
+            self.assertEqual(recherche.terme_selectif(['mohamed', 'alaoui']), 'alaoui')
+            for q in ('mohamed alaoui', 'alaoui mohamed', 'moha ala'):
+                with self.subTest(q=q):
+                    self.assertEqual([p.pk for p in recherche.rechercher(q, 10)], [alaoui.pk])
+            recherche.vider_suggestions()
+            self.assertEqual([p['id_patient'] for p in recherche.suggestions('mohamed alaoui')], [alaoui.pk])
+            # Deux mots courants : seuls les patients qui ont les deux mots sont candidats
+            self.assertEqual(len(recherche.rechercher('mohamed nom', 10)), 3)
+
+    def test_cin_et_telephone_exacts(self):
+        self.assertEqual(self.chercher('bk 123456'), self.ids('fassi'))
+        self.assertEqual(self.chercher('BK'), self.ids('fassi', 'fassiri'))
+        self.assertEqual(self.chercher('0612345678'), self.ids('fassi'))
+        self.assertEqual(self.chercher('00212 612 34 56 78'), self.ids('fassi'))
+        self.assertEqual(self.chercher('0661000000'), self.ids('fassiri'))
+        self.assertEqual(self.chercher('0522'), self.ids('tazi'))
+
+        with CaptureQueriesContext(connection) as requetes:
+            self.chercher('BK123456')
+        self.assertEqual(len(requetes), 1)
+
+    def test_index_maintenu(self):
+        patient = self.patients['tazi']
+        patient.nom_patient = 'Bennani'
+        patient.save()
+        self.assertEqual(self.chercher('tazi'), [])
+        self.assertEqual(self.chercher('benna elodie'), self.ids('tazi'))
+
+        patient.delete()
+        self.assertFalse(IndexPatient.objects.filter(patient_id=self.ids('tazi')[0]).exists())
+
+        IndexPatient.objects.all().delete()
+        self.assertEqual(recherche.reconstruire(batch_size=1)[0], 2)
+        self.assertEqual(self.chercher('fassi'), self.ids('fassi', 'fassiri'))
+
+    def test_recherche_approchee(self):
+        naissance = timezone.localdate() - timedelta(days=365 * 40)
+        autres = {
+            cle: Patient.objects.create(
+                nom_patient=nom, prenom_patient=prenom, sexe='M', cin=f"CD{i}0000", adresse='-',
+                date_naissance=naissance, telephone='0600000000', situation_familiale='-'
+            ).pk
+            for i, (cle, nom, prenom) in enumerate((
+                ('amrani', 'Elamrani', 'Mohamed'),
+                ('chraibi', 'Chraïbi', 'Youssef'),
+                ('mahmoud', 'Kadiri', 'Mahmoud'),
+            ))
+        }
+        # Transcriptions différentes, particules séparées ou collées
+        self.assertEqual(self.chercher('el amrani mouhammad', mode='approche'), [autres['amrani']])
+        self.assertEqual(self.chercher('Shraibi Yousef', mode='approche'), [autres['chraibi']])
+        self.assertEqual(self.chercher('qadiri', mode='approche'), [autres['mahmoud']])
+        # Même clé (MD) : le plus proche d'abord
+        self.assertEqual(self.chercher('mohammed', mode='approche'), [autres['amrani'], autres['mahmoud']])
+
+        # Mode auto : recherche approchée si les préfixes ne trouvent rien
+        self.assertEqual(self.chercher('al amrani'), [autres['amrani']])
+        self.assertEqual(self.chercher('al amrani', mode='prefixe'), [])
+        # Nom compacté trouvé sans recherche approchée
+        self.assertEqual(self.chercher('elfassi', mode='prefixe'), self.ids('fassi'))
+        self.assertEqual(self.client.get("/api/patients/recherche/", {'q': 'x', 'mode': 'flou'}).status_code, 400)
+
+    def test_cles_phonetiques(self):
+        for variantes in (('Mohamed', 'Mouhammad', 'Mhammed'), ('Khadija', 'Khadidja', 'Kadija'),
+                          ('Ghali', 'Rhali'), ('Ouazzani', 'Wazzani'), ('Gilali', 'Jilali', 'Djilali')):
+            with self.subTest(variantes=variantes):
+                self.assertEqual(len({frozenset(recherche.cles_phonetiques(v)) for v in variantes}), 1)
+        self.assertIn('AMRN', recherche.cles_phonetiques('El Amrani'))
+        self.assertIn('AMRN', recherche.cles_phonetiques('Elamrani'))
+        self.assertEqual(recherche.cles_phonetiques('Alaoui'), {'AL'})
+
+    def test_suggestions(self):
+        cache.clear()
+        recherche.vider_suggestions()
+
+        def suggerer(q):
+            with CaptureQueriesContext(connection) as requetes:
+                response = self.client.get("/api/patients/suggestions/", {'q': q})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['q'], q)
+            return [p['id_patient'] for p in response.json()['resultats']], len(requetes)
+
+        self.assertEqual(suggerer('fas'), (self.ids('fassi', 'fassiri'), 2))
+        self.assertEqual(suggerer(' FAS '), (self.ids('fassi', 'fassiri'), 0))  # même clé, servie par le LRU
+        self.assertEqual(suggerer('f'), ([], 0))
+        self.assertEqual(suggerer(''), ([], 0))
+
+        premier = self.client.get("/api/patients/suggestions/", {'q': 'fassi hel'}).json()['resultats'][0]
+        self.assertEqual(set(premier), set(recherche.CHAMPS_SUGGESTION))
+        self.assertEqual(premier['date_naissance'], str(self.patients['fassi'].date_naissance))
+
+        # Toute écriture de patient périme les suggestions
+        naissance = self.patients['fassi'].date_naissance
+        for i in range(12):
+            Patient.objects.create(
+                nom_patient='Fassal', prenom_patient=f'Patient{i}', sexe='M', cin=f"EF{i}0000", adresse='-',
+                date_naissance=naissance, telephone='0600000000', situation_familiale='-'
+            )
+        ids, requetes = suggerer('fas')
+        self.assertEqual(requetes, 2)
+        self.assertEqual(len(ids), recherche.SUGGESTIONS_MAX)
+
+        # Expiration : une entrée n'est pas servie au-delà de SUGGESTIONS_CACHE_DUREE
+        self.assertEqual(suggerer('fas')[1], 0)
+        with mock.patch.object(recherche.time, 'monotonic', return_value=time.monotonic() + 61):
+            self.assertEqual(suggerer('fas')[1], 2)
+
+    def test_search_et_search_name(self):
+        response = self.client.get("/api/patients/", {'search': 'fassi'})
+        self.assertEqual({p['id_patient'] for p in response.json()}, set(self.ids('fassi', 'fassiri')))
+
+        response = self.client.get("/api/patients/search-name/", {'nom': 'fassi', 'prenom': 'hel'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['id_patient'] for p in response.json()], self.ids('fassi'))
+        response = self.client.get("/api/patients/search-name/", {'nom': 'omar'})
+        self.assertEqual(response.json(), [])
+
+        # Une lettre : trop court pour l'index, recherche dans les champs
+        response = self.client.get("/api/patients/", {'search': 'z'})
+        self.assertEqual([p['id_patient'] for p in response.json()], self.ids('tazi'))
+        response = self.client.get("/api/patients/search-name/", {'nom': 't'})
+        self.assertEqual([p['id_patient'] for p in response.json()], self.ids('tazi'))
+        response = self.client.get("/api/patients/search-name/", {'nom': 'fassi', 'prenom': 'o'})
+        self.assertEqual([p['id_patient'] for p in response.json()], self.ids('fassiri'))
+
+        self.assertEqual(self.client.get("/api/patients/recherche/").status_code, 400)
+        self.assertEqual(self.client.get("/api/patients/recherche/", {'q': 'x', 'limit': 'a'}).status_code, 400)
+
+
+
+class RechercheGlobaleTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_superuser('admin', 'admin@cabinet.ma', 'admin123', role='ADMIN')
+        cls.patient = Patient.objects.create(
+            nom_patient='Tazi', prenom_patient='Salma', sexe='F', cin='JB112233', adresse='-',
+            date_naissance=timezone.localdate() - timedelta(days=365 * 40), telephone='0661223344',
+            situation_familiale='-'
+        )
+        recherche.indexer([cls.patient])
+        cls.medecin = Medecin.objects.create(nom_med='Tazimi', prenom_med='Youssef', specialite_med='Cardiologie')
+        cls.maladie = Maladie.objects.create(nom_malad='Diabète de type 2')
+        cls.vaccin = Vaccin.objects.create(nom_vacc='BCG')
+
+    def setUp(self):
+        vider_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def chercher(self, q):
+        response = self.client.get("/api/search/", {'q': q})
+        self.assertEqual(response.status_code, 200, q)
+        return response.json()
+
+    def test_groupes_et_classement(self):
+        resultat = self.chercher('tazi')
+        self.assertEqual(resultat['incomplets'], [])
+        self.assertEqual([r['id'] for r in resultat['groupes']['patients']], [self.patient.pk])
+        self.assertEqual([r['id'] for r in resultat['groupes']['medecins']], [self.medecin.pk])
+        self.assertEqual(resultat['groupes']['vaccins'], [])
+        # Mot entier (patient) avant début de mot (médecin "Tazimi")
+        self.assertEqual([(r['type'], r['score']) for r in resultat['meilleurs']], [('patients', 1.0), ('medecins', 0.5)])
+        self.assertEqual(resultat['meilleurs'][1]['champs']['specialite_med'], 'Cardiologie')
+        self.assertEqual(resultat['meilleurs'][1]['libelle'], 'Tazimi Youssef Cardiologie')
+
+        resultat = self.chercher('diabete typ')
+        self.assertEqual([(r['type'], r['id'], r['score']) for r in resultat['meilleurs']],
+                         [('maladies', self.maladie.pk, 0.75)])
+        self.assertEqual(self.chercher('JB112233')['meilleurs'][0]['id'], self.patient.pk)
+        self.assertEqual(self.chercher('cardio')['groupes']['medecins'][0]['id'], self.medecin.pk)
+
+    def test_index_des_referentiels_invalide(self):
+        self.assertEqual(self.chercher('grippe')['meilleurs'], [])
+        vaccin = Vaccin.objects.create(nom_vacc='Grippe saisonnière')
+        self.assertEqual([r['id'] for r in self.chercher('grippe')['groupes']['vaccins']], [vaccin.pk])
+        vaccin.delete()
+        self.assertEqual(self.chercher('grippe')['meilleurs'], [])
+
+    def test_index_des_referentiels_expire(self):
+        """Écriture sans signal (ou version d'un autre processus) : index reconstruit après sa durée"""
+        horloge = Horloge()
+        source = recherche_globale.SourceCatalogue('vaccins', VaccinViewSet)
+        with mock.patch.object(recherche_globale, 'horloge', horloge), \
+                override_settings(RECHERCHE_GLOBALE_INDEX_DUREE=300):
+            self.assertEqual(len(source.chercher('bcg', 5)), 1)
+            Vaccin.objects.filter(pk=self.vaccin.pk).update(nom_vacc='Tuberculose')
+            horloge.avancer(299)
+            self.assertEqual(len(source.chercher('bcg', 5)), 1)
+            horloge.avancer(1)
+            self.assertEqual(source.chercher('bcg', 5), [])
+            self.assertEqual(len(source.chercher('tuberc', 5)), 1)
+
+    def test_budget_et_erreurs(self):
+        horloge = Horloge()
+
+        class Lente(recherche_globale.Source):
+            def chercher(self, q, limite):
+                horloge.avancer(0.05)
+                return []
+
+        class EnErreur(recherche_globale.Source):
+            def chercher(self, q, limite):
+                raise RuntimeError(q)
+
+        sources = [
+            recherche_globale.SourceCatalogue('vaccins', VaccinViewSet), EnErreur('erreur', None),
+            Lente('lente', None), Lente('lente_2', None),
+        ]
+        with self.assertLogs('core.recherche_globale', 'ERROR'), \
+                mock.patch.object(recherche_globale, 'horloge', horloge):
+            resultat = recherche_globale.rechercher('bcg', sources, budget_ms=20)
+        self.assertEqual(resultat['incomplets'], ['erreur', 'lente_2'])  # lente_2 : budget épuisé
+        self.assertEqual([r['id'] for r in resultat['meilleurs']], [self.vaccin.pk])
+        # Budget vérifié avant chaque source : la source lente démarrée n'est pas interrompue
+        self.assertEqual(resultat['duree_ms'], 50)
+
+    def test_parametres(self):
+        self.assertEqual(self.client.get("/api/search/").status_code, 400)
+        self.assertEqual(self.client.get("/api/search/", {'q': 'a'}).status_code, 400)
+        self.assertEqual(self.client.get("/api/search/", {'q': 'tazi', 'limit': 'x'}).status_code, 400)
+        self.assertEqual(len(self.client.get("/api/search/", {'q': 'tazi', 'limit': 1}).json()['meilleurs']), 2)
+        self.client.force_authenticate(None)
+        self.assertIn(self.client.get("/api/search/", {'q': 'tazi'}).status_code, (401, 403))
+
+
+class RechercheGlobaleParalleleTests(SimpleTestCase):
+    """
+    Hors transaction : sources interrogées en parallèle par le pool.
+    Synchronisées par barrière et événement, sans mesure de durée.
+    """
+
+    class Attente(recherche_globale.Source):
+        def __init__(self, groupe, attendre, score):
+            super().__init__(groupe, None)
+            self.attendre = attendre
+            self.score = score
+
+        def chercher(self, q, limite):
+            self.attendre()
+            return [recherche_globale._resultat(self.groupe, 1, {'nom': q}, self.score)]
+
+    def test_sources_en_parallele(self):
+        # Chaque source attend les trois autres : l'une après l'autre, la barrière serait rompue
+        barriere = threading.Barrier(4, timeout=5)
+        sources = [self.Attente(f'source_{i}', barriere.wait, 1 - i / 10) for i in range(4)]
+        resultat = recherche_globale.rechercher('x', sources, budget_ms=10000)
+        self.assertEqual(resultat['incomplets'], [])
+        self.assertEqual([r['type'] for r in resultat['meilleurs']], [f'source_{i}' for i in range(4)])
+
+    def test_budget_depasse(self):
+        liberee = threading.Event()
+        self.addCleanup(liberee.set)  # rend le thread du pool
+        sources = [self.Attente('rapide', lambda: None, 1), self.Attente('lente', lambda: liberee.wait(5), 1)]
+        resultat = recherche_globale.rechercher('x', sources, budget_ms=100)
+        self.assertEqual(resultat['incomplets'], ['lente'])
+        self.assertEqual([r['type'] for r in resultat['meilleurs']], ['rapide'])
+
+
+class CarteIdentitesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.donnees = creer_jeu_de_donnees(nb_medecins=2, nb_patients=30, jours=7)
+        cls.admin = get_user_model().objects.create_superuser('admin', 'admin@cabinet.ma', 'admin123', role='ADMIN')
+        cls.medecin = Medecin.objects.get(pk=cls.donnees['medecin'])
+
+    def compter(self, fonction):
+        with CaptureQueriesContext(connection) as requetes:
+            fonction()
+        return len(requetes)
+
+    def test_un_medecin_pour_200_lignes(self):
+        creneaux = lambda: [str(c) for c in Creneau.objects.filter(medecin=self.medecin)[:200]]
+        self.assertEqual(len(creneaux()), 200)
+        self.assertEqual(self.compter(creneaux), 201)
+        with carte_identites():
+            self.assertEqual(self.compter(creneaux), 2)
+
+    def test_validation_et_str(self):
+        rdvs = list(RDV.objects.filter(medecin=self.medecin, creneau__isnull=False))
+        with carte_identites():
+            requetes = self.compter(lambda: [rdv.clean() for rdv in rdvs])
+        # Un créneau par RDV, le médecin une seule fois
+        self.assertEqual(requetes, len({rdv.creneau_id for rdv in rdvs}) + 1)
+
+        actes = ConsultationActe.objects.all()
+        sans_carte = self.compter(lambda: [str(a) for a in actes.all()])
+        with carte_identites():
+            self.assertLess(self.compter(lambda: [str(a) for a in actes.all()]), sans_carte)
+
+    def test_objet_enregistre_relu(self):
+        creneaux = list(Creneau.objects.filter(medecin=self.medecin)[:2])
+        with carte_identites():
+            self.assertEqual(creneaux[0].medecin.nom_med, self.medecin.nom_med)
+            copie = Medecin.objects.get(pk=self.medecin.pk)
+            copie.nom_med = 'Nouveau nom'
+            copie.save()
+            self.assertEqual(creneaux[1].medecin.nom_med, 'Nouveau nom')
+
+    def test_liste_admin(self):
+        """Liste de l'admin dont les colonnes suivent consultation.rdv.patient"""
+        url = '/admin/core/ordonnance/'
+        sans_carte = [m for m in settings.MIDDLEWARE if m != 'core.identites.carte_identites_middleware']
+        with override_settings(MIDDLEWARE=sans_carte):
+            client = Client()  # chaîne de middlewares construite à la première requête
+            client.force_login(self.admin)
+            requetes_sans_carte = self.compter(lambda: client.get(url))
+
+        client = Client()
+        client.force_login(self.admin)
+        requetes = self.compter(lambda: self.assertEqual(client.get(url).status_code, 200))
+        self.assertLess(requetes, requetes_sans_carte)
+
+
+class TotauxTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        medecin = Medecin.objects.create(nom_med='Tazi', prenom_med='Dr', specialite_med='Généraliste')
+        patient = Patient.objects.create(
+            nom_patient='Bennani', prenom_patient='Karim', sexe='M', cin='GH123456', adresse='-',
+            date_naissance=date(1990, 1, 1), telephone='0600000000', situation_familiale='-'
+        )
+        cls.ecg = ActeMedical.objects.create(nom_acte='ECG', prix_acte=150)
+        cls.pansement = ActeMedical.objects.create(nom_acte='Pansement', prix_acte=50)
+        cls.consultations = []
+        for prix in (200, 300):
+            rdv = RDV.objects.create(patient=patient, medecin=medecin)
+            consultation = Consultation.objects.create(
+                rdv=rdv, medecin=medecin, date_cons=timezone.localdate(), diagnostic='-', prix_cons=prix
+            )
+            Facture.objects.create(consultation=consultation, patient=patient, date_fact=consultation.date_cons,
+                                   type_facture='Consultation', montant=prix)
+            cls.consultations.append(consultation)
+
+    def totaux(self, consultation):
+        """(total_actes, nb_actes, montant_total) de la consultation et de sa facture"""
+        stockes = Consultation.objects.values_list(*CHAMPS_TOTAUX).get(pk=consultation.pk)
+        self.assertEqual(Facture.objects.values_list(*CHAMPS_TOTAUX).get(consultation=consultation), stockes)
+        return stockes
+
+    def test_acte_ajoute_modifie_supprime(self):
+        premiere, _ = self.consultations
+        self.assertEqual(self.totaux(premiere), (0, 0, 200))
+
+        acte = ConsultationActe.objects.create(consultation=premiere, acte=self.ecg, quantite=2)
+        self.assertEqual(acte.prix_applique, 150)  # prix du référentiel par défaut
+        ConsultationActe.objects.create(consultation=premiere, acte=self.pansement)
+        self.assertEqual(self.totaux(premiere), (350, 2, 550))
+
+        acte.quantite = 1
+        acte.prix_applique = 120
+        acte.save()
+        self.assertEqual(self.totaux(premiere), (170, 2, 370))
+
+        acte.delete()
+        self.assertEqual(self.totaux(premiere), (50, 1, 250))
+
+    def test_acte_deplace(self):
+        premiere, seconde = self.consultations
+        acte = ConsultationActe.objects.create(consultation=premiere, acte=self.ecg)
+        ConsultationActe.objects.create(consultation=seconde, acte=self.pansement)
+
+        acte.consultation = seconde
+        acte.quantite = 2
+        acte.save()
+        self.assertEqual(self.totaux(premiere), (0, 0, 200))
+        self.assertEqual(self.totaux(seconde), (350, 2, 650))
+
+    def test_prix_consultation_modifie(self):
+        premiere, _ = self.consultations
+        chargee = Consultation.objects.get(pk=premiere.pk)  # chargée avant l'ajout de l'acte
+        ConsultationActe.objects.create(consultation=premiere, acte=self.ecg)
+
+        chargee.prix_cons = 250
+        chargee.save()
+        self.assertEqual(self.totaux(premiere), (150, 1, 400))
+        self.assertEqual((chargee.total_actes, chargee.nb_actes, chargee.montant_total), (150, 1, 400))
+
+    def test_verifier_totaux_reparer(self):
+        premiere, seconde = self.consultations
+        ConsultationActe.objects.create(consultation=premiere, acte=self.ecg)
+        ConsultationActe.objects.create(consultation=seconde, acte=self.pansement)
+        # Écritures qui contournent les signaux
+        ConsultationActe.objects.filter(consultation=premiere).update(quantite=3)
+        Facture.objects.filter(consultation=seconde).update(montant_total=0)
+
+        sortie = StringIO()
+        call_command('verifier_totaux', stdout=sortie)
+        self.assertIn("1 consultation(s) et 1 facture(s)", sortie.getvalue())
+        self.assertEqual(Consultation.objects.get(pk=premiere.pk).total_actes, 150)  # rien n'est réparé
+
+        sortie = StringIO()
+        call_command('verifier_totaux', '--reparer', '--batch-size', '1', stdout=sortie)
+        self.assertIn("réparés", sortie.getvalue())
+        self.assertEqual(self.totaux(premiere), (450, 1, 650))
+        self.assertEqual(self.totaux(seconde), (50, 1, 350))
+
+        sortie = StringIO()
+        call_command('verifier_totaux', stdout=sortie)
+        self.assertIn("Tous les totaux sont corrects", sortie.getvalue())
+
+
+class ModelesHorairesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_superuser('admin', 'admin@cabinet.ma', 'admin123', role='ADMIN')
+        cls.medecin = Medecin.objects.create(nom_med='Tazi', prenom_med='Dr', specialite_med='Généraliste')
+        cls.lundi = date(2030, 1, 7)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def modele(self, debut, fin, **champs):
+        return ModeleHoraire.objects.create(
+            medecin=self.medecin, jours_semaine='0', heure_debut=debut, heure_fin=fin, **champs
+        )
+
+    def test_validation(self):
+        for champs in (
+            {'duree_creneau': 0},
+            {'heure_debut': heure(12), 'heure_fin': heure(9)},
+            {'jours_semaine': '7'},
+            {'jours_semaine': 'lundi'},
+        ):
+            modele = ModeleHoraire(medecin=self.medecin, **{'heure_debut': heure(9), 'heure_fin': heure(12), **champs})
+            with self.subTest(champs=champs), self.assertRaises(ValidationError):
+                modele.full_clean()
+        with self.assertRaises(ValueError):
+            calculer_creneaux(self.medecin, self.lundi, heure(9), heure(12), duree=0)
+
+    def test_matin_et_apres_midi(self):
+        matin, apres_midi = self.modele(heure(9), heure(12)), self.modele(heure(14), heure(17))
+        resultat = materialiser_modeles([matin, apres_midi], self.lundi, self.lundi + timedelta(days=13))
+        self.assertEqual(resultat, {'jours_crees': 4, 'creneaux_crees': 24})
+        self.assertEqual(
+            sorted(JourTravail.objects.filter(date=self.lundi).values_list('heure_debut', flat=True)),
+            [heure(9), heure(14)]
+        )
+        # Publier à nouveau la période ne crée rien
+        resultat = materialiser_modeles([matin, apres_midi], self.lundi, self.lundi + timedelta(days=13))
+        self.assertEqual(resultat, {'jours_crees': 0, 'creneaux_crees': 0})
+
+        chevauchant = ModeleHoraire(medecin=self.medecin, jours_semaine='0,2', heure_debut=heure(11), heure_fin=heure(15))
+        with self.assertRaises(ValidationError):
+            chevauchant.full_clean()
+        response = self.client.post("/api/modeles-horaires/", {
+            'medecin': self.medecin.pk, 'jours_semaine': '0', 'heure_debut': '11:00', 'heure_fin': '15:00'
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post("/api/modeles-horaires/", {
+            'medecin': self.medecin.pk, 'jours_semaine': '1', 'heure_debut': '11:00', 'heure_fin': '15:00'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_publier(self):
+        modele = self.modele(heure(9), heure(10), duree_creneau=20)
+        Fermeture.objects.create(date=self.lundi + timedelta(days=7), motif='Congé', medecin=self.medecin)
+        response = self.client.post(f"/api/modeles-horaires/{modele.pk}/publier/", {
+            'date_debut': str(self.lundi), 'date_fin': str(self.lundi + timedelta(days=27)),
+            'exclusions': [str(self.lundi + timedelta(days=14))],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {'jours_crees': 2, 'creneaux_crees': 6})
+        self.assertEqual(
+            sorted(set(Creneau.objects.filter(medecin=self.medecin).values_list('date', flat=True))),
+            [self.lundi, self.lundi + timedelta(days=21)]
+        )
+        self.assertEqual(Creneau.objects.filter(medecin=self.medecin, date=self.lundi).count(), 3)
+        self.assertEqual(JourTravail.objects.get(date=self.lundi).duree_creneau, 20)
+
+    def test_modifier_et_supprimer_une_plage(self):
+        """Les autres plages du jour et les créneaux réservés ne sont pas touchés"""
+        matin = self.modele(heure(9), heure(12), duree_creneau=20)
+        apres_midi = self.modele(heure(14), heure(17))
+        materialiser_modeles([matin, apres_midi], self.lundi, self.lundi)
+        jour_matin = JourTravail.objects.get(date=self.lundi, heure_debut=heure(9))
+        jour_apres_midi = JourTravail.objects.get(date=self.lundi, heure_debut=heure(14))
+        creneaux = Creneau.objects.filter(medecin=self.medecin, date=self.lundi)
+        patient = Patient.objects.create(
+            nom_patient='Bennani', prenom_patient='Karim', sexe='M', cin='GH123456', adresse='-',
+            date_naissance=date(1990, 1, 1), telephone='0600000000', situation_familiale='-'
+        )
+        for debut in (heure(9, 20), heure(14)):
+            RDV.objects.create(patient=patient, medecin=self.medecin, creneau=creneaux.get(heure_debut=debut))
+
+        # Grille de 30 minutes sur une plage publiée en 20 : pas de chevauchement avec le RDV de 9 h 20
+        url = f"/api/jours-travail/{jour_matin.pk}/"
+        response = self.client.patch(url, {'heure_fin': '11:00', 'duree_creneau': 30}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(creneaux.filter(heure_debut__lt=heure(12)).order_by('heure_debut').values_list('heure_debut', 'libre')),
+            [(heure(9, 20), False), (heure(10), True), (heure(10, 30), True)]
+        )
+        self.assertEqual(creneaux.filter(heure_debut__gte=heure(14)).count(), 6)
+
+        self.assertEqual(self.client.delete(f"/api/jours-travail/{jour_apres_midi.pk}/").status_code, 400)
+        RDV.objects.filter(creneau__heure_debut=heure(9, 20)).delete()
+        Creneau.objects.filter(heure_debut=heure(9, 20)).update(libre=True)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(creneaux.filter(heure_debut__gte=heure(14)).count(), 6)
+
+        # Suppression hors API : créneaux libres de la plage seulement, le RDV est conservé
+        jour_apres_midi.delete()
+        self.assertEqual(list(creneaux.values_list('heure_debut', flat=True)), [heure(14)])
+        self.assertEqual(RDV.objects.count(), 1)
+
+
+class ReservationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_superuser('admin', 'admin@cabinet.ma', 'admin123', role='ADMIN')
+        cls.medecin = Medecin.objects.create(nom_med='Tazi', prenom_med='Dr', specialite_med='Généraliste')
+        cls.patient = Patient.objects.create(
+            nom_patient='Bennani', prenom_patient='Karim', sexe='M', cin='GH123456', adresse='-',
+            date_naissance=date(1990, 1, 1), telephone='0600000000', situation_familiale='-'
+        )
+        jour = timezone.localdate() + timedelta(days=7)
+        cls.creneaux = [
+            Creneau.objects.create(medecin=cls.medecin, date=jour, heure_debut=heure(9 + i), heure_fin=heure(10 + i))
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def prendre(self, creneau_id):
+        return self.client.post("/api/rdvs/prendre/", {'patient': self.patient.pk, 'creneau': creneau_id}, format='json')
+
+    def libre(self, creneau):
+        creneau.refresh_from_db()
+        return creneau.libre
+
+    def test_prendre(self):
+        response = self.prendre(self.creneaux[0].pk)
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(self.libre(self.creneaux[0]))
+        # Deuxième réservation du même créneau : l'UPDATE conditionnel ne touche aucune ligne
+        self.assertEqual(self.prendre(self.creneaux[0].pk).status_code, 409)
+        self.assertEqual(self.prendre(999999).status_code, 404)
+        self.assertEqual(RDV.objects.count(), 1)
+
+    def test_deplacer(self):
+        rdv_id = self.prendre(self.creneaux[0].pk).json()['id']
+        self.prendre(self.creneaux[2].pk)
+
+        url = f"/api/rdvs/{rdv_id}/deplacer/"
+        self.assertEqual(self.client.post(url, {'creneau': self.creneaux[2].pk}, format='json').status_code, 409)
+        self.assertEqual(self.client.post(url, {'creneau': 999999}, format='json').status_code, 404)
+        self.assertEqual(RDV.objects.get(pk=rdv_id).creneau_id, self.creneaux[0].pk)
+        self.assertFalse(self.libre(self.creneaux[0]))
+
+        response = self.client.post(url, {'creneau': self.creneaux[1].pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['creneau'], self.creneaux[1].pk)
+        self.assertTrue(self.libre(self.creneaux[0]))
+        self.assertFalse(self.libre(self.creneaux[1]))
+
+        # Instance périmée (RDV déplacé entre-temps) : le créneau relu sous verrou est libéré
+        perime = RDV.objects.get(pk=rdv_id)
+        perime.creneau_id = self.creneaux[2].pk
+        RDV.objects.filter(creneau=self.creneaux[2]).delete()
+        deplacer_rdv(perime, self.creneaux[0].pk)
+        self.assertTrue(self.libre(self.creneaux[1]))
+        self.assertTrue(self.libre(self.creneaux[2]))
+        self.assertFalse(self.libre(self.creneaux[0]))
+
+    def test_creneau_passe(self):
+        hier = Creneau.objects.create(
+            medecin=self.medecin, date=timezone.localdate() - timedelta(days=1),
+            heure_debut=heure(9), heure_fin=heure(10)
+        )
+        response = self.prendre(hier.pk)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['error'], "Ce créneau est déjà passé")
+        rdv_id = self.prendre(self.creneaux[0].pk).json()['id']
+        response = self.client.post(f"/api/rdvs/{rdv_id}/deplacer/", {'creneau': hier.pk}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(self.libre(hier))
+        self.assertFalse(self.libre(self.creneaux[0]))
+
+    def test_creation_generique(self):
+        donnees = {'patient': self.patient.pk, 'medecin': self.medecin.pk, 'creneau': self.creneaux[0].pk}
+        response = self.client.post("/api/rdvs/", donnees, format='json')
+        self.assertEqual(response.status_code, 201)
+        rdv_id = response.json()['id']
+        self.assertFalse(self.libre(self.creneaux[0]))
+
+        self.assertEqual(self.client.post("/api/rdvs/", donnees, format='json').status_code, 409)
+        self.assertEqual(RDV.objects.count(), 1)
+
+        # Changement de statut : le créneau reste celui du RDV
+        self.assertEqual(self.client.patch(f"/api/rdvs/{rdv_id}/confirmer/").status_code, 200)
+
+        autre = RDV.objects.create(patient=self.patient, medecin=self.medecin, creneau=self.creneaux[1])
+        response = self.client.patch(f"/api/rdvs/{autre.pk}/", {'creneau': self.creneaux[0].pk}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(RDV.objects.get(pk=autre.pk).creneau_id, self.creneaux[1].pk)
+        self.assertFalse(self.libre(self.creneaux[1]))
+
+
+class CoherenceDisponibilitesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.medecin = Medecin.objects.create(nom_med='Tazi', prenom_med='Dr', specialite_med='Généraliste')
+        cls.jour = timezone.localdate() + timedelta(days=3)
+        cls.creneau = Creneau.objects.create(medecin=cls.medecin, date=cls.jour, heure_debut=heure(9), heure_fin=heure(10))
+
+    def setUp(self):
+        vider_caches()
+
+    def prendre(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Creneau.objects.filter(pk=self.creneau.pk).update(libre=False)
+            disponibilites.invalider(self.medecin.pk, self.jour)
+
+    def test_invalidation_au_commit(self):
+        self.assertTrue(disponibilites.est_libre(self.creneau))
+        self.prendre()
+        self.assertFalse(disponibilites.est_libre(self.creneau))
+
+    def test_lecture_concurrente_pas_remise_en_cache(self):
+        """Jour lu en base avant une écriture, stocké après son invalidation : pas servi ensuite"""
+        construire = disponibilites._construire
+
+        def construire_puis_ecrire(*args):
+            entrees = construire(*args)
+            self.prendre()
+            return entrees
+
+        with mock.patch.object(disponibilites, '_construire', construire_puis_ecrire):
+            self.assertTrue(disponibilites.est_libre(self.creneau))  # état lu avant l'écriture
+        self.assertFalse(disponibilites.est_libre(self.creneau))
+
+    def test_cache_partage(self):
+        """Deux processus (deux backends) sur le même cache Django : l'invalidation de l'un est vue par l'autre"""
+        processus = [disponibilites.DjangoCacheBackend(), disponibilites.DjangoCacheBackend()]
+        with mock.patch.object(disponibilites, '_backend', processus[0]):
+            self.assertTrue(disponibilites.est_libre(self.creneau))
+        with mock.patch.object(disponibilites, '_backend', processus[1]):
+            self.prendre()
+        with mock.patch.object(disponibilites, '_backend', processus[0]):
+            self.assertFalse(disponibilites.est_libre(self.creneau))
+
+    def test_locmem_borne_et_expire(self):
+        backend = disponibilites.LocMemBackend(taille_max=2)
+        backend.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(backend.get_many(['a', 'b', 'c']), {'b': 2, 'c': 3})
+        with mock.patch.object(disponibilites.time, 'monotonic', return_value=time.monotonic() + 7200):
+            self.assertEqual(backend.get_many(['b', 'c']), {})
+
+    def test_medecin_inconnu(self):
+        client = APIClient()
+        response = client.get("/api/creneaux/disponibilites-mois/", {'medecin': 999999, 'mois': '2030-01'})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(disponibilites.get_backend().get_many(['999999:2030-01-01']), {})
+
+    def test_controle_cache_partage(self):
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://'}}
+        with override_settings(CACHES=redis, DISPONIBILITES_BACKEND='core.disponibilites.DjangoCacheBackend'):
+            self.assertEqual(verifier_caches_partages(), [])
+        with override_settings(CACHES=redis, DISPONIBILITES_BACKEND='core.disponibilites.LocMemBackend'):
+            self.assertEqual([a.id for a in verifier_caches_partages()], ['core.W002'])
+        with override_settings(DISPONIBILITES_BACKEND='core.disponibilites.DjangoCacheBackend'):
+            # LocMemCache des tests : disponibilités, journal, référentiels et suggestions
+            self.assertEqual(len(verifier_caches_partages()), 4)
+        with override_settings(DISPONIBILITES_BACKEND='core.disponibilites.DjangoCacheBackend',
+                               SUGGESTIONS_CACHE_TAILLE=0):
+            self.assertEqual(len(verifier_caches_partages()), 3)
+        caches_separes = dict(redis, catalogues={'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'})
+        with override_settings(CACHES=caches_separes, CATALOGUES_CACHE_ALIAS='catalogues',
+                               DISPONIBILITES_BACKEND='core.disponibilites.DjangoCacheBackend'):
+            self.assertIn('CATALOGUES_CACHE_ALIAS', verifier_caches_partages()[0].msg)
+
+    def test_reglages_par_defaut(self):
+        """CACHES par défaut utilisable sans service ni paquet externe (redis configuré par le déploiement)"""
+        from cabinet_medical import settings as reglages
+        cache = CacheHandler(reglages.CACHES)['default']
+        cache.set('essai', 1)
+        self.assertEqual(cache.get('essai'), 1)
+
+
+class StatistiquesTests(TestCase):
+
+    def setUp(self):
+        cache.delete(statistiques.CACHE_CLE)
+
+    def test_invalidation_au_commit(self):
+        self.assertEqual(statistiques.statistiques()['patients'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Patient.objects.create(
+                nom_patient='Bennani', prenom_patient='Karim', sexe='M', cin='GH123456', adresse='-',
+                date_naissance=date(1990, 1, 1), telephone='0600000000', situation_familiale='-'
+            )
+            # Avant le commit : l'entrée en cache n'est pas encore supprimée
+            self.assertEqual(statistiques.statistiques()['patients'], 0)
+        self.assertEqual(statistiques.statistiques()['patients'], 1)
+
+
+class PaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_superuser('admin', 'admin@cabinet.ma', 'admin123', role='ADMIN')
+        medecin = Medecin.objects.create(nom_med='Tazi', prenom_med='Dr', specialite_med='Généraliste')
+        patient = Patient.objects.create(
+            nom_patient='Bennani', prenom_patient='Karim', sexe='M', cin='GH123456', adresse='-',
+            date_naissance=date(1990, 1, 1), telephone='0600000000', situation_familiale='-'
+        )
+        RDV.objects.bulk_create([
+            RDV(patient=patient, medecin=medecin, statut=('RESERVE', 'CONFIRME', 'TERMINE')[i % 3])
+            for i in range(130)
+        ])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_paginee_sans_parametre(self):
+        response = self.client.get("/api/rdvs/")
+        self.assertEqual(len(response.json()), 100)  # page_size par défaut
+        suivante = response['Link'].split('>')[0].lstrip('<')
+        self.assertTrue(response['Link'].endswith('rel="next"'))
+        self.assertEqual(len(self.client.get(suivante).json()), 30)
+
+        # Petits référentiels : liste complète, sans en-tête Link
+        Vaccin.objects.bulk_create(Vaccin(nom_vacc=f'Vaccin {i}') for i in range(120))
+        response = self.client.get("/api/vaccins/")
+        self.assertEqual(len(response.json()), 120)
+        self.assertNotIn('Link', response)
+
+    def test_curseur_avec_doublons(self):
+        """?ordering= sur un champ à valeurs en double : chaque ligne vue une seule fois"""
+        for ordering in ('statut', '-statut'):
+            vus = []
+            url = f"/api/rdvs/?ordering={ordering}&page_size=20"
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                vus += [(r['statut'], r['id']) for r in response.json()]
+                lien = [l for l in response.get('Link', '').split(', ') if l.endswith('rel="next"')]
+                url = lien[0].split('>')[0].lstrip('<') if lien else None
+            with self.subTest(ordering=ordering):
+                self.assertEqual(len(vus), 130)
+                self.assertEqual(len(set(vus)), 130)
+                self.assertEqual(vus, sorted(vus, reverse=ordering.startswith('-')))
+
+
+class SuiviModificationsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = get_user_model().objects.create_superuser('admin', 'admin@cabinet.ma', 'admin123', role='ADMIN')
+        cls.medecins = [
+            Medecin.objects.create(nom_med=nom, prenom_med='Dr', specialite_med='Généraliste') for nom in ('Tazi', 'Alaoui')
+        ]
+        cls.patient = Patient.objects.create(
+            nom_patient='Bennani', prenom_patient='Karim', sexe='M', cin='GH123456', adresse='-',
+            date_naissance=date(1990, 1, 1), telephone='0600000000', situation_familiale='-'
+        )
+
+    def setUp(self):
+        vider_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def ecrire(self, fonction):
+        with self.captureOnCommitCallbacks(execute=True):
+            return fonction()
+
+    def rdv(self, medecin=0):
+        return self.ecrire(lambda: RDV.objects.create(patient=self.patient, medecin=self.medecins[medecin]))
+
+    def test_reponse_304(self):
+        self.rdv()
+        response = self.client.get("/api/rdvs/")
+        etag = response['ETag']
+        self.assertEqual(self.client.get("/api/rdvs/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.rdv()
+        response = self.client.get("/api/rdvs/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_since_et_suppressions(self):
+        rdv, supprime = self.rdv(), self.rdv()
+        version = int(self.client.get("/api/rdvs/")['X-Version'])
+        self.assertEqual(self.client.get("/api/rdvs/", {'since': version}).json()['modifies'], [])
+
+        rdv.statut = 'CONFIRME'
+        self.ecrire(rdv.save)
+        supprime_id = supprime.pk
+        self.ecrire(supprime.delete)
+        delta = self.client.get("/api/rdvs/", {'since': version}).json()
+        self.assertFalse(delta['complet'])
+        self.assertEqual([r['statut'] for r in delta['modifies']], ['CONFIRME'])
+        self.assertEqual(delta['supprimes'], [supprime_id])
+        self.assertGreater(delta['version'], version)
+
+    def test_since_ligne_sortie_du_filtre(self):
+        rdv = self.rdv(medecin=0)
+        params = {'medecin': self.medecins[0].pk}
+        version = int(self.client.get("/api/rdvs/", params)['X-Version'])
+        rdv.medecin = self.medecins[1]
+        self.ecrire(rdv.save)
+        delta = self.client.get("/api/rdvs/", {**params, 'since': version}).json()
+        self.assertEqual(delta['modifies'], [])
+        self.assertEqual(delta['supprimes'], [rdv.pk])
+
+    def test_versions_du_compteur(self):
+        premier = self.rdv()
+        self.rdv()
+        versions = list(Modification.objects.filter(modele='rdv').order_by('id').values_list('version', flat=True))
+        self.assertEqual(versions, list(range(versions[0], versions[0] + len(versions))))
+        self.assertEqual(
+            CompteurModifications.objects.get(modele='rdv').valeur,
+            Modification.objects.filter(modele='rdv').aggregate(v=Max('version'))['v']
+        )
+        self.assertEqual(modifications.changements('rdv', versions[0] - 1)[0], [premier.pk, premier.pk + 1])
+
+        # Compteur propre à chaque modèle : une écriture sur un autre modèle ne prend pas le verrou de 'rdv'
+        rdv = CompteurModifications.objects.get(modele='rdv').valeur
+        self.ecrire(lambda: Medecin.objects.create(nom_med='Alami', prenom_med='Dr', specialite_med='Cardiologue'))
+        self.assertEqual(CompteurModifications.objects.get(modele='rdv').valeur, rdv)
+        self.assertEqual(
+            CompteurModifications.objects.get(modele='medecin').valeur,
+            Modification.objects.filter(modele='medecin').aggregate(v=Max('version'))['v']
+        )
+
+    def test_etag_modele_dependant(self):
+        """La liste des RDV dépend des médecins : une écriture sur un médecin change l'ETag, pas X-Version"""
+        self.rdv()
+        response = self.client.get("/api/rdvs/")
+        self.medecins[0].nom_med = 'Tazi-Alaoui'
+        self.ecrire(self.medecins[0].save)
+        suivante = self.client.get("/api/rdvs/", HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(suivante.status_code, 200)
+        self.assertEqual(suivante['X-Version'], response['X-Version'])
+
+    def test_remplissage_tardif_du_cache(self):
+        """Version lue avant une écriture et mise en cache après son commit : pas servie"""
+        modifications.versions(['rdv'])
+        jeton = cache.get(modifications.CACHE_PREFIXE + 'gen:rdv')
+        self.rdv()
+        cache.set(modifications.CACHE_PREFIXE + 'rdv', (jeton, (0, None)))
+        self.assertEqual(modifications.versions(['rdv'])[0]['rdv'], CompteurModifications.objects.get(modele='rdv').valeur)
+
+
+class EvenementsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.medecin = Medecin.objects.create(nom_med='Tazi', prenom_med='Dr', specialite_med='Généraliste')
+        cls.patient = Patient.objects.create(
+            nom_patient='Bennani', prenom_patient='Karim', sexe='M', cin='GH123456', adresse='-',
+            date_naissance=date(1990, 1, 1), telephone='0600000000', situation_familiale='-'
+        )
+        cls.creneau = Creneau.objects.create(
+            medecin=cls.medecin, date=timezone.localdate() + timedelta(days=1), heure_debut=heure(9), heure_fin=heure(10)
+        )
+
+    def test_changement_de_statut_sans_evenement_creneau(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            rdv = RDV.objects.create(patient=self.patient, medecin=self.medecin, creneau=self.creneau)
+        creneaux = Modification.objects.filter(modele='creneau').count()
+        with mock.patch.object(evenements, 'publier') as publier, self.captureOnCommitCallbacks(execute=True):
+            rdv.statut = 'CONFIRME'
+            rdv.save()
+        self.assertEqual(Modification.objects.filter(modele='creneau').count(), creneaux)
+        self.assertEqual([appel.args[0]['modele'] for appel in publier.call_args_list], ['rdv'])
+        self.assertEqual(publier.call_args.args[0]['details']['statut'], 'CONFIRME')
+
+    async def test_broker(self):
+        broker = evenements.LocalBroker()
+        rdv, tout = broker.abonner(['rdv']), broker.abonner()
+        broker.publier({'modele': 'creneau', 'ids': [1]})
+        broker.publier({'modele': 'rdv', 'ids': [2]})
+        await asyncio.sleep(0)  # call_soon_threadsafe : dépôt au tour de boucle suivant
+        self.assertEqual([rdv.file.get_nowait()['ids']], [[2]])
+        self.assertEqual([tout.file.get_nowait()['ids'], tout.file.get_nowait()['ids']], [[1], [2]])
+
+        # Écran en retard : la file est vidée et remplacée par une demande de resynchronisation
+        for i in range(evenements.TAILLE_FILE + 1):
+            broker.publier({'modele': 'rdv', 'ids': [i]})
+        await asyncio.sleep(0)
+        self.assertEqual(rdv.file.get_nowait(), {'modele': '*', 'resync': True})
+
+        broker.desabonner(rdv)
+        broker.publier({'modele': 'rdv', 'ids': [3]})
+        await asyncio.sleep(0)
+        self.assertTrue(rdv.file.empty())
+
+    async def test_flux_sse(self):
+        broker = evenements.LocalBroker()
+        with mock.patch.object(evenements, '_broker', broker):
+            response = await self.async_client.get("/api/evenements/", {'modeles': 'rdv'})
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            flux = aiter(response.streaming_content)
+            self.assertEqual(await anext(flux), b"retry: 3000\n\n")
+            evenements.publier({'modele': 'creneau', 'ids': [7]})
+            evenements.publier({'modele': 'rdv', 'ids': [12], 'supprime': False})
+            message = await asyncio.wait_for(anext(flux), timeout=2)
+            self.assertEqual(message, b'event: rdv\ndata: {"modele": "rdv", "ids": [12], "supprime": false}\n\n')
+            await flux.aclose()
+
+    def test_flux_sans_asgi(self):
+        self.assertEqual(self.client.get("/api/evenements/").status_code, 501)
@@ -0,0 +1,109 @@
+# core/totaux.py
+"""
+Totaux dénormalisés des consultations et des factures.
+
+Consultation et Facture stockent total_actes (somme des prix_applique * quantite
+des actes), nb_actes et montant_total (prix_cons + total_actes). Les listes, les
+rapports de chiffre d'affaires et les tris / filtres par montant lisent ces
+colonnes (montant_total est indexé) au lieu de sommer les actes à chaque requête.
+
+Mise à jour incrémentale : chaque insertion / modification / suppression d'un
+ConsultationActe applique un delta (UPDATE ... SET total = total + delta) à la
+consultation et à sa facture (voir core/signals.py). Les écritures qui
+contournent les signaux (queryset.update(), SQL direct) sont rattrapées par :
+    python manage.py verifier_totaux [--reparer]
+"""
+from django.db.models import F, OuterRef, Q, Subquery
+from django.db.models.functions import Abs
+
+from .models import Consultation, ConsultationActe, Facture, CHAMPS_TOTAUX
+
+
+TOLERANCE = 0.005  # écart toléré sur les montants (arrondis des flottants)
+
+
+def montant_acte(acte):
+    return (acte.prix_applique or 0) * acte.quantite
+
+
+def appliquer_delta(consultation_id, montant, nombre):
+    """Ajoute (montant, nombre) aux totaux d'une consultation et de sa facture"""
+    if not montant and not nombre:
+        return
+    maj = {
+        'total_actes': F('total_actes') + montant,
+        'nb_actes': F('nb_actes') + nombre,
+        'montant_total': F('montant_total') + montant,
+    }
+    Consultation.objects.filter(pk=consultation_id).update(**maj)
+    Facture.objects.filter(consultation_id=consultation_id).update(**maj)
+
+
+def propager_factures(consultation_ids):
+    """Recopie les totaux des consultations dans leurs factures (une requête)"""
+    consultation = Consultation.objects.filter(pk=OuterRef('consultation_id'))
+    return Facture.objects.filter(consultation_id__in=consultation_ids).update(**{
+        champ: Subquery(consultation.values(champ)[:1]) for champ in CHAMPS_TOTAUX
+    })
+
+
+def recalculer_montants(consultation_ids):
+    """montant_total = prix_cons + total_actes (après un changement du prix de la consultation)"""
+    Consultation.objects.filter(pk__in=consultation_ids).update(
+        montant_total=F('prix_cons') + F('total_actes')
+    )
+    propager_factures(consultation_ids)
+
+
+# ===== VÉRIFICATION / RÉPARATION =====
+
+def _consultations_incorrectes():
+    total, nombre = ConsultationActe.totaux_consultation(OuterRef('pk'))
+    return Consultation.objects.annotate(
+        total_calcule=total,
+        nb_calcule=nombre,
+    ).annotate(
+        ecart_total=Abs(F('total_actes') - F('total_calcule')),
+        ecart_montant=Abs(F('montant_total') - F('prix_cons') - F('total_calcule')),
+    ).filter(
+        Q(ecart_total__gt=TOLERANCE) | Q(ecart_montant__gt=TOLERANCE) | ~Q(nb_actes=F('nb_calcule'))
+    )
+
+
+def _factures_incorrectes():
+    return Facture.objects.annotate(
+        ecart_total=Abs(F('total_actes') - F('consultation__total_actes')),
+        ecart_montant=Abs(F('montant_total') - F('consultation__montant_total')),
+    ).filter(
+        Q(ecart_total__gt=TOLERANCE) | Q(ecart_montant__gt=TOLERANCE)
+        | ~Q(nb_actes=F('consultation__nb_actes'))
+    )
+
+
+def reparer_consultations(consultation_ids):
+    """Recalcule les totaux depuis les actes (un UPDATE par lot)"""
+    total, nombre = ConsultationActe.totaux_consultation(OuterRef('pk'))
+    return Consultation.objects.filter(pk__in=consultation_ids).update(
+        total_actes=total,
+        nb_actes=nombre,
+        montant_total=F('prix_cons') + total,
+    )
+
+
+def verifier(reparer=False, batch_size=1000):
+    """
+    Compare les totaux stockés aux totaux recalculés en SQL.
+    Retourne (consultations incorrectes, factures incorrectes) ; avec reparer=True
+    les lignes incorrectes sont corrigées par lots de `batch_size`.
+    """
+    consultations = list(_consultations_incorrectes().values_list('pk', flat=True))
+    if reparer:
+        for i in range(0, len(consultations), batch_size):
+            reparer_consultations(consultations[i:i + batch_size])
+
+    factures = list(_factures_incorrectes().values_list('consultation_id', flat=True))
+    if reparer:
+        for i in range(0, len(factures), batch_size):
+            propager_factures(factures[i:i + batch_size])
+
+    return len(consultations), len(factures)
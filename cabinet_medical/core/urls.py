@@ -10,7 +10,8 @@ from .views import (
     VaccinViewSet, VaccinDossierViewSet,
     AllergieViewSet, AllergieDossierViewSet,PatientViewSet, MedecinViewSet,
     JourTravailViewSet, OrganismeAssuranceViewSet,
-    PatientOrganismeViewSet
+    PatientOrganismeViewSet, ModeleHoraireViewSet, FermetureViewSet,
+    RechercheGlobaleView
 )
 
 from .views_auth import (
@@ -18,7 +19,8 @@ from .views_auth import (
     ChangePasswordView,
     UserProfileView
 )
-from .views_user import UserViewSet, RegisterStaffView
+from .views_user import UserViewSet, RegisterStaffView, StatsView
+from .evenements import flux_evenements
 
 router = DefaultRouter()
 router.register(r'employes', EmployeViewSet, basename='employe')
@@ -53,6 +55,8 @@ router.register(r'vaccin-dossiers', VaccinDossierViewSet, basename='vaccin-dossi
 router.register(r'allergies', AllergieViewSet, basename='allergie')
 router.register(r'allergie-dossiers', AllergieDossierViewSet, basename='allergie-dossier')
 router.register(r'jours-travail', JourTravailViewSet, basename='jour-travail')
+router.register(r'modeles-horaires', ModeleHoraireViewSet, basename='modele-horaire')
+router.register(r'fermetures', FermetureViewSet, basename='fermeture')
 router.register(r'organismes', OrganismeAssuranceViewSet, basename='organisme')
 router.register(r'patient-organismes', PatientOrganismeViewSet, basename='patient-organisme')
 # Ajoutez cette ligne
@@ -67,6 +71,9 @@ urlpatterns = [
     path('auth/change-password/', ChangePasswordView.as_view(), name='change-password'),
     path('auth/profile/', UserProfileView.as_view(), name='user-profile'),
     path('auth/register-staff/', RegisterStaffView.as_view(), name='register-staff'),
+    path('stats/', StatsView.as_view(), name='stats'),
+    path('search/', RechercheGlobaleView.as_view(), name='recherche-globale'),
+    path('evenements/', flux_evenements, name='evenements'),
 ]
 
 
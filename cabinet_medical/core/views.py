@@ -1,16 +1,39 @@
 from rest_framework import viewsets, filters,status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+from django_filters import rest_framework as django_filters
 from django_filters.rest_framework import DjangoFilterBackend
 
 from datetime import datetime, timedelta
+from django.db import transaction
+from . import disponibilites
+from .dossiers import patients_avec_dossier, serialiser_dossier
+from .espace_medecin import espace_consultation
+from .catalogues import CacheCatalogueMixin
+from .recherche import (
+    RecherchePatientFilter, ids_correspondants, jetons_requete, rechercher, rechercher_approche,
+    suggestions as suggestions_patients
+)
+from . import recherche_globale
+from .recherche_texte import RechercheConsultationFilter, RequeteInvalide, rechercher_consultations
+from .lecture_rapide import LectureRapideMixin
+from .modifications import SuiviModificationsMixin
+from .requetes import PlanRequetesMixin, Plan
+from .planning import (
+    creneaux_plage, generer_creneaux_jour, supprimer_creneaux_libres, materialiser_modeles,
+    creneaux_libres_a_venir, prochains_creneaux_libres, calendrier,
+    reserver_creneau, deplacer_rdv, CreneauIndisponible, CreneauIntrouvable
+)
 from .models import (
     Patient, Medecin, RDV, Creneau, Consultation,
     Employe, ActeMedical, ConsultationActe,
     Ordonnance, OrdonnanceAnalyse, OrdonnanceRadio,
     Analyse, Radio, DossierMedical, Facture,
     Maladie, MaladieDossier, Vaccin, VaccinDossier,  # ← AJOUTEZ CES IMPORTS
-    Allergie, AllergieDossier,JourTravail                          # ← AJOUTEZ CES IMPORTS
+    Allergie, AllergieDossier,JourTravail,                          # ← AJOUTEZ CES IMPORTS
+    ModeleHoraire, Fermeture
 )
 
 
@@ -22,7 +45,9 @@ from .serializers import (
     AnalyseSerializer, RadioSerializer, DossierMedicalSerializer, FactureSerializer,
     MaladieSerializer, MaladieDossierSerializer,      # ← AJOUTEZ CES IMPORTS
     VaccinSerializer, VaccinDossierSerializer,        # ← AJOUTEZ CES IMPORTS
-    AllergieSerializer, AllergieDossierSerializer ,JourTravailSerializer,FactureDetailSerializer   # ← AJOUTEZ CES IMPORTS
+    AllergieSerializer, AllergieDossierSerializer ,JourTravailSerializer,FactureDetailSerializer,   # ← AJOUTEZ CES IMPORTS
+    ModeleHoraireSerializer, FermetureSerializer, PublicationHoraireSerializer,
+    ReservationSerializer, DeplacementRDVSerializer
 )
 
 # Ajoutez ces imports en haut si pas déjà présents
@@ -30,17 +55,19 @@ from .models import OrganismeAssurance, PatientOrganisme
 from .serializers import OrganismeAssuranceSerializer, PatientOrganismeSerializer
 
 # Ajoutez ces ViewSets à la fin du fichier
-class OrganismeAssuranceViewSet(viewsets.ModelViewSet):
+class OrganismeAssuranceViewSet(CacheCatalogueMixin, viewsets.ModelViewSet):
     queryset = OrganismeAssurance.objects.all()
     serializer_class = OrganismeAssuranceSerializer
+    pagination_class = None  # petit référentiel : liste complète
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['nom_org', 'type_org']
     search_fields = ['nom_org']
 
 
-class PatientOrganismeViewSet(viewsets.ModelViewSet):
+class PatientOrganismeViewSet(PlanRequetesMixin, viewsets.ModelViewSet):
     queryset = PatientOrganisme.objects.all()
     serializer_class = PatientOrganismeSerializer
+    plan_requetes = {'default': Plan(select_related=('organisme',))}
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['patient', 'organisme']
 
@@ -53,14 +80,16 @@ class EmployeViewSet(viewsets.ModelViewSet):
 
 
 
-class PatientViewSet(viewsets.ModelViewSet):
+class PatientViewSet(PlanRequetesMixin, viewsets.ModelViewSet):
     queryset = Patient.objects.all()
     serializer_class = PatientSerializer
+    plan_requetes = {'default': Plan(select_related=('employe',))}
+    page_size = 50
     
     # ✅ AJOUTEZ CES LIGNES
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RecherchePatientFilter, filters.OrderingFilter]
     filterset_fields = ['cin', 'id_patient', 'nom_patient', 'prenom_patient']  # ← IMPORTANT
-    search_fields = ['nom_patient', 'prenom_patient', 'cin', 'telephone']
+    search_fields = ['nom_patient', 'prenom_patient', 'cin', 'telephone']  # indexés (core/recherche.py)
     ordering_fields = ['nom_patient', 'date_naissance']
         
     @action(detail=False, methods=['get'], url_path='search-cin')
@@ -72,7 +101,7 @@ class PatientViewSet(viewsets.ModelViewSet):
         
         try:
             # Chercher dans la table Patient
-            patients = Patient.objects.filter(cin=cin)
+            patients = self.get_queryset().filter(cin=cin)
             serializer = self.get_serializer(patients, many=True)
             return Response(serializer.data)
         except Exception as e:
@@ -88,15 +117,84 @@ class PatientViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Nom requis'}, status=400)
         
         try:
-            patients = Patient.objects.filter(
-                nom__icontains=nom,
-                prenom__icontains=prenom
-            )
+            patients = self.get_queryset()
+            for champ, valeur in (('nom_patient', nom), ('prenom_patient', prenom)):
+                if not valeur:
+                    continue
+                if jetons_requete(valeur):
+                    patients = patients.filter(pk__in=ids_correspondants(valeur, (champ,)))
+                else:  # une lettre : trop court pour l'index
+                    patients = patients.filter(**{f'{champ}__icontains': valeur})
+            patients = patients.order_by('nom_patient', 'prenom_patient', 'pk')
             serializer = self.get_serializer(patients, many=True)
             return Response(serializer.data)
         except Exception as e:
             return Response({'error': str(e)}, status=500)
     
+    @action(detail=False, methods=['get'], url_path='recherche')
+    def recherche(self, request):
+        """
+        Recherche classée par l'index des patients (voir core/recherche.py)
+        URL: /api/patients/recherche/?q=el fassi&limit=20 (20 par défaut, 100 max)
+        Un CIN ou un numéro de téléphone complet est cherché tel quel.
+        mode : auto (par défaut, recherche approchée si rien n'est trouvé),
+        prefixe (début des mots uniquement) ou approche (clés phonétiques).
+        """
+        q = request.query_params.get('q', '').strip()
+        if not q:
+            return Response({'error': 'Paramètre q requis'}, status=400)
+        mode = request.query_params.get('mode', 'auto')
+        if mode not in ('auto', 'prefixe', 'approche'):
+            return Response({'error': 'mode doit valoir auto, prefixe ou approche'}, status=400)
+        try:
+            limite = min(int(request.query_params.get('limit', 20)), 100)
+        except ValueError:
+            return Response({'error': 'Paramètres invalides'}, status=400)
+        if limite < 1:
+            return Response({'error': 'limit doit être positif'}, status=400)
+
+        patients = [] if mode == 'approche' else rechercher(q, limite, queryset=self.get_queryset())
+        if not patients and mode != 'prefixe':
+            patients = rechercher_approche(q, limite, queryset=self.get_queryset())
+        serializer = self.get_serializer(patients, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'], url_path='suggestions')
+    def suggestions(self, request):
+        """
+        Saisie semi-automatique : 10 patients au plus (id, nom, prénom, CIN, date de naissance)
+        URL: /api/patients/suggestions/?q=el fa
+        La saisie est renvoyée dans `q` : le client ignore les réponses d'une
+        frappe dépassée. Une saisie vide ou trop courte renvoie une liste vide.
+        """
+        q = request.query_params.get('q', '')
+        return Response({'q': q, 'resultats': suggestions_patients(q)})
+
+    @action(detail=True, methods=['get'], url_path='bundle')
+    def bundle(self, request, pk=None):
+        """
+        Dossier complet du patient en une réponse (voir core/dossiers.py)
+        URL: /api/patients/{id}/bundle/
+        """
+        patient = patients_avec_dossier().filter(pk=pk).first()
+        if patient is None:
+            return Response({'error': 'Patient introuvable'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(serialiser_dossier(patient))
+
+    @action(detail=False, methods=['get'], url_path='bundle')
+    def bundle_par_cin(self, request):
+        """
+        Dossier complet du patient identifié par son CIN
+        URL: /api/patients/bundle/?cin=AB123456
+        """
+        cin = request.query_params.get('cin')
+        if not cin:
+            return Response({'error': 'CIN requis'}, status=400)
+        patient = patients_avec_dossier().filter(cin=cin).first()
+        if patient is None:
+            return Response({'error': 'Patient introuvable'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(serialiser_dossier(patient))
+
     @action(detail=False, methods=['post'], url_path='create-with-dossier')
     def create_with_dossier(self, request):
         """Créer un patient avec son dossier médical vide"""
@@ -107,40 +205,70 @@ class PatientViewSet(viewsets.ModelViewSet):
             patient = patient_serializer.save()
             
             # Créer le dossier médical vide
-            DossierMedical.objects.create(
-                patient=patient,
-                poids=0,
-                taille=0,
-                tension_arterielle='',
-                antecedents_medicaux='',
-                antecedents_chirurgicaux='',
-                antecedents_familiaux=''
-            )
+            DossierMedical.objects.get_or_create(patient=patient)
             
             return Response(patient_serializer.data, status=201)
         except Exception as e:
             return Response({'error': str(e)}, status=500)
 
-class MedecinViewSet(viewsets.ModelViewSet):
+class MedecinViewSet(CacheCatalogueMixin, viewsets.ModelViewSet):
     queryset = Medecin.objects.all()
     serializer_class = MedecinSerializer
+    pagination_class = None  # petit référentiel : liste complète
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['nom_med', 'prenom_med', 'specialite_med']
 
 
-class CreneauViewSet(viewsets.ModelViewSet):
+class CreneauViewSet(PlanRequetesMixin, SuiviModificationsMixin, LectureRapideMixin, viewsets.ModelViewSet):
     queryset = Creneau.objects.all()
     serializer_class = CreneauSerializer
+    plan_requetes = {'default': Plan(select_related=('medecin',))}
+    suivi_modele = 'creneau'
+    suivi_modeles = ('creneau', 'medecin')
+    page_size = 200
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['medecin', 'date', 'libre']
     ordering_fields = ['date', 'heure_debut']
     
     @action(detail=False, methods=['get'])
     def libres(self, request):
-        """Retourne uniquement les créneaux libres"""
-        creneaux_libres = Creneau.objects.filter(libre=True)
+        """Retourne uniquement les créneaux libres à venir"""
+        creneaux_libres = creneaux_libres_a_venir(
+            self.get_queryset()
+        ).order_by('date', 'heure_debut')
         serializer = self.get_serializer(creneaux_libres, many=True)
         return Response(serializer.data)
+
+    @action(detail=False, methods=['get'], url_path='recherche')
+    def recherche(self, request):
+        """
+        Prochains créneaux libres, tous médecins confondus
+        Paramètres : specialite, medecins=1,2,3, debut=AAAA-MM-JJ, fin=AAAA-MM-JJ, limit (10 par défaut, 100 max)
+        La fenêtre de recherche est limitée à 90 jours.
+        """
+        params = request.query_params
+        try:
+            debut = datetime.strptime(params['debut'], '%Y-%m-%d').date() if params.get('debut') else None
+            fin = datetime.strptime(params['fin'], '%Y-%m-%d').date() if params.get('fin') else None
+            medecins = [int(m) for m in params.get('medecins', '').split(',') if m.strip()]
+            limite = min(int(params.get('limit', 10)), 100)
+        except ValueError:
+            return Response({'error': 'Paramètres invalides'}, status=400)
+
+        if limite < 1:
+            return Response({'error': 'limit doit être positif'}, status=400)
+        if debut and fin and (fin < debut or (fin - debut).days > 90):
+            return Response({'error': 'La fenêtre de recherche doit être comprise entre 0 et 90 jours'}, status=400)
+
+        creneaux = prochains_creneaux_libres(
+            date_debut=debut,
+            date_fin=fin,
+            medecins=medecins,
+            specialite=params.get('specialite'),
+            limite=limite
+        )
+        serializer = self.get_serializer(creneaux, many=True)
+        return Response(serializer.data)
     @action(detail=False, methods=['get'], url_path='disponibles')
     def disponibles(self, request):
         """Récupérer les créneaux disponibles pour un médecin et une date"""
@@ -151,21 +279,129 @@ class CreneauViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Médecin et date requis'}, status=400)
         
         try:
-            creneaux = Creneau.objects.filter(
-                medecin_id=medecin_id,
-                date=date,
-                libre=True
+            # Servi par le cache des disponibilités (aucune requête SQL si le jour est en cache)
+            creneaux = disponibilites.creneaux_libres_jour(
+                int(medecin_id),
+                datetime.strptime(date, '%Y-%m-%d').date()
             )
-            serializer = self.get_serializer(creneaux, many=True)
-            return Response(serializer.data)
+            if creneaux is None:
+                return Response({'error': 'Médecin introuvable'}, status=404)
+            return Response(creneaux)
+        except ValueError:
+            return Response({'error': 'Paramètres invalides'}, status=400)
         except Exception as e:
             return Response({'error': str(e)}, status=500)
 
-class RDVViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'], url_path='calendrier')
+    def calendrier(self, request):
+        """
+        Calendrier compact d'un ou plusieurs médecins sur une période (62 jours max)
+        Paramètres : medecin ou medecins=1,2,3, specialite, debut=AAAA-MM-JJ, fin=AAAA-MM-JJ
+        Réponse : {"medecins": {id: {"nom", "prenom", "jours": {date: {"ids", "debuts", "libres"}}}}}
+        où "debuts" sont des minutes depuis minuit et "libres" une chaîne de bits ('1' = libre)
+        """
+        params = request.query_params
+        try:
+            medecins = [int(m) for m in (params.get('medecins') or params.get('medecin') or '').split(',') if m.strip()]
+            debut = datetime.strptime(params['debut'], '%Y-%m-%d').date() if params.get('debut') else datetime.now().date()
+            fin = datetime.strptime(params['fin'], '%Y-%m-%d').date() if params.get('fin') else debut + timedelta(days=6)
+        except ValueError:
+            return Response({'error': 'Paramètres invalides'}, status=400)
+
+        if not medecins and not params.get('specialite'):
+            return Response({'error': 'Médecin(s) ou spécialité requis'}, status=400)
+        if fin < debut or (fin - debut).days > 61:
+            return Response({'error': 'La période doit être comprise entre 1 et 62 jours'}, status=400)
+
+        return Response(calendrier(debut, fin, medecins=medecins, specialite=params.get('specialite')))
+
+    @action(detail=False, methods=['get'], url_path='disponibilites-mois')
+    def disponibilites_mois(self, request):
+        """
+        Nombre de créneaux libres par jour pour un médecin et un mois
+        Paramètres : medecin, mois=AAAA-MM
+        """
+        medecin_id = request.query_params.get('medecin')
+        mois = request.query_params.get('mois')
+        if not medecin_id or not mois:
+            return Response({'error': 'Médecin et mois requis'}, status=400)
+
+        try:
+            debut = datetime.strptime(mois, '%Y-%m').date()
+            medecin_id = int(medecin_id)
+        except ValueError:
+            return Response({'error': 'Paramètres invalides'}, status=400)
+        fin = (debut.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+        if disponibilites.nom_medecin(medecin_id) is None:  # rien n'est mis en cache pour un médecin inconnu
+            return Response({'error': 'Médecin introuvable'}, status=404)
+
+        compteurs = disponibilites.libres_par_jour(medecin_id, debut, fin)
+        return Response({str(jour): n for jour, n in compteurs.items()})
+
+class RDVViewSet(PlanRequetesMixin, SuiviModificationsMixin, LectureRapideMixin, viewsets.ModelViewSet):
     queryset = RDV.objects.all()
     serializer_class = RDVSerializer
+    plan_requetes = {
+        'default': Plan(select_related=('patient', 'medecin', 'creneau__medecin')),
+        'destroy': Plan(),
+    }
+    suivi_modele = 'rdv'
+    suivi_modeles = ('rdv', 'creneau', 'patient', 'medecin')
+    page_size = 100
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['patient', 'medecin', 'creneau__date']
+
+    def create(self, request, *args, **kwargs):
+        try:
+            return super().create(request, *args, **kwargs)
+        except CreneauIndisponible as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+
+    def update(self, request, *args, **kwargs):
+        try:
+            return super().update(request, *args, **kwargs)
+        except CreneauIndisponible as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+
+    def _rdv_reponse(self, rdv, code):
+        rdv = self.get_queryset().get(pk=rdv.pk)
+        return Response(self.get_serializer(rdv).data, status=code)
+
+    @action(detail=False, methods=['post'], url_path='prendre')
+    def prendre(self, request):
+        """
+        Réservation atomique d'un créneau
+        Body : {"patient": 1, "creneau": 42}
+        Retourne 409 si le créneau vient d'être pris ou est passé, 404 s'il n'existe pas
+        """
+        params = ReservationSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        try:
+            rdv = reserver_creneau(params.validated_data['patient'].pk, params.validated_data['creneau'])
+        except CreneauIntrouvable as e:
+            return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+        except CreneauIndisponible as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        return self._rdv_reponse(rdv, status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'], url_path='deplacer')
+    def deplacer(self, request, pk=None):
+        """
+        Déplace un RDV vers un autre créneau libre (l'ancien est libéré)
+        Body : {"creneau": 43}
+        Retourne 409 si le nouveau créneau vient d'être pris ou est passé, 404 s'il n'existe pas
+        """
+        rdv = self.get_object()
+        params = DeplacementRDVSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        try:
+            rdv = deplacer_rdv(rdv, params.validated_data['creneau'])
+        except CreneauIntrouvable as e:
+            return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+        except CreneauIndisponible as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        return self._rdv_reponse(rdv, status.HTTP_200_OK)
+
     @action(detail=True, methods=['patch'], url_path='confirmer')
     def confirmer(self, request, pk=None):
         """Confirmer un RDV"""
@@ -198,93 +434,182 @@ class RDVViewSet(viewsets.ModelViewSet):
         rdv.save()
         return Response({'status': 'Terminé'})
     
+    @action(detail=True, methods=['get'], url_path='espace-consultation')
+    def espace_consultation(self, request, pk=None):
+        """
+        Espace de consultation du médecin en une réponse (voir core/espace_medecin.py)
+        URL: /api/rdvs/{id}/espace-consultation/
+        """
+        contenu = espace_consultation(pk)
+        if contenu is None:
+            return Response({'error': 'RDV introuvable'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(contenu)
+
     @action(detail=False, methods=['get'], url_path='aujourdhui')
     def aujourdhui(self, request):
         """RDV du jour"""
         from datetime import date
         today = date.today()
-        rdvs = RDV.objects.filter(creneau__date=today)
-        serializer = self.get_serializer(rdvs, many=True)
-        return Response(serializer.data)
+
+        def construire(version):
+            rdvs = self.get_queryset().filter(creneau__date=today)
+            serializer = self.get_serializer(rdvs, many=True)
+            return Response(serializer.data)
+        return self.reponse_suivie(request, construire)
     
     @action(detail=False, methods=['get'], url_path='salle-attente')
     def salle_attente(self, request):
         """Patients en salle d'attente"""
-        rdvs = RDV.objects.filter(statut='CONFIRME')
-        serializer = self.get_serializer(rdvs, many=True)
-        return Response(serializer.data)
+        def construire(version):
+            rdvs = self.get_queryset().filter(statut='CONFIRME')
+            serializer = self.get_serializer(rdvs, many=True)
+            return Response(serializer.data)
+        return self.reponse_suivie(request, construire)
 
-class ConsultationViewSet(viewsets.ModelViewSet):
+class ConsultationViewSet(PlanRequetesMixin, SuiviModificationsMixin, LectureRapideMixin, viewsets.ModelViewSet):
     queryset = Consultation.objects.all()
     serializer_class = ConsultationSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    plan_requetes = {
+        'default': Plan(
+            select_related=('rdv__patient', 'medecin'),
+            prefetch_related=('consultationacte_set__acte',)
+        ),
+        'destroy': Plan(),
+    }
+    suivi_modele = 'consultation'
+    suivi_modeles = ('consultation', 'consultationacte', 'rdv', 'patient', 'medecin')
+    page_size = 50
+    filter_backends = [DjangoFilterBackend, RechercheConsultationFilter]
     filterset_fields = ['medecin', 'date_cons', 'rdv__patient', 'rdv']  # ← AJOUTEZ 'rdv'
-    search_fields = ['diagnostic', 'rdv__patient__nom_patient']
+    # indexés : core/recherche_texte.py (textes) et core/recherche.py (patient)
+    search_fields = ['diagnostic', 'ordonnance__medicaments', 'rdv__patient__nom_patient']
 
+    @action(detail=False, methods=['get'], url_path='recherche-texte')
+    def recherche_texte(self, request):
+        """
+        Recherche plein texte dans les diagnostics et les ordonnances (voir core/recherche_texte.py)
+        URL: /api/consultations/recherche-texte/?q=asthme "ventoline 2 bouffées" cortico*
+        Paramètres : medecin, debut=AAAA-MM-JJ, fin=AAAA-MM-JJ, limit (50 par défaut, 200 max)
+        Retourne les ids des consultations classées, avec leur score.
+        """
+        params = request.query_params
+        try:
+            debut = datetime.strptime(params['debut'], '%Y-%m-%d').date() if params.get('debut') else None
+            fin = datetime.strptime(params['fin'], '%Y-%m-%d').date() if params.get('fin') else None
+            medecin = int(params['medecin']) if params.get('medecin') else None
+            limite = min(int(params.get('limit', 50)), 200)
+        except ValueError:
+            return Response({'error': 'Paramètres invalides'}, status=400)
+        if limite < 1:
+            return Response({'error': 'limit doit être positif'}, status=400)
+
+        try:
+            resultats = rechercher_consultations(
+                params.get('q', ''), medecin=medecin, debut=debut, fin=fin, limite=limite
+            )
+        except RequeteInvalide:
+            return Response({'error': 'Paramètre q requis (au moins un mot cherchable)'}, status=400)
+        return Response([{'id_cons': consultation, 'score': score} for consultation, score in resultats])
 
-class ActeMedicalViewSet(viewsets.ModelViewSet):
+
+class ActeMedicalViewSet(CacheCatalogueMixin, viewsets.ModelViewSet):
     queryset = ActeMedical.objects.all()
     serializer_class = ActeMedicalSerializer
+    pagination_class = None  # petit référentiel : liste complète
     filter_backends = [filters.SearchFilter]
     search_fields = ['nom_acte']
 
 
-class ConsultationActeViewSet(viewsets.ModelViewSet):
+class ConsultationActeViewSet(PlanRequetesMixin, viewsets.ModelViewSet):
     queryset = ConsultationActe.objects.all()
     serializer_class = ConsultationActeSerializer
+    plan_requetes = {'default': Plan(select_related=('acte',))}
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['consultation', 'acte']
 
 
-class AnalyseViewSet(viewsets.ModelViewSet):
+class AnalyseViewSet(CacheCatalogueMixin, viewsets.ModelViewSet):
     queryset = Analyse.objects.all()
     serializer_class = AnalyseSerializer
+    pagination_class = None  # petit référentiel : liste complète
     filter_backends = [filters.SearchFilter]
     search_fields = ['nom_analyse']
 
 
-class RadioViewSet(viewsets.ModelViewSet):
+class RadioViewSet(CacheCatalogueMixin, viewsets.ModelViewSet):
     queryset = Radio.objects.all()
     serializer_class = RadioSerializer
+    pagination_class = None  # petit référentiel : liste complète
     filter_backends = [filters.SearchFilter]
     search_fields = ['nom_rad']
 
 
-class OrdonnanceViewSet(viewsets.ModelViewSet):
+class OrdonnanceViewSet(PlanRequetesMixin, viewsets.ModelViewSet):
     queryset = Ordonnance.objects.all()
     serializer_class = OrdonnanceSerializer
+    plan_requetes = {'default': Plan(select_related=('consultation__rdv__patient', 'consultation__medecin'))}
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['consultation', 'date_ord']
 
 
-class OrdonnanceAnalyseViewSet(viewsets.ModelViewSet):
+class OrdonnanceAnalyseViewSet(PlanRequetesMixin, viewsets.ModelViewSet):
     queryset = OrdonnanceAnalyse.objects.all()
     serializer_class = OrdonnanceAnalyseSerializer
+    plan_requetes = {'default': Plan(select_related=('analyse', 'consultation__rdv__patient', 'consultation__medecin'))}
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['consultation', 'analyse', 'date_ord']
 
 
-class OrdonnanceRadioViewSet(viewsets.ModelViewSet):
+class OrdonnanceRadioViewSet(PlanRequetesMixin, viewsets.ModelViewSet):
     queryset = OrdonnanceRadio.objects.all()
     serializer_class = OrdonnanceRadioSerializer
+    plan_requetes = {'default': Plan(select_related=('radio', 'consultation__rdv__patient', 'consultation__medecin'))}
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['consultation', 'radio', 'date_ord']
 
 
-class DossierMedicalViewSet(viewsets.ModelViewSet):
+class DossierMedicalViewSet(PlanRequetesMixin, viewsets.ModelViewSet):
     queryset = DossierMedical.objects.all()
     serializer_class = DossierMedicalSerializer
+    plan_requetes = {'default': Plan(select_related=('patient',))}
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['patient']
 
 
 # Modifiez votre FactureViewSet dans views.py pour ajouter l'action detail
 
-class FactureViewSet(viewsets.ModelViewSet):
+class FactureFilter(django_filters.FilterSet):
+    """Filtres des factures, y compris sur le montant total stocké (colonne indexée)"""
+    date_debut = django_filters.DateFilter(field_name='date_fact', lookup_expr='gte')
+    date_fin = django_filters.DateFilter(field_name='date_fact', lookup_expr='lte')
+    montant_min = django_filters.NumberFilter(field_name='montant_total', lookup_expr='gte')
+    montant_max = django_filters.NumberFilter(field_name='montant_total', lookup_expr='lte')
+
+    class Meta:
+        model = Facture
+        fields = ['consultation', 'type_facture', 'date_fact']
+
+
+class FactureViewSet(PlanRequetesMixin, LectureRapideMixin, viewsets.ModelViewSet):
     queryset = Facture.objects.all()
     serializer_class = FactureSerializer
-    filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['consultation', 'type_facture', 'date_fact']
+    page_size = 50
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_class = FactureFilter
+    ordering_fields = ['date_fact', 'montant', 'montant_total']
+    plan_requetes = {
+        'default': Plan(select_related=('consultation__rdv__patient', 'consultation__medecin')),
+        'get_detail': Plan(
+            select_related=('consultation__rdv__patient', 'consultation__medecin'),
+            prefetch_related=('consultation__consultationacte_set__acte',)
+        ),
+        'destroy': Plan(),
+    }
+
+    def get_serializer_class(self):
+        if self.action == 'get_detail':
+            return FactureDetailSerializer
+        return super().get_serializer_class()
     
     @action(detail=True, methods=['get'], url_path='detail')
     def get_detail(self, request, pk=None):
@@ -294,7 +619,7 @@ class FactureViewSet(viewsets.ModelViewSet):
         """
         try:
             facture = self.get_object()
-            serializer = FactureDetailSerializer(facture)
+            serializer = self.get_serializer(facture)
             return Response(serializer.data)
         except Facture.DoesNotExist:
             return Response(
@@ -314,59 +639,66 @@ class FactureViewSet(viewsets.ModelViewSet):
 
 # Ajoutez ces ViewSets à la fin du fichier
 
-class MaladieViewSet(viewsets.ModelViewSet):
+class MaladieViewSet(CacheCatalogueMixin, viewsets.ModelViewSet):
     queryset = Maladie.objects.all()
     serializer_class = MaladieSerializer
+    pagination_class = None  # petit référentiel : liste complète
     filter_backends = [filters.SearchFilter]
     search_fields = ['nom_malad']
 
 
-class MaladieDossierViewSet(viewsets.ModelViewSet):
+class MaladieDossierViewSet(PlanRequetesMixin, viewsets.ModelViewSet):
     queryset = MaladieDossier.objects.all()
     serializer_class = MaladieDossierSerializer
+    plan_requetes = {'default': Plan(select_related=('maladie',))}
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['dossier', 'maladie']
 
 
-class VaccinViewSet(viewsets.ModelViewSet):
+class VaccinViewSet(CacheCatalogueMixin, viewsets.ModelViewSet):
     queryset = Vaccin.objects.all()
     serializer_class = VaccinSerializer
+    pagination_class = None  # petit référentiel : liste complète
     filter_backends = [filters.SearchFilter]
     search_fields = ['nom_vacc']
 
 
-class VaccinDossierViewSet(viewsets.ModelViewSet):
+class VaccinDossierViewSet(PlanRequetesMixin, viewsets.ModelViewSet):
     queryset = VaccinDossier.objects.all()
     serializer_class = VaccinDossierSerializer
+    plan_requetes = {'default': Plan(select_related=('vaccin',))}
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['dossier', 'vaccin']
 
 
-class AllergieViewSet(viewsets.ModelViewSet):
+class AllergieViewSet(CacheCatalogueMixin, viewsets.ModelViewSet):
     queryset = Allergie.objects.all()
     serializer_class = AllergieSerializer
+    pagination_class = None  # petit référentiel : liste complète
     filter_backends = [filters.SearchFilter]
     search_fields = ['nom_allerg']
 
 
-class AllergieDossierViewSet(viewsets.ModelViewSet):
+class AllergieDossierViewSet(PlanRequetesMixin, viewsets.ModelViewSet):
     queryset = AllergieDossier.objects.all()
     serializer_class = AllergieDossierSerializer
+    plan_requetes = {'default': Plan(select_related=('allergie',))}
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['dossier', 'allergie']
 
 
 
 
-class JourTravailViewSet(viewsets.ModelViewSet):
+class JourTravailViewSet(PlanRequetesMixin, viewsets.ModelViewSet):
     queryset = JourTravail.objects.all()
     serializer_class = JourTravailSerializer
+    plan_requetes = {'default': Plan(select_related=('medecin',))}
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['medecin', 'date']
     
     def create(self, request, *args, **kwargs):
         """
-        Crée un jour de travail ET génère les créneaux de 30 minutes
+        Crée un jour de travail ET génère ses créneaux (duree_creneau minutes, 30 par défaut)
         """
         try:
             # Valider les données
@@ -374,35 +706,9 @@ class JourTravailViewSet(viewsets.ModelViewSet):
             serializer.is_valid(raise_exception=True)
             
             # Sauvegarder le jour de travail
+            # (le signal post_save génère les créneaux en un seul INSERT groupé)
             jour_travail = serializer.save()
-            
-            # Générer les créneaux manuellement
-            heure = jour_travail.heure_debut
-            date = jour_travail.date
-            heure_fin = jour_travail.heure_fin
-            duree_delta = timedelta(minutes=30)
-            
-            creneaux_crees = 0
-            while heure < heure_fin:
-                datetime_debut = datetime.combine(date, heure)
-                datetime_fin = datetime_debut + duree_delta
-                heure_fin_creneau = datetime_fin.time()
-                
-                # Ne pas créer de créneau si ça dépasse l'heure de fin
-                if heure_fin_creneau > heure_fin:
-                    break
-                
-                # Créer le créneau
-                Creneau.objects.create(
-                    medecin=jour_travail.medecin,
-                    date=date,
-                    heure_debut=heure,
-                    heure_fin=heure_fin_creneau,
-                    libre=True
-                )
-                
-                creneaux_crees += 1
-                heure = heure_fin_creneau
+            creneaux_crees = getattr(jour_travail, 'creneaux_crees', 0)
             
             # Préparer la réponse avec le nombre de créneaux créés
             response_data = serializer.data
@@ -423,48 +729,24 @@ class JourTravailViewSet(viewsets.ModelViewSet):
     
     def update(self, request, *args, **kwargs):
         """
-        Modifie un jour de travail et régénère les créneaux
+        Modifie un jour de travail et régénère les créneaux de sa plage
+        (les autres plages du même jour ne sont pas touchées)
         """
         try:
             partial = kwargs.pop('partial', False)
             instance = self.get_object()
-            
-            # Supprimer les anciens créneaux LIBRES uniquement
-            Creneau.objects.filter(
-                medecin=instance.medecin,
-                date=instance.date,
-                libre=True
-            ).delete()
-            
             serializer = self.get_serializer(instance, data=request.data, partial=partial)
             serializer.is_valid(raise_exception=True)
-            self.perform_update(serializer)
-            
-            # Régénérer les créneaux manuellement après modification
-            jour_travail = serializer.instance
-            heure = jour_travail.heure_debut
-            date = jour_travail.date
-            heure_fin = jour_travail.heure_fin
-            duree_delta = timedelta(minutes=30)
-            
-            while heure < heure_fin:
-                datetime_debut = datetime.combine(date, heure)
-                datetime_fin = datetime_debut + duree_delta
-                heure_fin_creneau = datetime_fin.time()
-                
-                if heure_fin_creneau > heure_fin:
-                    break
-                
-                Creneau.objects.create(
-                    medecin=jour_travail.medecin,
-                    date=date,
-                    heure_debut=heure,
-                    heure_fin=heure_fin_creneau,
-                    libre=True
-                )
-                
-                heure = heure_fin_creneau
-            
+
+            with transaction.atomic():
+                # Supprimer les anciens créneaux LIBRES de la plage uniquement
+                supprimer_creneaux_libres(JourTravail.objects.select_for_update().get(pk=instance.pk))
+                self.perform_update(serializer)
+
+                # Régénérer les créneaux après modification (un seul INSERT groupé ;
+                # les créneaux réservés sont conservés et les nouveaux ne les chevauchent pas)
+                generer_creneaux_jour(serializer.instance)
+
             return Response(serializer.data)
             
         except Exception as e:
@@ -480,12 +762,8 @@ class JourTravailViewSet(viewsets.ModelViewSet):
         try:
             instance = self.get_object()
             
-            # Vérifier s'il y a des créneaux déjà réservés
-            creneaux_pris = Creneau.objects.filter(
-                medecin=instance.medecin,
-                date=instance.date,
-                libre=False
-            ).count()
+            # Vérifier s'il y a des créneaux déjà réservés dans la plage
+            creneaux_pris = creneaux_plage(instance).filter(libre=False).count()
             
             if creneaux_pris > 0:
                 return Response(
@@ -504,7 +782,86 @@ class JourTravailViewSet(viewsets.ModelViewSet):
                 {'error': str(e)}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
+
+
+class ModeleHoraireViewSet(PlanRequetesMixin, viewsets.ModelViewSet):
+    queryset = ModeleHoraire.objects.all()
+    serializer_class = ModeleHoraireSerializer
+    plan_requetes = {'default': Plan(select_related=('medecin',))}
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['medecin', 'actif']
+
+    def _publier(self, request, modeles):
+        params = PublicationHoraireSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+
+        if data['medecins']:
+            modeles = modeles.filter(medecin_id__in=data['medecins'])
+
+        resultat = materialiser_modeles(
+            list(modeles),
+            data['date_debut'],
+            data['date_fin'],
+            exclusions=data['exclusions']
+        )
+        return Response(resultat, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'], url_path='publier')
+    def publier(self, request, pk=None):
+        """
+        Matérialise ce modèle horaire sur une période
+        Body : {"date_debut": "2026-01-01", "date_fin": "2026-03-31", "exclusions": ["2026-01-11"]}
+        """
+        modele = self.get_object()
+        return self._publier(request, ModeleHoraire.objects.filter(pk=modele.pk))
+
+    @action(detail=False, methods=['post'], url_path='publier', url_name='publier-tous')
+    def publier_tous(self, request):
+        """
+        Matérialise tous les modèles actifs (de tous les médecins, ou de la liste
+        "medecins" du body) sur une période, en une seule transaction
+        """
+        return self._publier(request, ModeleHoraire.objects.filter(actif=True))
+
+
+class FermetureViewSet(viewsets.ModelViewSet):
+    queryset = Fermeture.objects.all()
+    serializer_class = FermetureSerializer
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['medecin', 'date']
+    ordering_fields = ['date']
+
+
+class RechercheGlobaleView(APIView):
+    """
+    Recherche dans toutes les entités : search/?q=&limit=
+    Champs cherchés : search_fields de chaque ViewSet (core/recherche_globale.py)
+    """
+    permission_classes = [IsAuthenticated]
+    sources = [
+        recherche_globale.SourcePatients('patients', PatientViewSet),
+        recherche_globale.SourceCatalogue('medecins', MedecinViewSet),
+        recherche_globale.SourceCatalogue('actes', ActeMedicalViewSet),
+        recherche_globale.SourceCatalogue('analyses', AnalyseViewSet),
+        recherche_globale.SourceCatalogue('radios', RadioViewSet),
+        recherche_globale.SourceCatalogue('maladies', MaladieViewSet),
+        recherche_globale.SourceCatalogue('vaccins', VaccinViewSet),
+    ]
+
+    def get(self, request):
+        q = request.query_params.get('q', '').strip()
+        if not jetons_requete(q):
+            return Response(
+                {'error': 'Paramètre q requis (au moins un mot de 2 caractères)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limite = min(int(request.query_params.get('limit', recherche_globale.RESULTATS_PAR_GROUPE)), 20)
+        except ValueError:
+            return Response({'error': 'limit doit être un entier'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'q': q, **recherche_globale.rechercher(q, self.sources, max(limite, 1))})
+
 
 # core/views_auth.py
 # Créez ce nouveau fichier
@@ -669,16 +1026,18 @@ from .models import OrganismeAssurance, PatientOrganisme
 from .serializers import OrganismeAssuranceSerializer, PatientOrganismeSerializer
 
 # Ajoutez ces ViewSets à la fin du fichier
-class OrganismeAssuranceViewSet(viewsets.ModelViewSet):
+class OrganismeAssuranceViewSet(CacheCatalogueMixin, viewsets.ModelViewSet):
     queryset = OrganismeAssurance.objects.all()
     serializer_class = OrganismeAssuranceSerializer
+    pagination_class = None  # petit référentiel : liste complète
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['nom_org', 'type_org']
     search_fields = ['nom_org']
 
 
-class PatientOrganismeViewSet(viewsets.ModelViewSet):
+class PatientOrganismeViewSet(PlanRequetesMixin, viewsets.ModelViewSet):
     queryset = PatientOrganisme.objects.all()
     serializer_class = PatientOrganismeSerializer
+    plan_requetes = {'default': Plan(select_related=('organisme',))}
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['patient', 'organisme']
\ No newline at end of file
@@ -5,6 +5,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from django.contrib.auth import get_user_model
+from .statistiques import statistiques
 from .serializers_user import (
     UserSerializer, CreateUserSerializer, UpdateUserSerializer,
     ResetPasswordSerializer, RegisterStaffSerializer
@@ -30,8 +31,14 @@ class UserViewSet(viewsets.ModelViewSet):
             return UpdateUserSerializer
         return UserSerializer
     
+    page_size = 50
+    cursor_ordering = ('-date_joined', '-id')
+    
     def list(self, request):
-        users = User.objects.all().order_by('-date_joined')
+        users = User.objects.all().order_by('-date_joined', '-id')
+        page = self.paginate_queryset(users)
+        if page is not None:
+            return self.get_paginated_response(UserSerializer(page, many=True).data)
         serializer = UserSerializer(users, many=True)
         return Response(serializer.data)
     
@@ -136,4 +143,12 @@ class RegisterStaffView(APIView):
                 'message': f'{user.role} créé avec succès'
             }, status=status.HTTP_201_CREATED)
         
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class StatsView(APIView):
+    """Statistiques agrégées du tableau de bord administrateur"""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    
+    def get(self, request):
+        return Response(statistiques())
@@ -6,6 +6,9 @@ import sys
 
 def main():
     """Run administrative tasks."""
+    if len(sys.argv) > 1 and sys.argv[1] == 'test':
+        # Tests et benchmarks sur SQLite en mémoire (cabinet_medical/settings_test.py)
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cabinet_medical.settings_test')
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cabinet_medical.settings')
     try:
         from django.core.management import execute_from_command_line
@@ -18,15 +18,12 @@ function DossierMedicalDetail({ open, onClose, dossier }) {
 
   const fetchDetails = async () => {
     try {
-      const [maladiesRes, vaccinsRes, allergiesRes] = await Promise.all([
-        api.get(`http://127.0.0.1:8000/api/maladie-dossiers/?dossier=${dossier.id_dossier}`),
-        api.get(`http://127.0.0.1:8000/api/vaccin-dossiers/?dossier=${dossier.id_dossier}`),
-        api.get(`http://127.0.0.1:8000/api/allergie-dossiers/?dossier=${dossier.id_dossier}`)
-      ]);
+      // Dossier complet du patient en une requête
+      const response = await api.get(`http://127.0.0.1:8000/api/patients/${dossier.patient}/bundle/`);
       
-      setMaladies(maladiesRes.data);
-      setVaccins(vaccinsRes.data);
-      setAllergies(allergiesRes.data);
+      setMaladies(response.data.maladies);
+      setVaccins(response.data.vaccins);
+      setAllergies(response.data.allergies);
     } catch (error) {
       console.error('Erreur lors du chargement des détails:', error);
     }
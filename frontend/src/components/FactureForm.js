@@ -42,7 +42,7 @@ function FactureForm({ open, onClose, onSuccess }) {
 
   const calculerMontantTotal = async () => {
     try {
-      const consultationRes = await api.get(`consultations/${formData.consultation}/`);
+      const consultationRes = await api.get(`consultations/${formData.consultation}/?expand=actes_list`);
       const consultation = consultationRes.data;
       
       // Récupérer les actes médicaux de cette consultation
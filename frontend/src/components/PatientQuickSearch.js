@@ -0,0 +1,94 @@
+import React, { useEffect, useRef, useState } from 'react';
+import { Autocomplete, TextField, Box, Typography, CircularProgress } from '@mui/material';
+import { patientService } from '../services/api';
+
+const DELAI_FRAPPE = 150; // ms sans frappe avant d'interroger l'API
+
+// Recherche rapide d'un patient (nom, prénom, CIN ou téléphone) par patients/suggestions/
+function PatientQuickSearch({ onSelect, label = 'Rechercher un patient', autoFocus = false }) {
+  const [saisie, setSaisie] = useState('');
+  const [options, setOptions] = useState([]);
+  const [chargement, setChargement] = useState(false);
+  const requeteEnCours = useRef(null);
+
+  useEffect(() => {
+    const q = saisie.trim();
+    if (q.length < 2) {
+      setOptions([]);
+      return undefined;
+    }
+
+    const minuterie = setTimeout(async () => {
+      // Une seule requête en vol : la frappe précédente est annulée
+      if (requeteEnCours.current) {
+        requeteEnCours.current.abort();
+      }
+      const controleur = new AbortController();
+      requeteEnCours.current = controleur;
+      setChargement(true);
+      try {
+        const response = await patientService.suggestions(q, controleur.signal);
+        // Réponse d'une saisie dépassée : ignorée
+        if (response.data.q === q && requeteEnCours.current === controleur) {
+          setOptions(response.data.resultats);
+        }
+      } catch (error) {
+        if (error.name !== 'CanceledError') {
+          console.error('Erreur lors de la recherche du patient:', error);
+        }
+      } finally {
+        if (requeteEnCours.current === controleur) {
+          setChargement(false);
+        }
+      }
+    }, DELAI_FRAPPE);
+
+    return () => clearTimeout(minuterie);
+  }, [saisie]);
+
+  useEffect(() => () => requeteEnCours.current?.abort(), []);
+
+  return (
+    <Autocomplete
+      options={options}
+      filterOptions={(x) => x}
+      loading={chargement}
+      noOptionsText={saisie.trim().length < 2 ? 'Tapez au moins 2 caractères' : 'Aucun patient trouvé'}
+      getOptionLabel={(option) => `${option.nom_patient} ${option.prenom_patient}`}
+      isOptionEqualToValue={(option, value) => option.id_patient === value.id_patient}
+      onInputChange={(e, nouvelleSaisie) => setSaisie(nouvelleSaisie)}
+      onChange={(e, patient) => patient && onSelect && onSelect(patient)}
+      renderOption={(props, option) => (
+        <Box component="li" {...props} key={option.id_patient}>
+          <Box>
+            <Typography variant="body1">
+              {option.nom_patient} {option.prenom_patient}
+            </Typography>
+            <Typography variant="body2" color="text.secondary">
+              CIN : {option.cin} — Né(e) le {new Date(option.date_naissance).toLocaleDateString('fr-FR')}
+            </Typography>
+          </Box>
+        </Box>
+      )}
+      renderInput={(params) => (
+        <TextField
+          {...params}
+          label={label}
+          placeholder="Nom, prénom, CIN ou téléphone..."
+          autoFocus={autoFocus}
+          InputProps={{
+            ...params.InputProps,
+            endAdornment: (
+              <>
+                {chargement ? <CircularProgress color="inherit" size={20} /> : null}
+                {params.InputProps.endAdornment}
+              </>
+            ),
+          }}
+        />
+      )}
+    />
+  );
+}
+
+export default PatientQuickSearch;
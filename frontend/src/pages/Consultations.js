@@ -89,7 +89,7 @@ function Consultations() {
                   </TableCell>
                   <TableCell>{consultation.date_cons}</TableCell>
                   <TableCell>{consultation.prix_cons} MAD</TableCell>
-                  <TableCell>{consultation.actes_list?.length || 0}</TableCell>
+                  <TableCell>{consultation.nb_actes}</TableCell>
                   <TableCell>
                     <IconButton size="small" color="primary">
                       <VisibilityIcon />
@@ -62,7 +62,7 @@ function DashboardPatient() {
         setPatient(patientData);
         
         console.log('🔍 Recherche des RDV pour le patient ID:', patientData.id_patient);
-        const rdvsResponse = await api.get(`http://127.0.0.1:8000/api/rdvs/?patient=${patientData.id_patient}`);
+        const rdvsResponse = await api.get(`http://127.0.0.1:8000/api/rdvs/?patient=${patientData.id_patient}&expand=creneau_details`);
         console.log('📅 RDV bruts reçus de l\'API:', rdvsResponse.data);
         // 🔍 TEST DE PARSING DE DATE
         console.log('═══════════════════════════════════════');
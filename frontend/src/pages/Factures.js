@@ -3,7 +3,7 @@ import {
   Paper, Table, TableBody, TableCell, TableContainer,
   TableHead, TableRow, Typography, Button, Box, Chip, IconButton
 } from '@mui/material';
-import { factureService } from '../services/api';
+import api, { factureService } from '../services/api';
 import AddIcon from '@mui/icons-material/Add';
 import PrintIcon from '@mui/icons-material/Print';
 import DeleteIcon from '@mui/icons-material/Delete';
@@ -46,8 +46,8 @@ function Factures() {
       const consultationResponse = await fetch(`http://127.0.0.1:8000/api/consultations/${facture.consultation}/`);
       const consultation = await consultationResponse.json();
       
-      const actesResponse = await fetch(`http://127.0.0.1:8000/api/consultation-actes/?consultation=${facture.consultation}`);
-      const actes = await actesResponse.json();
+      // Liste paginée : api suit les liens de l'en-tête Link
+      const { data: actes } = await api.get(`consultation-actes/?consultation=${facture.consultation}`);
       
       let totalActes = 0;
       let lignesActes = '';
@@ -284,7 +284,7 @@ function MonDossier() {
         }
       }
       
-      const rdvsResponse = await api.get(`http://127.0.0.1:8000/api/rdvs/?patient=${patientData.id_patient}`);
+      const rdvsResponse = await api.get(`http://127.0.0.1:8000/api/rdvs/?patient=${patientData.id_patient}&expand=creneau_details`);
       const rdvIds = rdvsResponse.data.map(rdv => rdv.id);
       
       if (rdvIds.length > 0) {
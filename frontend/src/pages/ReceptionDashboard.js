@@ -24,6 +24,7 @@ import {
 } from '@mui/icons-material';
 import { useNavigate } from 'react-router-dom';
 import receptionService from '../services/receptionService';
+import { abonnerEvenements } from '../services/evenements';
 
 function ReceptionDashboard() {
   const navigate = useNavigate();
@@ -39,9 +40,8 @@ function ReceptionDashboard() {
 
   useEffect(() => {
     loadDashboardData();
-    // Refresh toutes les 30 secondes
-    const interval = setInterval(loadDashboardData, 30000);
-    return () => clearInterval(interval);
+    // Rechargement à chaque changement de RDV poussé par le serveur
+    return abonnerEvenements(['rdv'], loadDashboardData, 30000);
   }, []);
 
   const loadDashboardData = async () => {
@@ -33,6 +33,7 @@ import {
   Refresh
 } from '@mui/icons-material';
 import receptionService from '../services/receptionService';
+import { abonnerEvenements } from '../services/evenements';
 import { useNavigate } from 'react-router-dom';
 
 function SalleAttente() {
@@ -47,9 +48,8 @@ function SalleAttente() {
 
   useEffect(() => {
     loadData();
-    // Auto-refresh toutes les 20 secondes
-    const interval = setInterval(loadData, 20000);
-    return () => clearInterval(interval);
+    // Rechargement à chaque changement de RDV poussé par le serveur
+    return abonnerEvenements(['rdv'], loadData, 20000);
   }, []);
 
   const loadData = async () => {
@@ -26,27 +26,15 @@ const Dashboard = () => {
   const fetchDashboardData = async () => {
     try {
       setLoading(true);
-      const [patientsRes, medecinsRes, rdvRes, consultationsRes] = await Promise.all([
-        api.get('patients/'),
-        api.get('medecins/'),
-        api.get('rdvs/'),
-        api.get('consultations/')
-      ]);
-
-      let pendingUsers = 0;
-      try {
-        const usersRes = await api.get('users/');
-        pendingUsers = usersRes.data.filter(u => !u.is_active && u.role !== 'PATIENT').length;
-      } catch (err) {
-        console.log('Endpoint users non disponible');
-      }
+      // Une seule requête : comptages calculés côté serveur (COUNT / GROUP BY)
+      const statsRes = await api.get('stats/');
 
       setStats({
-        patients: patientsRes.data.length,
-        medecins: medecinsRes.data.length,
-        rendezvous: rdvRes.data.length,
-        consultations: consultationsRes.data.length,
-        pendingApprovals: pendingUsers
+        patients: statsRes.data.patients,
+        medecins: statsRes.data.medecins,
+        rendezvous: statsRes.data.rendezvous.total,
+        consultations: statsRes.data.consultations,
+        pendingApprovals: statsRes.data.comptes_en_attente
       });
       setLoading(false);
     } catch (err) {
@@ -57,6 +57,8 @@ function ConsultationPatient() {
   const [dossier, setDossier] = useState(null);
   const [medecin, setMedecin] = useState(null);
   const [consultationsPassees, setConsultationsPassees] = useState([]);
+  const [suivi, setSuivi] = useState([]);
+  const [consultationRdv, setConsultationRdv] = useState(null);
   
   // Listes pour les autocomplete
   const [medicamentsList, setMedicamentsList] = useState([]);
@@ -104,49 +106,42 @@ function ConsultationPatient() {
     try {
       setLoading(true);
       
-      // RDV
-      const rdvResponse = await api.get(`http://127.0.0.1:8000/api/rdvs/${rdvId}/`);
-      setRdv(rdvResponse.data);
-      
-      // Patient
-      const patientResponse = await api.get(`http://127.0.0.1:8000/api/patients/${rdvResponse.data.patient}/`);
-      setPatient(patientResponse.data);
+      // Espace de consultation : RDV, patient, dossier, allergies, consultation, historique et suivi en une requête
+      const espaceResponse = await api.get(`http://127.0.0.1:8000/api/rdvs/${rdvId}/espace-consultation/`);
+      const espace = espaceResponse.data;
+      setRdv(espace.rdv);
+      setPatient(espace.patient);
       
       // Médecin
       const medecinResponse = await api.get(`http://127.0.0.1:8000/api/medecins/?email=${user.email}`);
       setMedecin(medecinResponse.data[0]);
       
       // Dossier médical
-      try {
-        const dossierResponse = await api.get(`http://127.0.0.1:8000/api/dossiers/?patient=${rdvResponse.data.patient}`);
-        if (dossierResponse.data.length > 0) {
-          const dossierData = dossierResponse.data[0];
-          setDossier(dossierData);
-          setDossierForm({
-            poids: dossierData.poids || '',
-            taille: dossierData.taille || '',
-            tension_arterielle: dossierData.tension_arterielle || '',
-            antecedents_medicaux: dossierData.antecedents_medicaux || '',
-            antecedents_chirurgicaux: dossierData.antecedents_chirurgicaux || '',
-            antecedents_familiaux: dossierData.antecedents_familiaux || ''
-          });
-        }
-      } catch (err) {
-        console.warn('Dossier non trouvé');
+      if (espace.dossier) {
+        const dossierData = espace.dossier;
+        setDossier(dossierData);
+        setDossierForm({
+          poids: dossierData.poids || '',
+          taille: dossierData.taille || '',
+          tension_arterielle: dossierData.tension_arterielle || '',
+          antecedents_medicaux: dossierData.antecedents_medicaux || '',
+          antecedents_chirurgicaux: dossierData.antecedents_chirurgicaux || '',
+          antecedents_familiaux: dossierData.antecedents_familiaux || ''
+        });
       }
       
-      // Consultations passées
-      try {
-        const rdvsPatient = await api.get(`http://127.0.0.1:8000/api/rdvs/?patient=${rdvResponse.data.patient}`);
-        const consultationsPromises = rdvsPatient.data.map(r => 
-          api.get(`http://127.0.0.1:8000/api/consultations/?rdv=${r.id}`)
-        );
-        const consultationsResults = await Promise.all(consultationsPromises);
-        const allConsultations = consultationsResults.flatMap(res => res.data);
-        setConsultationsPassees(allConsultations);
-      } catch (err) {
-        console.warn('Erreur consultations passées');
-      }
+      // Consultation déjà enregistrée pour ce RDV et chaîne de suivi : déjà dans l'espace
+      setConsultationRdv(espace.consultation ? {
+        consultation: espace.consultation,
+        ordonnances: espace.ordonnances,
+        analyses: espace.ordonnances_analyses,
+        radios: espace.ordonnances_radios
+      } : null);
+      // Consultations précédentes du patient (les plus récentes d'abord) et chaîne de suivi du RDV
+      setConsultationsPassees(espace.historique);
+      setSuivi(
+        espace.suivi.filter(cons => !espace.consultation || cons.id_cons !== espace.consultation.id_cons)
+      );
       
       // Listes pour autocomplete
       const actesResponse = await api.get('http://127.0.0.1:8000/api/actes/');
@@ -348,6 +343,28 @@ function ConsultationPatient() {
           </CardContent>
         </Card>
 
+        {/* Consultation déjà enregistrée pour ce RDV */}
+        {consultationRdv && (
+          <Alert severity="warning" sx={{ mb: 3 }}>
+            <Typography variant="subtitle2">
+              Consultation déjà enregistrée le {new Date(consultationRdv.consultation.date_cons).toLocaleDateString('fr-FR')}
+              {' '}({consultationRdv.consultation.montant_total} DH)
+            </Typography>
+            <Typography variant="body2">{consultationRdv.consultation.diagnostic}</Typography>
+            {consultationRdv.ordonnances.map(ord => (
+              <Typography key={ord.id_ordonnance} variant="body2">💊 {ord.medicaments}</Typography>
+            ))}
+            <Box sx={{ mt: 1, display: 'flex', gap: 1, flexWrap: 'wrap' }}>
+              {consultationRdv.analyses.map(ord => (
+                <Chip key={`analyse-${ord.id}`} size="small" label={ord.analyse_nom} />
+              ))}
+              {consultationRdv.radios.map(ord => (
+                <Chip key={`radio-${ord.id}`} size="small" label={ord.radio_nom} />
+              ))}
+            </Box>
+          </Alert>
+        )}
+
         {/* Consultations passées */}
         {consultationsPassees.length > 0 && (
           <Accordion sx={{ mb: 3 }}>
@@ -361,14 +378,16 @@ function ConsultationPatient() {
                 <TableHead>
                   <TableRow>
                     <TableCell>Date</TableCell>
+                    <TableCell>Médecin</TableCell>
                     <TableCell>Diagnostic</TableCell>
                     <TableCell>Traitement</TableCell>
                   </TableRow>
                 </TableHead>
                 <TableBody>
-                  {consultationsPassees.map((cons, index) => (
-                    <TableRow key={index}>
+                  {consultationsPassees.map(cons => (
+                    <TableRow key={cons.id_cons}>
                       <TableCell>{new Date(cons.date_cons).toLocaleDateString('fr-FR')}</TableCell>
+                      <TableCell>Dr. {cons.medecin_nom} {cons.medecin_prenom}</TableCell>
                       <TableCell>{cons.diagnostic}</TableCell>
                       <TableCell>{cons.traitement}</TableCell>
                     </TableRow>
@@ -379,6 +398,39 @@ function ConsultationPatient() {
           </Accordion>
         )}
 
+        {/* Suivi : consultation initiale et consultations de contrôle */}
+        {suivi.length > 0 && (
+          <Accordion sx={{ mb: 3 }}>
+            <AccordionSummary expandIcon={<ExpandMore />}>
+              <Typography variant="h6">
+                🔁 Suivi ({suivi.length})
+              </Typography>
+            </AccordionSummary>
+            <AccordionDetails>
+              <Table size="small">
+                <TableHead>
+                  <TableRow>
+                    <TableCell>Date</TableCell>
+                    <TableCell>Médecin</TableCell>
+                    <TableCell>Diagnostic</TableCell>
+                    <TableCell>Actes</TableCell>
+                  </TableRow>
+                </TableHead>
+                <TableBody>
+                  {suivi.map(cons => (
+                    <TableRow key={cons.id_cons}>
+                      <TableCell>{new Date(cons.date_cons).toLocaleDateString('fr-FR')}</TableCell>
+                      <TableCell>Dr. {cons.medecin_nom} {cons.medecin_prenom}</TableCell>
+                      <TableCell>{cons.diagnostic}</TableCell>
+                      <TableCell>{cons.nb_actes}</TableCell>
+                    </TableRow>
+                  ))}
+                </TableBody>
+              </Table>
+            </AccordionDetails>
+          </Accordion>
+        )}
+
         {/* Step 0: Confirmer RDV */}
         {activeStep === 0 && (
           <Paper sx={{ p: 3 }}>
@@ -67,7 +67,7 @@ function MesRendezVous() {
       const patientId = patientsResponse.data[0].id_patient;
       
       // Récupérer tous les RDV du patient
-      const rdvsResponse = await api.get(`http://127.0.0.1:8000/api/rdvs/?patient=${patientId}`);
+      const rdvsResponse = await api.get(`http://127.0.0.1:8000/api/rdvs/?patient=${patientId}&expand=creneau_details`);
       
       setRdvs(rdvsResponse.data);
       setLoading(false);
@@ -280,88 +280,41 @@ function MonDossier() {
       console.log('🔍 Début du chargement du dossier médical');
       console.log('👤 CIN:', user.cin);
       
-      // 1. Récupérer les infos du patient
-      const patientsResponse = await api.get(`http://127.0.0.1:8000/api/patients/?cin=${user.cin}`);
-      console.log('📋 Patients trouvés:', patientsResponse.data);
-      
-      if (!patientsResponse.data || patientsResponse.data.length === 0) {
-        setError('Patient introuvable');
-        setLoading(false);
-        return;
-      }
-      
-      const patientData = patientsResponse.data[0];
-      setPatient(patientData);
-      console.log('✅ Patient chargé:', patientData.prenom_patient, patientData.nom_patient);
-      // Dans fetchDossierMedical(), après setPatient(patientData);
-try {
-  const patientOrganismeResponse = await api.get(`http://127.0.0.1:8000/api/patient-organismes/?patient=${patientData.id_patient}`);
-  
-  if (patientOrganismeResponse.data && patientOrganismeResponse.data.length > 0) {
-    const organismeData = patientOrganismeResponse.data[0];
-    setPatient({
-      ...patientData,
-      organisme_nom: organismeData.organisme_nom,
-      organisme_type: organismeData.organisme_type
-    });
-    console.log('✅ Organisme chargé:', organismeData.organisme_nom);
-  }
-} catch (err) {
-  console.warn('⚠️ Pas d\'organisme d\'assurance');
-}
-      
-      // 2. Récupérer le dossier médical
+      // 1. Dossier complet en une requête : patient, organismes, dossier, maladies, allergies, vaccins
+      let bundleResponse;
       try {
-        const dossiersResponse = await api.get(`http://127.0.0.1:8000/api/dossiers/?patient=${patientData.id_patient}`);
-        console.log('📁 Dossiers trouvés:', dossiersResponse.data);
-        
-        if (dossiersResponse.data && dossiersResponse.data.length > 0) {
-          const dossierData = dossiersResponse.data[0];
-          setDossier(dossierData);
-          
-          const dossierId = dossierData.id_dossier || dossierData.id_dm || dossierData.id;
-          console.log('✅ Dossier médical chargé, ID:', dossierId);
-          
-          // 3. Récupérer les maladies
-          try {
-            if (dossierId) {
-              const maladiesResponse = await api.get(`http://127.0.0.1:8000/api/maladie-dossiers/?dossier=${dossierId}`);
-              setMaladies(maladiesResponse.data);
-              console.log('✅ Maladies chargées:', maladiesResponse.data.length);
-            }
-          } catch (err) {
-            console.warn('⚠️ Erreur maladies:', err.message);
-          }
-          
-          // 4. Récupérer les allergies
-          try {
-            if (dossierId) {
-              const allergiesResponse = await api.get(`http://127.0.0.1:8000/api/allergie-dossiers/?dossier=${dossierId}`);
-              setAllergies(allergiesResponse.data);
-              console.log('✅ Allergies chargées:', allergiesResponse.data.length);
-            }
-          } catch (err) {
-            console.warn('⚠️ Erreur allergies:', err.message);
-          }
-          
-          // 5. Récupérer les vaccins
-          try {
-            if (dossierId) {
-              const vaccinsResponse = await api.get(`http://127.0.0.1:8000/api/vaccin-dossiers/?dossier=${dossierId}`);
-              setVaccins(vaccinsResponse.data);
-              console.log('✅ Vaccins chargés:', vaccinsResponse.data.length);
-            }
-          } catch (err) {
-            console.warn('⚠️ Erreur vaccins:', err.message);
-          }
-        }
+        bundleResponse = await api.get(`http://127.0.0.1:8000/api/patients/bundle/?cin=${user.cin}`);
       } catch (err) {
-        console.warn('⚠️ Erreur dossiers:', err.message);
+        if (err.response && err.response.status === 404) {
+          setError('Patient introuvable');
+          setLoading(false);
+          return;
+        }
+        throw err;
+      }
+      const bundle = bundleResponse.data;
+      console.log('📋 Dossier complet:', bundle);
+
+      const patientData = bundle.patient;
+      const organismeData = bundle.organismes[0];
+      setPatient(organismeData ? {
+        ...patientData,
+        organisme_nom: organismeData.organisme_nom,
+        organisme_type: organismeData.organisme_type
+      } : patientData);
+      console.log('✅ Patient chargé:', patientData.prenom_patient, patientData.nom_patient);
+
+      if (bundle.dossier) {
+        setDossier(bundle.dossier);
+        setMaladies(bundle.maladies);
+        setAllergies(bundle.allergies);
+        setVaccins(bundle.vaccins);
+        console.log('✅ Dossier médical chargé, ID:', bundle.dossier.id_dossier);
       }
       
-      // 6. Récupérer les RDV
+      // 2. Récupérer les RDV
       try {
-        const rdvsResponse = await api.get(`http://127.0.0.1:8000/api/rdvs/?patient=${patientData.id_patient}`);
+        const rdvsResponse = await api.get(`http://127.0.0.1:8000/api/rdvs/?patient=${patientData.id_patient}&expand=creneau_details`);
         console.log('📅 RDV trouvés:', rdvsResponse.data.length);
         
         const rdvsVerifies = rdvsResponse.data.filter(rdv => 
@@ -372,7 +325,7 @@ try {
         if (rdvsVerifies.length > 0) {
           const rdvIds = rdvsVerifies.map(rdv => rdv.id);
           
-          // 7. Récupérer les consultations
+          // 3. Récupérer les consultations
           const allConsultations = [];
           for (const rdvId of rdvIds) {
             try {
@@ -395,7 +348,7 @@ try {
           setConsultations(uniqueConsultations);
           console.log('✅ Consultations chargées:', uniqueConsultations.length);
           
-          // 8. Récupérer les ordonnances et factures
+          // 4. Récupérer les ordonnances et factures
           if (allConsultations.length > 0) {
             const allOrdonnances = [];
             const allOrdonnancesAnalyses = [];
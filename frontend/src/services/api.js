@@ -9,6 +9,33 @@ const api = axios.create({
   },
 });
 
+// Listes paginées par curseur (core/pagination.py) : la page suivante est
+// annoncée dans l'en-tête Link (rel="next"). Les pages sont suivies jusqu'à la
+// dernière et concaténées, sauf si l'appelant demande lui-même une page
+// (?page_size= ou ?cursor=).
+const lienSuivant = (response) => {
+  const lien = (response.headers.link || '').split(',').find((l) => l.includes('rel="next"'));
+  return lien ? lien.slice(lien.indexOf('<') + 1, lien.indexOf('>')) : null;
+};
+
+const pageDemandee = (config) =>
+  /[?&](page_size|cursor)=/.test(config.url || '') ||
+  ['page_size', 'cursor'].some((param) => config.params && param in config.params);
+
+api.interceptors.response.use(async (response) => {
+  if (!Array.isArray(response.data) || pageDemandee(response.config)) return response;
+  const lignes = [...response.data];
+  let suivant = lienSuivant(response);
+  while (suivant) {
+    // Le lien porte ?cursor= : chaque page suivante n'est pas suivie à nouveau
+    const page = await api.get(suivant, { signal: response.config.signal });
+    lignes.push(...page.data);
+    suivant = lienSuivant(page);
+  }
+  response.data = lignes;
+  return response;
+});
+
 // Services pour chaque modèle
 export const patientService = {
   getAll: () => api.get('patients/'),
@@ -16,6 +43,8 @@ export const patientService = {
   create: (data) => api.post('patients/', data),
   update: (id, data) => api.put(`patients/${id}/`, data),
   delete: (id) => api.delete(`patients/${id}/`),
+  // Saisie semi-automatique : `signal` (AbortController) annule la frappe précédente
+  suggestions: (q, signal) => api.get('patients/suggestions/', { params: { q }, signal }),
 };
 
 export const medecinService = {
@@ -33,8 +62,8 @@ export const creneauService = {
 };
 
 export const rdvService = {
-  getAll: () => api.get('rdvs/'),
-  getById: (id) => api.get(`rdvs/${id}/`),
+  getAll: () => api.get('rdvs/?expand=creneau_details'),
+  getById: (id) => api.get(`rdvs/${id}/?expand=creneau_details`),
   create: (data) => api.post('rdvs/', data),
   update: (id, data) => api.put(`rdvs/${id}/`, data),
   delete: (id) => api.delete(`rdvs/${id}/`),
@@ -42,7 +71,7 @@ export const rdvService = {
 
 export const consultationService = {
   getAll: () => api.get('consultations/'),
-  getById: (id) => api.get(`consultations/${id}/`),
+  getById: (id) => api.get(`consultations/${id}/?expand=actes_list`),
   create: (data) => api.post('consultations/', data),
   update: (id, data) => api.put(`consultations/${id}/`, data),
   delete: (id) => api.delete(`consultations/${id}/`),
@@ -64,4 +93,9 @@ export const factureService = {
   create: (data) => api.post('factures/', data),
 };
 
+export const rechercheService = {
+  // Patients, médecins, actes, analyses, radios, maladies, vaccins : { meilleurs, groupes, incomplets }
+  globale: (q, signal) => api.get('search/', { params: { q }, signal }),
+};
+
 export default api;
\ No newline at end of file
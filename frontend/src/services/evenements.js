@@ -0,0 +1,41 @@
+// src/services/evenements.js
+import api from './api';
+
+// Abonnement au flux temps réel GET /api/evenements/ (Server-Sent Events,
+// servi par le serveur ASGI). `surChangement` est appelé après chaque rafale
+// d'événements des modèles demandés, après une reconnexion et quand le serveur
+// demande une resynchronisation. Sans flux disponible (serveur WSGI : 501),
+// repli sur un rechargement toutes les `repliMs` millisecondes.
+// Retourne la fonction de désabonnement.
+export function abonnerEvenements(modeles, surChangement, repliMs = 30000) {
+  let attente = null;
+  let repli = null;
+  let dejaOuvert = false;
+
+  const signaler = () => {
+    clearTimeout(attente);
+    attente = setTimeout(surChangement, 200);
+  };
+
+  const source = new EventSource(
+    `${api.defaults.baseURL}evenements/?modeles=${modeles.join(',')}`,
+    { withCredentials: true }
+  );
+  [...modeles, '*'].forEach((modele) => source.addEventListener(modele, signaler));
+  source.onopen = () => {
+    // Reconnexion : des événements ont pu être perdus pendant la coupure
+    if (dejaOuvert) signaler();
+    dejaOuvert = true;
+  };
+  source.onerror = () => {
+    if (source.readyState === EventSource.CLOSED && !repli) {
+      repli = setInterval(surChangement, repliMs);
+    }
+  };
+
+  return () => {
+    source.close();
+    clearTimeout(attente);
+    clearInterval(repli);
+  };
+}
@@ -17,7 +17,7 @@ const receptionService = {
   reserverRDV: (rdvId) => api.patch(`rdvs/${rdvId}/reserver/`),
   
   // ===== SALLE D'ATTENTE =====
-  getSalleAttente: () => api.get('rdvs/salle-attente/'),
+  getSalleAttente: () => api.get('rdvs/salle-attente/?expand=creneau_details'),
   marquerEnConsultation: (rdvId) => api.patch(`rdvs/${rdvId}/en-consultation/`),
   marquerTermine: (rdvId) => api.patch(`rdvs/${rdvId}/termine/`),
   
@@ -36,7 +36,7 @@ const receptionService = {
   
   // ===== STATISTIQUES RÉCEPTION =====
   getStatsJour: () => api.get('reception/stats-jour/'),
-  getRDVAujourdhui: () => api.get('rdvs/aujourdhui/'),
+  getRDVAujourdhui: () => api.get('rdvs/aujourdhui/?expand=creneau_details'),
 };
 
 export default receptionService;
\ No newline at end of file